@@ -1,17 +1,22 @@
 """
-CTFd Camps Plugin — Système de camps adversaires (Bleu vs Rouge).
+CTFd Camps Plugin — Système de camps adversaires (Bleu vs Rouge, ou davantage).
 
 Fonctionnalités :
-  - Assignation des challenges et équipes à des camps
+  - Camps définis en base (Bleu et Rouge par défaut)
+  - Assignation des challenges (un ou plusieurs camps) et équipes à des camps
+  - Règles d'assignation par catégorie, tag ou nom, compilées dans l'index
   - Filtrage automatique des challenges selon le camp
   - Gestion des quotas et deadlines
   - Logs des tentatives d'accès non autorisées
+  - Scoreboard agrégé par camp
+  - Matchs simultanés indépendants (camps, challenges et manches par match)
 
 Auteur : Hack'olyte (https://hackolyte.fr)
 """
 
 import logging
 import os
+import time
 
 import sqlalchemy as sa
 
@@ -19,24 +24,66 @@ from CTFd.models import db
 from CTFd.plugins import register_plugin_assets_directory
 
 from .blueprint import create_blueprint
+from .cli import register_cli
+from .constants import LOG_PREFIX, PRELOAD_CONFIG_KEY
+from .history import backfill_history, register_history_listeners
 from .hooks import register_hooks
-from .models import CampAccessLog, ChallengeCamp, TeamCamp
+from .membership import get_store
+from .migrations import run_migrations
+from .models import (
+    Camp,
+    CampAccessLog,
+    CampAccessLogChallengeStats,
+    CampAccessLogHourly,
+    CampAccessLogRollupState,
+    CampAccessLogTeamStats,
+    CampMatch,
+    CampReplicaHeartbeat,
+    CampRound,
+    CampRule,
+    CampTeamScore,
+    ChallengeCamp,
+    ChallengeRelease,
+    TeamCamp,
+    TeamCampHistory,
+)
 from .patches.admin import apply_all_patches
+from .registry import get_registry
+from .replica import register_replica
+from .releases import get_release_index
+from .scoreboard import init_scoreboard, register_scoreboard_listeners
+from .verifier import register_verifier
 
 logger = logging.getLogger("CTFdCamps")
 
 _TABLES = [
+    ("camp_matches", CampMatch),
+    ("camps", Camp),
     ("challenge_camps", ChallengeCamp),
     ("team_camps", TeamCamp),
+    ("camp_rounds", CampRound),
+    ("camp_rules", CampRule),
+    ("challenge_releases", ChallengeRelease),
+    ("team_camp_history", TeamCampHistory),
     ("camp_access_logs", CampAccessLog),
+    ("camp_team_scores", CampTeamScore),
+    ("camp_access_log_hourly", CampAccessLogHourly),
+    ("camp_access_log_team_stats", CampAccessLogTeamStats),
+    ("camp_access_log_challenge_stats", CampAccessLogChallengeStats),
+    ("camp_access_log_rollup_state", CampAccessLogRollupState),
+    ("camp_replica_heartbeat", CampReplicaHeartbeat),
 ]
 
 
 def load(app):
     """Point d'entrée du plugin, appelé par CTFd au démarrage."""
+    started = time.perf_counter()
 
-    # 1. Création des tables
+    # 1. Création des tables et migrations
     _ensure_tables(app)
+    run_migrations(app)
+    backfill_history(app)
+    init_scoreboard(app)
 
     # 2. Patches des templates admin
     apply_all_patches(app)
@@ -55,7 +102,21 @@ def load(app):
     # 5. Blueprint (routes admin + user)
     app.register_blueprint(create_blueprint())
 
-    logger.info("[CTFd Camps] Plugin chargé avec succès !")
+    # 6. Historique et scoreboard des camps (maintenance incrémentale), réplica en lecture,
+    #    vérification des caches, commandes CLI
+    register_history_listeners()
+    register_scoreboard_listeners()
+    register_replica(app)
+    register_verifier(app)
+    register_cli(app)
+
+    # 7. Préchargement optionnel (gunicorn --preload) : structures partagées par fork
+    if _preload_enabled(app):
+        _preload(app)
+
+    logger.info(
+        "%s Plugin chargé avec succès en %.0f ms", LOG_PREFIX, (time.perf_counter() - started) * 1000,
+    )
 
 
 def _ensure_tables(app):
@@ -70,3 +131,44 @@ def _ensure_tables(app):
                 logger.info("[CTFd Camps] Table %s créée.", table_name)
             else:
                 logger.info("[CTFd Camps] Table %s déjà existante.", table_name)
+
+
+def _preload_enabled(app) -> bool:
+    """Préchargement activé par ``CAMPS_PRELOAD`` (config CTFd ou environnement)."""
+    value = app.config.get(PRELOAD_CONFIG_KEY, os.environ.get(PRELOAD_CONFIG_KEY, ""))
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _preload(app):
+    """
+    Construit avant le fork des workers les instantanés du processus
+    (registre, masques des challenges, camps des équipes, fenêtres de
+    publication) et compile les templates patchés et ceux du plugin :
+    chaque worker en hérite au lieu de les reconstruire à sa première
+    requête.
+    """
+    started = time.perf_counter()
+    template_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "templates")
+    templates = sorted(app.overridden_templates) + sorted(
+        name for name in os.listdir(template_dir) if name.endswith(".html")
+    )
+
+    with app.app_context():
+        registry = get_registry()
+        store = get_store()
+        store.warm()
+        masks = store.challenge_masks()
+        team_camps = store.team_sides()
+        get_release_index()
+        for name in templates:
+            app.jinja_env.get_template(name)
+
+        # Les connexions ouvertes ici ne doivent pas être partagées entre workers
+        db.engine.dispose()
+
+    logger.info(
+        "%s Préchargement en %.0f ms : %d camp(s), %d challenge(s) restreint(s), "
+        "%d équipe(s), %d template(s)",
+        LOG_PREFIX, (time.perf_counter() - started) * 1000,
+        len(registry.camps), len(masks), len(team_camps), len(templates),
+    )
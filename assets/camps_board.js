@@ -0,0 +1,58 @@
+/*
+ * CTFd Camps — rafraîchissement du board /challenges sur notification.
+ */
+(function () {
+    if (!window.CampsEvents) return;
+
+    function showRefreshBanner() {
+        if (document.getElementById('camps-refresh-banner')) return;
+        var banner = document.createElement('div');
+        banner.id = 'camps-refresh-banner';
+        banner.className = 'alert alert-info text-center';
+        banner.style.cssText = 'position:fixed;top:70px;left:50%;transform:translateX(-50%);z-index:1050;';
+        banner.innerHTML = '🔄 De nouveaux challenges sont disponibles pour votre camp. '
+            + '<a href="/challenges" class="alert-link">Rafraîchir</a>';
+        document.body.appendChild(banner);
+    }
+
+    function refreshBoard() {
+        // Thème core historique
+        if (typeof window.loadChals === 'function') {
+            window.loadChals();
+            return;
+        }
+        // Thème core (Alpine.js)
+        var board = document.querySelector('[x-data="ChallengeBoard"]');
+        if (board && window.Alpine) {
+            var data = window.Alpine.$data(board);
+            if (data && typeof data.loadChallenges === 'function') {
+                data.loadChallenges();
+                return;
+            }
+        }
+        showRefreshBanner();
+    }
+
+    function hideChangeButton() {
+        var btn = document.getElementById('camps-change-btn');
+        if (btn) btn.remove();
+    }
+
+    CampsEvents.on('challenges_changed', function () {
+        CampsEvents.jitter(refreshBoard);
+    });
+    CampsEvents.on('resync', function () {
+        CampsEvents.jitter(refreshBoard);
+    });
+    CampsEvents.on('camp_change_closed', hideChangeButton);
+    CampsEvents.on('config_changed', function (data) {
+        if (!data.allow_change) hideChangeButton();
+    });
+    CampsEvents.on('team_camp_changed', function () {
+        CampsEvents.jitter(function () { location.reload(); });
+    });
+    // Tous les joueurs sont concernés : rechargements étalés sur 10 s
+    CampsEvents.on('round_scheduled', function () {
+        CampsEvents.jitter(function () { location.reload(); }, 10000);
+    });
+})();
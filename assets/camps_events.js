@@ -0,0 +1,69 @@
+/*
+ * CTFd Camps — notifications temps réel côté joueur.
+ *
+ * Ouvre un unique flux SSE (/api/v1/camps/events) et expose
+ * window.CampsEvents.on(type, callback) aux pages du plugin.
+ * Les évènements ne contiennent que des versions ou des deltas :
+ * les pages ne re-téléchargent leurs données que si nécessaire.
+ */
+(function () {
+    if (!window.EventSource || window.CampsEvents) return;
+
+    var handlers = {};
+    var versions = null;
+
+    function on(type, callback) {
+        (handlers[type] = handlers[type] || []).push(callback);
+    }
+
+    function emit(type, data) {
+        (handlers[type] || []).forEach(function (callback) {
+            try {
+                callback(data);
+            } catch (err) {
+                console.error('[CTFd Camps]', err);
+            }
+        });
+    }
+
+    // Étale les re-téléchargements pour éviter que tous les clients
+    // interrogent le serveur au même instant
+    function jitter(callback, maxDelay) {
+        setTimeout(callback, Math.random() * (maxDelay || 2000));
+    }
+
+    var source = new EventSource('/api/v1/camps/events');
+
+    // Reçu à chaque (re)connexion : si une version a changé pendant la
+    // coupure, les évènements manqués sont remplacés par un "resync"
+    source.addEventListener('hello', function (e) {
+        var data = JSON.parse(e.data);
+        if (versions !== null) {
+            var stale = Object.keys(data.versions).filter(function (key) {
+                return versions[key] !== data.versions[key];
+            });
+            if (stale.length) emit('resync', { keys: stale });
+        }
+        versions = data.versions;
+        emit('hello', data);
+    });
+
+    [
+        'counts_changed',
+        'challenges_changed',
+        'config_changed',
+        'camp_change_closed',
+        'team_camp_changed',
+        'round_scheduled'
+    ].forEach(function (type) {
+        source.addEventListener(type, function (e) {
+            var data = JSON.parse(e.data);
+            if (versions && data.version_key) {
+                versions[data.version_key] = data.version;
+            }
+            emit(type, data);
+        });
+    });
+
+    window.CampsEvents = { on: on, jitter: jitter };
+})();
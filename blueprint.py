@@ -3,30 +3,82 @@ Blueprint Flask du plugin CTFd Camps.
 Routes admin et utilisateur.
 """
 
+import json
 import logging
+import re
 from datetime import datetime, timezone
 
-from flask import Blueprint, jsonify, render_template, request
+import sqlalchemy as sa
+from flask import Blueprint, Response, jsonify, render_template, request
+from markupsafe import Markup
 
 from CTFd.models import Challenges, Teams, db
 from CTFd.utils.config import get_config
-from CTFd.utils.decorators import admins_only, authed_only
-from CTFd.utils.user import get_current_team
+from CTFd.utils.decorators import admins_only, authed_only, during_ctf_time_only, require_verified_emails
+from CTFd.utils.decorators.visibility import check_challenge_visibility, check_score_visibility
 
+from . import challenge_list, events, fragments, history, log_sinks, log_stats, replica, rules, throttle, verifier
 from .constants import (
     CFG_ALLOW_CHANGE,
     CFG_CHANGE_DEADLINE,
     CFG_ENABLE_TEAM_LIMITS,
-    CFG_MAX_BLUE_TEAMS,
-    CFG_MAX_RED_TEAMS,
+    CFG_LOG_SINKS,
     CFG_SHOW_CHALLENGE_BADGES,
     CFG_SHOW_PUBLIC_STATS,
+    CFG_THROTTLE_BURST,
+    CFG_THROTTLE_COOLDOWN,
+    CFG_THROTTLE_RATE,
+    CHANNEL_ADMIN_LOGS,
+    CHANNEL_COUNTS,
+    CHANNEL_PUBLIC,
+    EVENT_CAMP_CHANGE_CLOSED,
+    EVENT_CHALLENGES_CHANGED,
+    CAMP_NONE,
+    CAMP_SLUG_RE,
+    EVENT_HELLO,
+    EVENT_TEAM_CAMP_CHANGED,
+    HISTORY_RESOLVE_MAX,
+    MAX_CAMPS,
     MAX_LOGS_DISPLAYED,
-    VALID_CAMPS,
-    VALID_CAMPS_WITH_NONE,
+    REPLICA_DATASET_ACCESS_LOGS,
+    RESERVED_CAMP_SLUGS,
+    ROLLUP_PAGE_BATCHES,
+    RULE_KINDS,
+    RULE_PATTERN_MAX_LENGTH,
+    VERSION_CHALLENGES_PREFIX,
+    VERSION_CONFIG,
+    VERSION_COUNTS,
+    VERSION_LOG_SINKS,
 )
-from .helpers import can_change_camp, can_join_camp, set_config
-from .models import CampAccessLog, ChallengeCamp, TeamCamp
+from .caching import bump_version, get_versions
+from .context import get_context
+from .denials import log_denial, throttled_response
+from .helpers import (
+    can_join_camp,
+    get_join_status,
+    get_team_counts,
+    ip_range,
+    parse_camp_selection,
+    serialize_access_log,
+    set_config,
+)
+from .membership import get_store
+from .models import (
+    Camp,
+    CampAccessLog,
+    CampMatch,
+    CampRound,
+    CampRule,
+    ChallengeCamp,
+    ChallengeRelease,
+    TeamCamp,
+)
+from .registry import ALL_MATCHES, get_registry, invalidate_registry
+from .releases import get_release_index, invalidate_releases
+from .scoreboard import get_scoreboard
+
+_CAMP_SLUG_RE = re.compile(CAMP_SLUG_RE)
+_CAMP_COLOR_RE = re.compile(r"^#[0-9a-fA-F]{6}$")
 
 logger = logging.getLogger("CTFdCamps")
 
@@ -48,30 +100,55 @@ def create_blueprint() -> Blueprint:
     @bp.route("/admin/camps")
     @admins_only
     def camps_admin():
-        """Page principale d'administration des camps."""
-        teams = Teams.query.all()
-        teams_data = []
-        for team in teams:
-            tc = TeamCamp.query.filter_by(team_id=team.id).first()
-            teams_data.append({
-                "id": team.id,
-                "name": team.name,
-                "camp": tc.camp if tc else None,
-            })
+        """
+        Page principale d'administration des camps.
 
-        blue_count = TeamCamp.query.filter_by(camp="blue").count()
-        red_count = TeamCamp.query.filter_by(camp="red").count()
+        ``?match=<slug>`` restreint la page à un match : équipes, challenges
+        et fenêtres sont lus par les index sur le camp et le match, quel que
+        soit le nombre de matchs de l'instance.
+        """
+        registry = get_registry()
+        match = registry.get_match(request.args.get("match"))
+        camps = registry.camps_of(match.id) if match else registry.camps
+        sides = get_store().team_sides()
 
+        teams = db.session.query(Teams.id, Teams.name)
+        challenges = db.session.query(Challenges.id, Challenges.name, Challenges.category)
+        if match:
+            teams = teams.join(TeamCamp, TeamCamp.team_id == Teams.id).filter(TeamCamp.camp.in_(match.slugs))
+            challenges = challenges.join(ChallengeCamp, ChallengeCamp.challenge_id == Challenges.id).filter(
+                ChallengeCamp.match_id == match.id
+            )
+        teams_data = [
+            {"id": tid, "name": name, "camp": registry.camp_of_side(sides.get(tid))}
+            for tid, name in teams.order_by(Teams.id)
+        ]
+
+        all_counts = get_team_counts()
+        counts = {info.slug: all_counts.get(info.slug, 0) for info in camps}
         stats = {
-            "blue": blue_count,
-            "red": red_count,
-            "unassigned": len(teams) - blue_count - red_count,
-            "total": len(teams),
+            "camps": counts,
+            # Les équipes sans camp n'appartiennent à aucun match
+            "unassigned": None if match else len(teams_data) - sum(counts.values()),
+            "total": len(teams_data),
         }
 
         config = _load_admin_config()
 
-        return render_template("camps_admin.html", teams=teams_data, stats=stats, config=config)
+        return render_template(
+            "camps_admin.html",
+            teams=teams_data,
+            stats=stats,
+            config=config,
+            camps=camps,
+            match=match,
+            matches=_matches_for_display(registry, all_counts),
+            round_camps=registry.camps_of(match.id if match else None),
+            rounds=_rounds_for_display(registry, match),
+            rules=_rules_for_display(registry),
+            releases=_releases_for_display(registry, camps if match else None),
+            challenges=challenges.order_by(Challenges.category, Challenges.name).all(),
+        )
 
     @bp.route("/admin/camps/config", methods=["POST"])
     @admins_only
@@ -92,10 +169,29 @@ def create_blueprint() -> Blueprint:
             set_config(CFG_SHOW_PUBLIC_STATS, data.get("show_public_stats", False))
             set_config(CFG_SHOW_CHALLENGE_BADGES, data.get("show_challenge_badges", False))
             set_config(CFG_ENABLE_TEAM_LIMITS, data.get("enable_team_limits", False))
-            set_config(CFG_MAX_BLUE_TEAMS, int(data.get("max_blue_teams", 0)))
-            set_config(CFG_MAX_RED_TEAMS, int(data.get("max_red_teams", 0)))
             set_config(CFG_CHANGE_DEADLINE, deadline)
 
+            # Limitation des accès refusés (valeurs entières positives)
+            for key, field in (
+                (CFG_THROTTLE_BURST, "throttle_burst"),
+                (CFG_THROTTLE_RATE, "throttle_rate"),
+                (CFG_THROTTLE_COOLDOWN, "throttle_cooldown"),
+            ):
+                if field in data:
+                    try:
+                        set_config(key, max(0, int(data[field] or 0)))
+                    except (TypeError, ValueError):
+                        return jsonify({"success": False, "error": f"Valeur invalide pour {field}"}), 400
+
+            # Quotas par camp (la limite est stockée dans la table camps)
+            quotas = data.get("max_teams") or {}
+            if quotas:
+                for camp in Camp.query.filter(Camp.slug.in_(list(quotas))).all():
+                    camp.max_teams = max(0, int(quotas[camp.slug] or 0))
+                db.session.commit()
+                invalidate_registry()
+
+            events.notify_config_changed(data.get("allow_change", True), deadline)
             logger.info("[CTFd Camps] Configuration sauvegardée")
             return jsonify({"success": True, "message": "Configuration mise à jour"})
 
@@ -103,12 +199,29 @@ def create_blueprint() -> Blueprint:
             logger.exception("[CTFd Camps] Erreur sauvegarde config")
             return jsonify({"success": False, "error": str(exc)}), 500
 
+    @bp.route("/admin/camps/log-sinks", methods=["POST"])
+    @admins_only
+    def update_log_sinks():
+        """Met à jour les destinations des accès refusés (base, fichier JSONL, syslog)."""
+        settings, error = log_sinks.validate_settings((request.json or {}).get("sinks"))
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+
+        set_config(CFG_LOG_SINKS, json.dumps(settings))
+        # Chaque worker reconstruit ses destinations à son prochain refus
+        bump_version(VERSION_LOG_SINKS)
+        logger.info(
+            "[CTFd Camps] Destinations des refus : %s",
+            ", ".join(spec["type"] for spec in settings if spec["enabled"]) or "aucune",
+        )
+        return jsonify({"success": True, "message": "Destinations mises à jour"})
+
     @bp.route("/admin/camps/team/<int:team_id>", methods=["POST"])
     @admins_only
     def update_team_camp(team_id):
         """Met à jour le camp d'une équipe (admin)."""
         camp = (request.json or {}).get("camp")
-        if camp not in VALID_CAMPS_WITH_NONE and camp is not None:
+        if camp not in (CAMP_NONE, None) and camp not in get_registry():
             return jsonify({"success": False, "error": "Camp invalide"}), 400
 
         team = Teams.query.filter_by(id=team_id).first()
@@ -116,20 +229,361 @@ def create_blueprint() -> Blueprint:
             return jsonify({"success": False, "error": "Équipe introuvable"}), 404
 
         try:
-            if camp in ("none", None):
-                TeamCamp.query.filter_by(team_id=team_id).delete()
-                db.session.commit()
+            store = get_store()
+            old_camp = store.team_camp(team_id)
+
+            if camp in (CAMP_NONE, None):
+                store.set_team_side(team_id, None)
+                events.notify_team_camp_changed(team_id, old_camp, None)
                 return jsonify({"success": True, "message": "Camp retiré"})
 
-            tc = TeamCamp.query.filter_by(team_id=team_id).first()
-            if tc:
-                tc.camp = camp
-            else:
-                db.session.add(TeamCamp(team_id=team_id, camp=camp))
+            # Le côté enregistré est celui qui mène à ce camp pendant la manche active
+            store.set_team_side(team_id, get_registry().side_of_camp(camp))
+            events.notify_team_camp_changed(team_id, old_camp, camp)
+            return jsonify({"success": True, "message": f"Camp {camp} assigné"})
+
+        except Exception as exc:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(exc)}), 500
+
+    @bp.route("/admin/camps/history/<int:team_id>")
+    @admins_only
+    def team_camp_history(team_id):
+        """Périodes d'appartenance d'une équipe à chaque camp."""
+        periods = [
+            {
+                "camp": entry.camp,
+                "valid_from": entry.valid_from.isoformat(),
+                "valid_to": entry.valid_to.isoformat() if entry.valid_to else None,
+                "changed_by": entry.changed_by,
+            }
+            for entry in history.get_team_history(team_id)
+        ]
+        return jsonify({"success": True, "data": periods})
+
+    @bp.route("/admin/camps/history/resolve", methods=["POST"])
+    @admins_only
+    def resolve_camp_history():
+        """
+        Camp de chaque équipe à une date donnée, en lot.
 
+        Corps : ``{"pairs": [[team_id, "2024-05-01T14:03:00"], ...]}`` (dates UTC).
+        """
+        raw_pairs = (request.json or {}).get("pairs") or []
+        if len(raw_pairs) > HISTORY_RESOLVE_MAX:
+            return jsonify({"success": False, "error": f"{HISTORY_RESOLVE_MAX} couples maximum"}), 400
+
+        try:
+            pairs = [
+                (int(team_id), datetime.fromisoformat(str(when).replace("Z", "+00:00")))
+                for team_id, when in raw_pairs
+            ]
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "Couples (team_id, date ISO) attendus"}), 400
+
+        camps = history.get_camps_at(pairs)
+        return jsonify({
+            "success": True,
+            "data": [camps[pair] for pair in pairs],
+        })
+
+    @bp.route("/admin/camps/definitions", methods=["POST"])
+    @admins_only
+    def create_camp():
+        """Crée un nouveau camp (un bit de visibilité lui est attribué)."""
+        data = request.json or {}
+        fields, error = _validate_camp_payload(data, creating=True)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+
+        registry = get_registry()
+        if fields["slug"] in registry:
+            return jsonify({"success": False, "error": "Ce camp existe déjà"}), 409
+
+        bit = registry.free_bit()
+        if bit is None:
+            return jsonify({"success": False, "error": f"Nombre maximal de camps atteint ({MAX_CAMPS})"}), 400
+
+        try:
+            camp = Camp(bit=bit, position=len(registry.camps), **fields)
+            db.session.add(camp)
             db.session.commit()
-            return jsonify({"success": True, "message": f"Camp {camp} assigné"})
+            invalidate_registry()
+            logger.info("[CTFd Camps] Camp %s créé (bit %d)", camp.slug, bit)
+            return jsonify({"success": True, "message": f"Camp {camp.label} créé", "id": camp.id})
+        except Exception as exc:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(exc)}), 500
+
+    @bp.route("/admin/camps/definitions/<int:camp_id>", methods=["POST"])
+    @admins_only
+    def update_camp(camp_id):
+        """Modifie un camp (le slug et le bit sont immuables)."""
+        camp = Camp.query.filter_by(id=camp_id).first()
+        if not camp:
+            return jsonify({"success": False, "error": "Camp introuvable"}), 404
+
+        fields, error = _validate_camp_payload(request.json or {}, creating=False)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+
+        if "match_id" in fields and fields["match_id"] != camp.match_id:
+            # Les challenges et les manches du camp appartiennent à son match actuel
+            usage = _camp_usage(camp)
+            if usage:
+                return jsonify({"success": False, "error": f"Changement de match impossible : {usage}"}), 409
+
+        try:
+            for key, value in fields.items():
+                setattr(camp, key, value)
+            db.session.commit()
+            invalidate_registry()
+            return jsonify({"success": True, "message": f"Camp {camp.label} mis à jour"})
+        except Exception as exc:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(exc)}), 500
+
+    @bp.route("/admin/camps/definitions/<int:camp_id>", methods=["DELETE"])
+    @admins_only
+    def delete_camp(camp_id):
+        """Supprime un camp qui n'a plus ni équipe ni challenge."""
+        camp = Camp.query.filter_by(id=camp_id).first()
+        if not camp:
+            return jsonify({"success": False, "error": "Camp introuvable"}), 404
+
+        # Retirer le bit d'un challenge pourrait le rendre neutre (visible par
+        # tous) : l'admin doit d'abord réassigner équipes et challenges.
+        usage = _camp_usage(camp)
+        if usage:
+            return jsonify({"success": False, "error": f"Camp encore utilisé : {usage}"}), 409
+
+        try:
+            # Fenêtres de publication du camp : sans objet une fois le camp supprimé
+            releases = ChallengeRelease.query.filter_by(camp=camp.slug).delete()
+            db.session.delete(camp)
+            db.session.commit()
+            invalidate_registry()
+            if releases:
+                invalidate_releases()
+            return jsonify({"success": True, "message": "Camp supprimé"})
+        except Exception as exc:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(exc)}), 500
+
+    @bp.route("/admin/camps/matches", methods=["POST"])
+    @admins_only
+    def create_match():
+        """Crée un match ; ses camps y sont ensuite rattachés depuis la section Camps."""
+        data = request.json or {}
+        slug = str(data.get("slug", "")).strip().lower()
+        label = str(data.get("label", "")).strip()
+        if not _CAMP_SLUG_RE.match(slug):
+            return jsonify({"success": False, "error": "Identifiant invalide (minuscules, chiffres, - et _, 32 caractères max)"}), 400
+        if not label or len(label) > 64:
+            return jsonify({"success": False, "error": "Nom du match invalide"}), 400
+
+        registry = get_registry()
+        if registry.get_match(slug):
+            return jsonify({"success": False, "error": "Ce match existe déjà"}), 409
+
+        try:
+            match = CampMatch(slug=slug, label=label, position=len(registry.matches))
+            db.session.add(match)
+            db.session.commit()
+            invalidate_registry()
+            logger.info("[CTFd Camps] Match %s créé", slug)
+            return jsonify({"success": True, "message": f"Match {label} créé", "id": match.id})
+        except Exception as exc:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(exc)}), 500
+
+    @bp.route("/admin/camps/matches/<int:match_id>", methods=["DELETE"])
+    @admins_only
+    def delete_match(match_id):
+        """Supprime un match qui n'a plus ni camp ni manche."""
+        match = CampMatch.query.filter_by(id=match_id).first()
+        if not match:
+            return jsonify({"success": False, "error": "Match introuvable"}), 404
+
+        camps = Camp.query.filter_by(match_id=match_id).count()
+        rounds = CampRound.query.filter_by(match_id=match_id).count()
+        if camps or rounds:
+            return jsonify({
+                "success": False,
+                "error": f"Match encore utilisé ({camps} camp(s), {rounds} manche(s))",
+            }), 409
+
+        try:
+            db.session.delete(match)
+            db.session.commit()
+            invalidate_registry()
+            return jsonify({"success": True, "message": "Match supprimé"})
+        except Exception as exc:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(exc)}), 500
+
+    @bp.route("/admin/camps/rules", methods=["POST"])
+    @admins_only
+    def create_rule():
+        """
+        Ajoute une règle de camp puis la compile : les challenges sans choix
+        explicite qu'elle désigne sont réassignés immédiatement.
+        """
+        fields, error = _validate_rule_payload(request.json or {})
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+
+        try:
+            position = (db.session.query(sa.func.max(CampRule.position)).scalar() or 0) + 1
+            rule = CampRule(position=position, **fields)
+            db.session.add(rule)
+            db.session.commit()
+            count = rules.compile_rules()
+            logger.info("[CTFd Camps] Règle %s=%s créée", rule.kind, rule.pattern)
+            return jsonify({
+                "success": True,
+                "message": f"Règle ajoutée ({count} challenge(s) réassigné(s))",
+                "id": rule.id,
+            })
+        except Exception as exc:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(exc)}), 500
+
+    @bp.route("/admin/camps/rules/<int:rule_id>", methods=["DELETE"])
+    @admins_only
+    def delete_rule(rule_id):
+        """Supprime une règle ; ses challenges suivent les règles restantes."""
+        rule = CampRule.query.filter_by(id=rule_id).first()
+        if not rule:
+            return jsonify({"success": False, "error": "Règle introuvable"}), 404
+
+        try:
+            db.session.delete(rule)
+            db.session.commit()
+            count = rules.compile_rules()
+            return jsonify({"success": True, "message": f"Règle supprimée ({count} challenge(s) réassigné(s))"})
+        except Exception as exc:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(exc)}), 500
+
+    @bp.route("/admin/camps/rules/compile", methods=["POST"])
+    @admins_only
+    def compile_camp_rules():
+        """Recompile toutes les règles (après des modifications hors de l'interface)."""
+        try:
+            count = rules.compile_rules()
+            return jsonify({"success": True, "message": f"{count} challenge(s) réassigné(s)"})
+        except Exception as exc:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(exc)}), 500
+
+    @bp.route("/admin/camps/verify", methods=["POST"])
+    @admins_only
+    def verify_caches():
+        """Compare sans attendre les appartenances en cache à la base et corrige les écarts."""
+        try:
+            divergences = verifier.verify()
+        except Exception as exc:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(exc)}), 500
+        if not divergences:
+            return jsonify({"success": True, "divergences": [], "message": "Caches cohérents avec la base"})
+        message = "Écarts corrigés : " + " ; ".join(f"{d['dataset']} ({d['groups']})" for d in divergences)
+        return jsonify({"success": True, "divergences": divergences, "message": message})
+
+    @bp.route("/admin/camps/rounds", methods=["POST"])
+    @admins_only
+    def create_round():
+        """
+        Planifie une manche (correspondance côté → camp).
+
+        Inverser deux camps revient à insérer cette seule ligne ; sans date
+        de début, la manche commence immédiatement. Les caches par camp
+        restent valides : seul le camp effectif des équipes change.
+        """
+        data = request.json or {}
+        fields, error = _validate_round_payload(data, get_registry())
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+
+        try:
+            camp_round = CampRound(**fields)
+            db.session.add(camp_round)
+            db.session.commit()
+            invalidate_registry()
+            events.notify_round_scheduled(camp_round.starts_at)
+            logger.info("[CTFd Camps] Manche %s planifiée (%s)", camp_round.name, camp_round.starts_at)
+            return jsonify({"success": True, "message": f"Manche {camp_round.name} planifiée", "id": camp_round.id})
+        except Exception as exc:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(exc)}), 500
+
+    @bp.route("/admin/camps/rounds/<int:round_id>", methods=["DELETE"])
+    @admins_only
+    def delete_round(round_id):
+        """Supprime une manche (la précédente redevient active si elle était en cours)."""
+        camp_round = CampRound.query.filter_by(id=round_id).first()
+        if not camp_round:
+            return jsonify({"success": False, "error": "Manche introuvable"}), 404
+
+        try:
+            starts_at = camp_round.starts_at
+            db.session.delete(camp_round)
+            db.session.commit()
+            invalidate_registry()
+            events.notify_round_scheduled(starts_at)
+            return jsonify({"success": True, "message": "Manche supprimée"})
+        except Exception as exc:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(exc)}), 500
+
+    @bp.route("/admin/camps/releases", methods=["POST"])
+    @admins_only
+    def save_release():
+        """
+        Crée ou remplace la fenêtre de publication d'un challenge pour un camp.
+
+        Une borne vide laisse la fenêtre ouverte de ce côté.
+        """
+        data = request.json or {}
+        registry = get_registry()
+        fields, error = _validate_release_payload(data, registry)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
 
+        try:
+            release = ChallengeRelease.query.filter_by(
+                challenge_id=fields["challenge_id"], camp=fields["camp"],
+            ).first()
+            if release:
+                release.opens_at = fields["opens_at"]
+                release.closes_at = fields["closes_at"]
+            else:
+                release = ChallengeRelease(**fields)
+                db.session.add(release)
+            db.session.commit()
+            invalidate_releases()
+            events.notify_challenges_changed(fields["challenge_id"], {registry.mask_of(fields["camp"])})
+            return jsonify({"success": True, "message": "Fenêtre de publication enregistrée", "id": release.id})
+        except Exception as exc:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(exc)}), 500
+
+    @bp.route("/admin/camps/releases/<int:release_id>", methods=["DELETE"])
+    @admins_only
+    def delete_release(release_id):
+        """Supprime une fenêtre : le challenge suit de nouveau ses seuls camps."""
+        release = ChallengeRelease.query.filter_by(id=release_id).first()
+        if not release:
+            return jsonify({"success": False, "error": "Fenêtre introuvable"}), 404
+
+        try:
+            challenge_id, camp = release.challenge_id, release.camp
+            db.session.delete(release)
+            db.session.commit()
+            invalidate_releases()
+            events.notify_challenges_changed(challenge_id, {get_registry().mask_of(camp)})
+            return jsonify({"success": True, "message": "Fenêtre supprimée"})
         except Exception as exc:
             db.session.rollback()
             return jsonify({"success": False, "error": str(exc)}), 500
@@ -137,37 +591,97 @@ def create_blueprint() -> Blueprint:
     @bp.route("/admin/camps/logs")
     @admins_only
     def camps_logs():
-        """Page des logs des tentatives d'accès illégitimes."""
-        logs = (
-            CampAccessLog.query
-            .order_by(CampAccessLog.timestamp.desc())
-            .limit(MAX_LOGS_DISPLAYED)
-            .all()
-        )
+        """
+        Page des logs des tentatives d'accès illégitimes.
 
-        logs_data = []
-        for log in logs:
-            team = Teams.query.filter_by(id=log.team_id).first()
-            challenge = Challenges.query.filter_by(id=log.challenge_id).first()
-            logs_data.append({
-                "id": log.id,
-                "team_name": team.name if team else f"Team #{log.team_id}",
-                "team_id": log.team_id,
-                "team_camp": log.team_camp,
-                "challenge_name": challenge.name if challenge else f"Challenge #{log.challenge_id}",
-                "challenge_id": log.challenge_id,
-                "challenge_camp": log.challenge_camp,
-                "request_info": log.request_info or "",
-                "timestamp": log.timestamp.strftime("%d/%m/%Y %H:%M:%S"),
-            })
+        ``?ip=`` filtre sur une adresse ou un réseau CIDR (10.0.0.0/8,
+        2001:db8::/32) via l'index de ``ip_packed``. Les logs sont lus sur
+        le réplica en lecture s'il a rejoint le dernier lot de logs (voir
+        ``replica``) ; le flux temps réel complète la page à partir de la
+        position du canal lue avant les logs (les doublons sont ignorés par
+        la page).
+        """
+        ip_filter = (request.args.get("ip") or "").strip()
+        ip_error = None
+        bounds = None
+        if ip_filter:
+            bounds = ip_range(ip_filter)
+            if bounds is None:
+                ip_error = "Adresse IP ou réseau CIDR invalide"
+
+        def load_logs(session) -> list[dict]:
+            query = (
+                session.query(CampAccessLog, Teams.name, Challenges.name)
+                .outerjoin(Teams, Teams.id == CampAccessLog.team_id)
+                .outerjoin(Challenges, Challenges.id == CampAccessLog.challenge_id)
+            )
+            if bounds is not None:
+                query = query.filter(CampAccessLog.ip_packed.between(*bounds))
+            return [
+                serialize_access_log(log, team_name, challenge_name)
+                for log, team_name, challenge_name in (
+                    query.order_by(CampAccessLog.id.desc()).limit(MAX_LOGS_DISPLAYED)
+                )
+            ]
+
+        # Position du flux lue avant les logs : rien n'est publié entre les deux sans être rejoué.
+        # Sans Redis, la séquence est propre à chaque worker : le flux, servi par un autre,
+        # démarre en direct (les doublons avec la page sont écartés par le client).
+        broker = events.get_broker()
+        stream_id = broker.last_id(CHANNEL_ADMIN_LOGS) if broker.shared else None
+        logs_data = replica.run_read(load_logs, REPLICA_DATASET_ACCESS_LOGS)
+
+        # Statistiques lues dans les agrégats (jamais de parcours de la table des logs) ;
+        # un lot au plus par affichage, l'arriéré est signalé sur la page
+        try:
+            log_stats.refresh_rollups(max_batches=ROLLUP_PAGE_BATCHES)
+        except Exception:
+            logger.exception("[CTFd Camps] Erreur mise à jour des statistiques de logs")
+        dashboard = log_stats.get_dashboard()
 
         stats = {
-            "total": CampAccessLog.query.count(),
-            "unique_teams": db.session.query(CampAccessLog.team_id).distinct().count(),
+            "total": dashboard["total"],
+            "unique_teams": dashboard["unique_teams"],
             "shown": len(logs_data),
+            "stream_id": stream_id,
+            "rollup_lag": log_stats.get_rollup_lag(),
         }
 
-        return render_template("camps_logs.html", logs=logs_data, stats=stats)
+        return render_template(
+            "camps_logs.html",
+            logs=logs_data,
+            stats=stats,
+            dashboard=dashboard,
+            ip_filter=ip_filter,
+            ip_error=ip_error,
+            camps=get_registry().by_slug,
+            throttled=throttle.get_throttled_teams(),
+        )
+
+    @bp.route("/admin/camps/logs/stream")
+    @admins_only
+    def camps_logs_stream():
+        """Flux SSE des nouvelles tentatives d'accès (reprise via Last-Event-ID)."""
+        last_event_id = events.parse_last_event_id(
+            request.headers.get("Last-Event-ID") or request.args.get("last_id")
+        )
+
+        # Aucune connexion BDD ne doit rester ouverte pendant le flux
+        db.session.close()
+
+        stream = events.get_broker().subscribe(CHANNEL_ADMIN_LOGS, last_event_id=last_event_id)
+        return Response(
+            stream,
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @bp.route("/admin/camps/throttle/<int:team_id>/clear", methods=["POST"])
+    @admins_only
+    def clear_team_throttle(team_id):
+        """Lève le blocage d'une équipe limitée pour accès refusés répétés."""
+        throttle.clear_throttle(team_id)
+        return jsonify({"success": True, "message": "Blocage levé"})
 
     @bp.route("/admin/camps/logs/clear", methods=["POST"])
     @admins_only
@@ -175,6 +689,7 @@ def create_blueprint() -> Blueprint:
         """Supprime tous les logs."""
         try:
             CampAccessLog.query.delete()
+            log_stats.reset_rollups(db.session.connection())
             db.session.commit()
             return jsonify({"success": True, "message": "Logs supprimés"})
         except Exception as exc:
@@ -189,84 +704,92 @@ def create_blueprint() -> Blueprint:
     @authed_only
     def select_camp_page():
         """Page de sélection de camp."""
-        team = get_current_team()
-        if not team:
+        context = get_context()
+        if not context.team:
             return "Vous devez être dans une équipe pour accéder à cette page", 403
 
-        tc = TeamCamp.query.filter_by(team_id=team.id).first()
-        current_camp = tc.camp if tc else None
+        current_camp = context.camp
 
-        can_change, error_msg = can_change_camp(team.id)
-        allow_change = get_config(CFG_ALLOW_CHANGE, default=True)
-        show_public_stats = get_config(CFG_SHOW_PUBLIC_STATS, default=False)
-        enable_team_limits = get_config(CFG_ENABLE_TEAM_LIMITS, default=False)
+        can_change, error_msg = context.change_status
+        allow_change = context.settings["allow_change"]
+        show_public_stats = context.settings["show_public_stats"]
+        enable_team_limits = context.settings["enable_team_limits"]
 
-        # Statistiques
+        # Parties communes (comptes, statistiques, présentation des camps) en cache
+        overview = fragments.select_overview(context.settings, context.match_scope)
+        counts = overview["counts"]
         stats = None
         if show_public_stats or enable_team_limits:
-            blue_count = TeamCamp.query.filter_by(camp="blue").count()
-            red_count = TeamCamp.query.filter_by(camp="red").count()
             stats = {
-                "blue": blue_count,
-                "red": red_count,
+                "counts": counts,
                 "show_counts": show_public_stats,
                 "show_limits": enable_team_limits,
             }
-            if enable_team_limits:
-                stats["blue_max"] = get_config(CFG_MAX_BLUE_TEAMS, default=0)
-                stats["red_max"] = get_config(CFG_MAX_RED_TEAMS, default=0)
 
-        can_join_blue, blue_error = can_join_camp("blue", team.id)
-        can_join_red, red_error = can_join_camp("red", team.id)
+        join_status = get_join_status(counts, current_camp)
+        camps = [
+            {
+                "info": camp,
+                "count": counts.get(camp.slug, 0),
+                "max": camp.max_teams if enable_team_limits else 0,
+                "can_join": join_status[camp.slug][0],
+                "error": join_status[camp.slug][1],
+                "card": Markup(overview["cards"].get(camp.slug, "")),
+            }
+            for camp in get_registry().camps_of(context.match_scope)
+        ]
 
         # Deadline formatée
         deadline_formatted = _format_deadline()
 
         return render_template(
             "camps_select.html",
+            camps=camps,
             current_camp=current_camp,
+            current_camp_info=context.camp_info,
             can_change=can_change,
             allow_change=allow_change,
-            can_join_blue=can_join_blue,
-            can_join_red=can_join_red,
-            blue_error=blue_error,
-            red_error=red_error,
             change_error=error_msg if not can_change else None,
             deadline=deadline_formatted,
             stats=stats,
+            stats_html=Markup(overview["stats"]),
         )
 
     @bp.route("/api/v1/camps/select", methods=["POST"])
     @authed_only
     def select_camp_api():
         """API pour sélectionner le camp de son équipe."""
-        team = get_current_team()
+        context = get_context()
+        team = context.team
         if not team:
             return jsonify({"success": False, "error": "Vous devez être dans une équipe"}), 403
 
         camp = (request.json or {}).get("camp")
-        if camp not in VALID_CAMPS:
+        registry = get_registry()
+        if camp not in registry:
             return jsonify({"success": False, "error": "Camp invalide"}), 400
+        # Une équipe change de côté dans son match ; changer de match relève des admins
+        if context.side and registry.match_id_of(camp) != context.match_id:
+            return jsonify({"success": False, "error": "Ce camp appartient à un autre match"}), 403
 
-        can_change, error_msg = can_change_camp(team.id)
+        can_change, error_msg = context.change_status
         if not can_change:
             return jsonify({"success": False, "error": error_msg}), 403
 
-        can_join, join_error = can_join_camp(camp, team.id)
+        can_join, join_error = can_join_camp(camp, context.side)
         if not can_join:
             return jsonify({"success": False, "error": join_error}), 403
 
         try:
-            tc = TeamCamp.query.filter_by(team_id=team.id).first()
-            if tc:
-                old_camp = tc.camp
-                tc.camp = camp
+            old_camp = context.camp
+            get_store().set_team_side(team.id, registry.side_of_camp(camp))
+            context.forget_camp()
+            if old_camp:
                 message = f"Camp changé de {old_camp} vers {camp}"
             else:
-                db.session.add(TeamCamp(team_id=team.id, camp=camp))
                 message = f"Vous avez rejoint le camp {camp}"
 
-            db.session.commit()
+            events.notify_team_camp_changed(team.id, old_camp, camp)
             logger.info("[CTFd Camps] Équipe %s → camp %s", team.name, camp)
             return jsonify({"success": True, "message": message})
 
@@ -275,39 +798,147 @@ def create_blueprint() -> Blueprint:
             logger.exception("[CTFd Camps] Erreur sélection camp")
             return jsonify({"success": False, "error": "Erreur lors de la sauvegarde"}), 500
 
+    @bp.route("/api/v1/camps/events")
+    @authed_only
+    def camp_events_stream():
+        """Flux SSE des notifications joueurs (remplace le polling du board)."""
+        context = get_context()
+        team = context.team
+        if not team:
+            return jsonify({"success": False, "error": "Vous devez être dans une équipe"}), 403
+
+        team_camp = context.camp
+
+        channels = [CHANNEL_PUBLIC, events.team_channel(team.id)]
+        version_names = [VERSION_CONFIG]
+        if team_camp:
+            channels.append(events.camp_channel(team_camp))
+            version_names.append(VERSION_CHALLENGES_PREFIX + team_camp)
+        if context.settings["show_public_stats"] or context.settings["enable_team_limits"]:
+            channels.append(CHANNEL_COUNTS)
+            version_names.append(VERSION_COUNTS)
+
+        hello = events.CampEvent(EVENT_HELLO, {
+            "camp": team_camp,
+            "versions": get_versions(*version_names),
+        })
+        deadline = context.settings["change_deadline"]
+        # Prochaine bascule de manche : camp de l'équipe calculé d'avance, le flux
+        # le signale à l'heure dite et les clients rechargent (avec étalement)
+        registry = get_registry()
+        transition = registry.next_transition(match_id=context.match_id) if team_camp else None
+        next_camp = registry.camp_of_side(context.side, transition) if transition else None
+        # Ouvertures / fermetures de fenêtres de publication du camp, signalées de même
+        releases = get_release_index().transitions_for(context.camp_mask) if team_camp else []
+
+        # Aucune connexion BDD conservée pendant le flux
+        db.session.close()
+
+        stream = events.get_broker().subscribe(tuple(channels))
+        return Response(
+            _player_stream(
+                hello, stream, deadline, transition if next_camp != team_camp else None, next_camp, releases,
+            ),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
     @bp.route("/api/v1/camps/challenges")
     @authed_only
     def get_challenges_with_camps():
-        """API pour récupérer les challenges filtrés par camp."""
-        team = get_current_team()
-        if not team:
+        """
+        API pour récupérer les challenges filtrés par camp.
+
+        Options : ``?fields=id,category``, ``?category=web`` (répétable),
+        ``?limit=50&cursor=<next_cursor>``.
+        """
+        context = get_context()
+        if not context.team:
             return jsonify({"success": False, "error": "Vous devez être dans une équipe"}), 403
 
-        tc = TeamCamp.query.filter_by(team_id=team.id).first()
-        if not tc:
+        team_camp = context.camp
+        if not team_camp:
             return jsonify({"success": False, "error": "Vous devez choisir un camp"}), 403
 
-        team_camp = tc.camp
+        options, error = challenge_list.parse_list_options(request.args)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
 
-        # Charger les camps en une requête
-        camps_map = {cc.challenge_id: cc.camp for cc in ChallengeCamp.query.all()}
+        if not options:
+            # Réponse commune à toutes les équipes du camp, servie pré-encodée
+            return challenge_list.camp_challenges_response(team_camp, "gzip" in request.accept_encodings)
 
-        challenges = Challenges.query.filter_by(state="visible").all()
-        result = [
-            {
-                "id": ch.id,
-                "name": ch.name,
-                "category": ch.category,
-                "value": ch.value,
-                "camp": camps_map.get(ch.id),
-                "type": ch.type,
-                "state": ch.state,
-            }
-            for ch in challenges
-            if camps_map.get(ch.id) is None or camps_map.get(ch.id) == team_camp
-        ]
+        data, next_cursor = challenge_list.query_camp_challenges(context.camp_mask, **options)
+        result = {"success": True, "data": data, "team_camp": team_camp}
+        if "limit" in options:
+            result["next_cursor"] = next_cursor
+        return jsonify(result)
+
+    @bp.route("/api/v1/camps/challenges/details")
+    @check_challenge_visibility
+    @during_ctf_time_only
+    @require_verified_emails
+    @authed_only
+    def get_challenge_details():
+        """
+        Détails de plusieurs challenges en une réponse (``?ids=1,2,3``).
+
+        Les challenges d'un autre camp sont retirés du résultat et comptés
+        comme un seul accès refusé ; les challenges cachés, verrouillés ou
+        inexistants sont simplement absents.
+        """
+        context = get_context()
+        team = context.team
+        if not team:
+            return jsonify({"success": False, "error": "Vous devez être dans une équipe"}), 403
+        team_camp = context.camp
+        if not team_camp:
+            return jsonify({"success": False, "error": "Vous devez choisir un camp"}), 403
+
+        ids, error = challenge_list.parse_detail_ids(request.args)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
 
-        return jsonify({"success": True, "data": result, "team_camp": team_camp})
+        wait = throttle.retry_after(team.id)
+        if wait:
+            return throttled_response(wait)
+
+        # Même règle que le contrôle d'accès unitaire, fenêtres de publication comprises
+        store = get_store()
+        stored = store.challenge_masks_for(ids)
+        masks = get_release_index().effective_masks(ids, stored)
+        team_mask = context.camp_mask
+        denied = [cid for cid in ids if masks.get(cid) and not masks[cid] & team_mask]
+        allowed = [cid for cid in ids if not masks.get(cid) or masks[cid] & team_mask]
+
+        details = challenge_list.query_challenge_details(allowed, team.id)
+
+        if denied:
+            denied_mask = 0
+            for cid in denied:
+                denied_mask |= stored.get(cid, 0)
+            log_denial(
+                team, denied[0], team_camp, get_registry().describe(denied_mask) or CAMP_NONE,
+                detail=f"[lot : {len(denied)} challenge(s) refusé(s) : {', '.join(map(str, denied))}]",
+            )
+            throttle.record_denial(team.id, team.name)
+
+        return jsonify({"success": True, "data": [details[cid] for cid in ids if cid in details]})
+
+    @bp.route("/api/v1/camps/scoreboard")
+    @check_score_visibility
+    def camps_scoreboard():
+        """
+        Totaux et classements par camp (maintenus incrémentalement) ;
+        ``?match=<slug>`` limite la réponse aux camps d'un match.
+        """
+        scope = ALL_MATCHES
+        if request.args.get("match"):
+            match = get_registry().get_match(request.args["match"])
+            if match is None:
+                return jsonify({"success": False, "error": "Match inconnu"}), 404
+            scope = match.id
+        return jsonify({"success": True, "data": get_scoreboard(scope)})
 
     return bp
 
@@ -335,13 +966,332 @@ def _load_admin_config() -> dict:
         "show_public_stats": get_config(CFG_SHOW_PUBLIC_STATS, default=False),
         "show_challenge_badges": get_config(CFG_SHOW_CHALLENGE_BADGES, default=False),
         "enable_team_limits": get_config(CFG_ENABLE_TEAM_LIMITS, default=False),
-        "max_blue_teams": get_config(CFG_MAX_BLUE_TEAMS, default=0),
-        "max_red_teams": get_config(CFG_MAX_RED_TEAMS, default=0),
         "deadline": deadline_formatted,
         "deadline_passed": deadline_passed,
+        "throttle": throttle.get_settings(),
+        "log_sinks": {spec["type"]: spec for spec in log_sinks.get_settings()},
+        "log_sink_stats": log_sinks.get_stats(),
+        "verifier_stats": verifier.get_stats(),
     }
 
 
+def _validate_camp_payload(data: dict, creating: bool) -> tuple[dict, str | None]:
+    """
+    Valide les champs d'un camp envoyés par la page admin.
+
+    Returns:
+        (champs_à_enregistrer, erreur_ou_None)
+    """
+    fields = {}
+
+    if creating:
+        slug = str(data.get("slug", "")).strip().lower()
+        if not _CAMP_SLUG_RE.match(slug) or slug in RESERVED_CAMP_SLUGS:
+            return {}, "Identifiant invalide (minuscules, chiffres, - et _, 32 caractères max)"
+        fields["slug"] = slug
+
+    if creating or "label" in data:
+        label = str(data.get("label", "")).strip()
+        if not label or len(label) > 64:
+            return {}, "Nom du camp invalide"
+        fields["label"] = label
+
+    if creating or "color" in data:
+        color = str(data.get("color", "#6c757d")).strip()
+        if not _CAMP_COLOR_RE.match(color):
+            return {}, "Couleur invalide (format #rrggbb)"
+        fields["color"] = color
+
+    for key, max_length in (("tagline", 64), ("icon", 16)):
+        if key in data:
+            fields[key] = str(data.get(key) or "").strip()[:max_length]
+    for key in ("description", "features"):
+        if key in data:
+            fields[key] = str(data.get(key) or "").strip()
+
+    if "max_teams" in data:
+        try:
+            fields["max_teams"] = max(0, int(data.get("max_teams") or 0))
+        except (TypeError, ValueError):
+            return {}, "Quota invalide"
+
+    if "match" in data:
+        # Identifiant du match, vide pour l'espace commun
+        slug = str(data.get("match") or "").strip()
+        match = get_registry().get_match(slug) if slug else None
+        if slug and match is None:
+            return {}, "Match inconnu"
+        fields["match_id"] = match.id if match else None
+
+    return fields, None
+
+
+def _camp_usage(camp: Camp) -> str | None:
+    """Description des équipes, challenges, manches et règles qui utilisent un camp (None si aucun)."""
+    if any(camp.slug in r.mapping or camp.slug in r.inverse for r in get_registry().rounds):
+        return "camp utilisé par une manche"
+    if any(rule.camp_mask & (1 << camp.bit) for rule in CampRule.query.all()):
+        return "camp utilisé par une règle"
+
+    store = get_store()
+    teams = store.team_counts().get(camp.slug, 0)
+    challenges = sum(1 for mask in store.challenge_masks().values() if mask & (1 << camp.bit))
+    if teams or challenges:
+        return f"{teams} équipe(s), {challenges} challenge(s)"
+    return None
+
+
+def _matches_for_display(registry, counts: dict[str, int]) -> list[dict]:
+    """Matchs de la page admin, avec leurs camps et leur nombre d'équipes."""
+    return [
+        {
+            "id": match.id,
+            "slug": match.slug,
+            "label": match.label,
+            "camps": match.camps,
+            "teams": sum(counts.get(slug, 0) for slug in match.slugs),
+        }
+        for match in registry.matches
+    ]
+
+
+def _validate_rule_payload(data: dict) -> tuple[dict, str | None]:
+    """
+    Valide une règle de camp envoyée par la page admin. ``camps`` suit le
+    format du champ camp des challenges ("none" : règle neutre, qui
+    soustrait ses challenges aux règles suivantes).
+
+    Returns:
+        (champs_à_enregistrer, erreur_ou_None)
+    """
+    kind = str(data.get("kind", "")).strip()
+    if kind not in RULE_KINDS:
+        return {}, "Type de règle invalide"
+    pattern = str(data.get("pattern", "")).strip()
+    if not pattern or len(pattern) > RULE_PATTERN_MAX_LENGTH:
+        return {}, "Motif invalide"
+    mask = parse_camp_selection(data.get("camps") or CAMP_NONE)
+    if mask is None:
+        return {}, "Camps invalides (camps inconnus ou de matchs différents)"
+    return {"kind": kind, "pattern": pattern, "camp_mask": mask}, None
+
+
+def _rules_for_display(registry) -> list[dict]:
+    """Règles de la page admin, par position, avec le nombre de challenges assignés."""
+    counts = rules.rule_counts()
+    return [
+        {
+            "id": rule.id,
+            "kind": rule.kind,
+            "pattern": rule.pattern,
+            "camps": registry.camps_for(rule.camp_mask),
+            "challenges": counts.get(rule.id, 0),
+        }
+        for rule in rules.get_rules().rules
+    ]
+
+
+def _validate_round_payload(data: dict, registry) -> tuple[dict, str | None]:
+    """
+    Valide une manche envoyée par la page admin.
+
+    La correspondance doit être une permutation des camps du match de la
+    manche (``match``, vide pour l'espace commun) : chaque camp reste
+    occupé par exactement un côté (quotas et comptes inchangés).
+
+    Returns:
+        (champs_à_enregistrer, erreur_ou_None)
+    """
+    name = str(data.get("name", "")).strip()
+    if not name or len(name) > 64:
+        return {}, "Nom de manche invalide"
+
+    match_slug = str(data.get("match") or "").strip()
+    match = registry.get_match(match_slug) if match_slug else None
+    if match_slug and match is None:
+        return {}, "Match inconnu"
+    slugs = [info.slug for info in registry.camps_of(match.id if match else None)]
+
+    starts_at, error = _parse_utc(data.get("starts_at"))
+    if error:
+        return {}, error
+    starts_at = starts_at or _utcnow()
+
+    mapping = data.get("mapping") or {}
+    if not isinstance(mapping, dict):
+        return {}, "Correspondance invalide"
+    unknown = [slug for slug in list(mapping) + list(mapping.values()) if slug not in slugs]
+    if unknown:
+        return {}, f"Camp(s) hors du match : {', '.join(map(str, unknown))}"
+    full = {slug: mapping.get(slug, slug) for slug in slugs}
+    if sorted(full.values()) != sorted(full):
+        return {}, "Chaque camp doit être attribué à un seul côté"
+
+    return {
+        "name": name,
+        "starts_at": starts_at,
+        "match_id": match.id if match else None,
+        "mapping": json.dumps({side: camp for side, camp in full.items() if side != camp}),
+    }, None
+
+
+def _rounds_for_display(registry, match=None) -> list[dict]:
+    """
+    Manches de la page admin (toutes, ou celles d'un match), avec leur état
+    (passée, en cours, planifiée) dans le calendrier de leur match.
+    """
+    now = _utcnow()
+    rounds = []
+    for camp_round in registry.rounds:
+        if match is not None and camp_round.match_id != match.id:
+            continue
+        active = registry.active_round(now, match_id=camp_round.match_id)
+        if active is not None and camp_round.id == active.id:
+            status = "active"
+        else:
+            status = "planned" if camp_round.starts_at > now else "past"
+        rounds.append({
+            "id": camp_round.id,
+            "name": camp_round.name,
+            "starts_at": camp_round.starts_at,
+            "match": registry.matches_by_id.get(camp_round.match_id),
+            "status": status,
+            "swaps": [
+                (registry.get(side), registry.get(camp))
+                for side, camp in camp_round.mapping.items()
+            ],
+        })
+    return rounds
+
+
+def _parse_utc(value) -> tuple[datetime | None, str | None]:
+    """Date ISO envoyée par la page admin, en UTC naïf (None si vide)."""
+    if not value:
+        return None, None
+    try:
+        moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except (ValueError, TypeError):
+        return None, "Format de date invalide"
+    if moment.tzinfo:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment, None
+
+
+def _validate_release_payload(data: dict, registry) -> tuple[dict, str | None]:
+    """
+    Valide une fenêtre de publication envoyée par la page admin.
+
+    Returns:
+        (champs_à_enregistrer, erreur_ou_None)
+    """
+    try:
+        challenge_id = int(data.get("challenge_id"))
+    except (TypeError, ValueError):
+        return {}, "Challenge invalide"
+    if not db.session.query(Challenges.id).filter_by(id=challenge_id).scalar():
+        return {}, "Challenge introuvable"
+
+    camp = data.get("camp")
+    if camp not in registry:
+        return {}, "Camp invalide"
+
+    opens_at, error = _parse_utc(data.get("opens_at"))
+    if error:
+        return {}, error
+    closes_at, error = _parse_utc(data.get("closes_at"))
+    if error:
+        return {}, error
+    if opens_at is None and closes_at is None:
+        return {}, "Indiquez une date d'ouverture et/ou de fermeture"
+    if opens_at and closes_at and closes_at <= opens_at:
+        return {}, "La fermeture doit suivre l'ouverture"
+
+    return {"challenge_id": challenge_id, "camp": camp, "opens_at": opens_at, "closes_at": closes_at}, None
+
+
+def _releases_for_display(registry, camps=None) -> list[dict]:
+    """
+    Fenêtres de publication de la page admin (toutes, ou celles des camps
+    ``camps``), avec leur état (à venir, ouverte, fermée).
+    """
+    index = get_release_index()
+    windows = index.windows
+    if camps is not None:
+        scoped = {info.slug for info in camps}
+        windows = [window for window in windows if window.camp in scoped]
+    names = dict(db.session.query(Challenges.id, Challenges.name).filter(
+        Challenges.id.in_({window.challenge_id for window in windows})
+    )) if windows else {}
+    now = _utcnow()
+    releases = []
+    for window in sorted(windows, key=lambda w: (w.opens_at or datetime.min, w.challenge_id)):
+        if window.is_open(now):
+            status = "open"
+        else:
+            status = "planned" if window.opens_at and window.opens_at > now else "closed"
+        releases.append({
+            "id": window.id,
+            "challenge_id": window.challenge_id,
+            "challenge_name": names.get(window.challenge_id, f"Challenge #{window.challenge_id}"),
+            "camp": registry.get(window.camp),
+            "camp_slug": window.camp,
+            "opens_at": window.opens_at,
+            "closes_at": window.closes_at,
+            "status": status,
+        })
+    return releases
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _player_stream(
+    hello,
+    stream,
+    deadline: datetime | None,
+    transition: datetime | None,
+    next_camp: str | None,
+    releases: list[datetime],
+):
+    """
+    Ajoute au flux joueur l'évènement initial, la fermeture des changements
+    à la deadline, le changement de camp à la bascule de manche et la liste
+    des challenges modifiée à chaque bascule d'une fenêtre de publication.
+    """
+    # Déjà dépassée (ou absente) à la connexion : rien à signaler
+    closed = deadline is None or _deadline_passed(deadline)
+    for chunk in stream:
+        yield chunk
+        if hello is not None:
+            yield str(hello)
+            hello = None
+
+        # Vérifié à chaque évènement ou ping : aucune écriture ne signale la deadline
+        if not closed and _deadline_passed(deadline):
+            closed = True
+            yield str(events.CampEvent(EVENT_CAMP_CHANGE_CLOSED, {"deadline": deadline.isoformat()}))
+
+        # Ni la bascule de manche (aucune écriture à ce moment)
+        if transition is not None and _utcnow() >= transition:
+            transition = None
+            yield str(events.CampEvent(EVENT_TEAM_CAMP_CHANGED, {"camp": next_camp}))
+
+        # Ni les fenêtres de publication
+        if releases and _utcnow() >= releases[0]:
+            while releases and _utcnow() >= releases[0]:
+                releases.pop(0)
+            yield str(events.CampEvent(EVENT_CHALLENGES_CHANGED, {"challenge_id": None, "visible": None}))
+
+
+def _deadline_passed(deadline: datetime) -> bool:
+    try:
+        return datetime.now(timezone.utc) > deadline
+    except TypeError:
+        # Deadline sans fuseau horaire : même comportement que can_change_camp
+        return False
+
+
 def _format_deadline() -> str | None:
     """Formate la deadline pour affichage utilisateur."""
     deadline_str = get_config(CFG_CHANGE_DEADLINE, default="")
@@ -0,0 +1,54 @@
+"""
+Compteurs de version partagés du plugin CTFd Camps.
+
+Les versions sont stockées dans le cache CTFd (Redis en production) et
+incrémentées à chaque écriture qui modifie l'état observé par les joueurs.
+Elles permettent aux clients et aux workers de savoir, en une seule
+lecture, si leurs données sont encore à jour.
+"""
+
+import logging
+
+from CTFd.cache import cache
+
+from .constants import LOG_PREFIX, VERSION_KEY_PREFIX
+
+logger = logging.getLogger("CTFdCamps")
+
+
+def _key(name: str) -> str:
+    return VERSION_KEY_PREFIX + name
+
+
+def get_version(name: str) -> int:
+    """Retourne la version courante d'une donnée (0 si jamais modifiée)."""
+    try:
+        return int(cache.get(_key(name)) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def get_versions(*names: str) -> dict[str, int]:
+    """Lit plusieurs versions en un seul aller-retour vers le cache."""
+    try:
+        values = cache.get_many(*[_key(name) for name in names])
+    except Exception:
+        logger.exception("%s Erreur lecture des versions", LOG_PREFIX)
+        values = [None] * len(names)
+    return {name: int(value or 0) for name, value in zip(names, values)}
+
+
+def bump_version(name: str) -> int:
+    """Incrémente la version d'une donnée et retourne la nouvelle valeur."""
+    key = _key(name)
+    try:
+        # INCR atomique sur Redis, get + set sur les autres backends
+        value = cache.cache.inc(key)
+        if value is not None:
+            return int(value)
+    except Exception:
+        logger.exception("%s Erreur incrément de version %s", LOG_PREFIX, name)
+
+    value = get_version(name) + 1
+    cache.set(key, value, timeout=0)
+    return value
@@ -0,0 +1,301 @@
+"""
+Liste des challenges visibles par camp (/api/v1/camps/challenges).
+
+La réponse ne dépend que du camp de l'équipe : elle est construite une
+fois par camp et par version, encodée en JSON (et compressée en gzip si
+elle est assez grande) puis servie telle quelle depuis le cache CTFd.
+
+La clé de cache contient la version ``challenges:<camp>`` (incrémentée à
+chaque création, modification ou suppression d'un challenge concernant le
+camp), la version ``challenge_masks`` (modification des camps d'un
+challenge), la version ``releases`` et la dernière bascule passée des
+fenêtres de publication (voir ``releases``). Une durée de vie courte couvre les valeurs des challenges
+dynamiques, recalculées par CTFd sans passer par l'API admin.
+
+Les requêtes avec ``?fields=``, ``?category=`` ou pagination (``limit`` /
+``cursor``) ne passent pas par le cache : elles sont traduites en une
+requête SQL ne chargeant que les colonnes et les lignes demandées.
+
+Les détails de plusieurs challenges (/api/v1/camps/challenges/details)
+sont chargés de même : une requête par table (challenges, tags, fichiers,
+indices, résolutions de l'équipe) pour tout le lot.
+"""
+
+import gzip
+import json
+import logging
+
+import sqlalchemy as sa
+from flask import Response, url_for
+
+from CTFd.cache import cache
+from CTFd.models import ChallengeFiles, Challenges, Hints, Solves, Tags, Unlocks, db
+
+from .caching import get_versions
+from .constants import (
+    CHALLENGES_CACHE_GZIP,
+    CHALLENGES_CACHE_PREFIX,
+    CHALLENGES_CACHE_TIMEOUT,
+    CHALLENGES_DETAILS_MAX,
+    CHALLENGES_GZIP_MIN_SIZE,
+    CHALLENGES_PAGE_DEFAULT,
+    CHALLENGES_PAGE_MAX,
+    LOG_PREFIX,
+    VERSION_CHALLENGE_MASKS,
+    VERSION_CHALLENGES_PREFIX,
+    VERSION_RELEASES,
+)
+from .models import ChallengeCamp
+from .registry import get_registry
+from .releases import get_release_index
+
+logger = logging.getLogger("CTFdCamps")
+
+# Colonnes renvoyées par l'API, dans l'ordre de sérialisation
+_COLUMNS = {
+    "id": Challenges.id,
+    "name": Challenges.name,
+    "category": Challenges.category,
+    "value": Challenges.value,
+    "type": Challenges.type,
+    "state": Challenges.state,
+}
+
+
+# Champs acceptés par ?fields= (camp / camps sont dérivés du masque)
+FIELDS = tuple(_COLUMNS) + ("camp", "camps")
+
+
+def parse_list_options(args) -> tuple[dict, str | None]:
+    """
+    Lit les options ``fields``, ``category``, ``limit`` et ``cursor``.
+
+    Returns:
+        (options pour query_camp_challenges, message d'erreur ou None).
+        Des options vides signifient « liste complète » (servie depuis le cache).
+    """
+    options = {}
+
+    if args.get("fields"):
+        fields = [name.strip() for name in args["fields"].split(",") if name.strip()]
+        unknown = [name for name in fields if name not in FIELDS]
+        if unknown or not fields:
+            return {}, f"Champ(s) inconnu(s) : {', '.join(unknown)}. Champs disponibles : {', '.join(FIELDS)}"
+        options["fields"] = fields
+
+    categories = [c for c in args.getlist("category") if c]
+    if categories:
+        options["categories"] = categories
+
+    if "limit" in args or "cursor" in args:
+        try:
+            limit = int(args.get("limit", CHALLENGES_PAGE_DEFAULT))
+            cursor = int(args["cursor"]) if args.get("cursor") else None
+        except ValueError:
+            return {}, "Les paramètres limit et cursor doivent être des entiers"
+        if not 1 <= limit <= CHALLENGES_PAGE_MAX:
+            return {}, f"limit doit être compris entre 1 et {CHALLENGES_PAGE_MAX}"
+        options["limit"] = limit
+        options["after"] = cursor
+
+    return options, None
+
+
+def query_camp_challenges(
+    team_mask: int,
+    fields=FIELDS,
+    categories: list[str] | None = None,
+    after: int | None = None,
+    limit: int | None = None,
+) -> tuple[list[dict], int | None]:
+    """
+    Challenges visibles par un camp, en une requête limitée aux colonnes
+    demandées. Le filtre de camp (neutre, ou challenge du match du camp
+    avec le bit levé), les fenêtres de publication fermées, les catégories
+    et la pagination par curseur (id croissant) sont évalués en SQL.
+
+    Returns:
+        (challenges, curseur de la page suivante ou None).
+    """
+    names = [name for name in _COLUMNS if name in fields and name != "id"]
+    with_mask = "camp" in fields or "camps" in fields
+
+    # L'id est toujours sélectionné : il sert de curseur
+    entities = [Challenges.id] + [_COLUMNS[name] for name in names]
+    if with_mask:
+        entities.append(ChallengeCamp.camp_mask)
+
+    camp_mask = ChallengeCamp.camp_mask
+    # Seuls les challenges restreints du match du camp sont examinés (index sur match_id)
+    match_ids = get_registry().match_ids_for(team_mask)
+    match_id = match_ids.pop() if len(match_ids) == 1 else None
+    query = (
+        db.session.query(*entities)
+        .outerjoin(ChallengeCamp, ChallengeCamp.challenge_id == Challenges.id)
+        .filter(Challenges.state == "visible")
+        .filter(sa.or_(
+            camp_mask.is_(None),
+            camp_mask == 0,
+            sa.and_(ChallengeCamp.match_id == match_id, camp_mask.op("&")(team_mask) != 0),
+        ))
+    )
+    hidden = get_release_index().hidden_for(team_mask)
+    if hidden:
+        query = query.filter(Challenges.id.not_in(sorted(hidden)))
+    if categories:
+        query = query.filter(Challenges.category.in_(categories))
+    if after is not None:
+        query = query.filter(Challenges.id > after)
+    query = query.order_by(Challenges.id)
+    if limit:
+        query = query.limit(limit + 1)  # une ligne de plus pour savoir s'il reste une page
+
+    rows = query.all()
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1][0]
+
+    registry = get_registry()
+    result = []
+    for row in rows:
+        item = {"id": row[0]} if "id" in fields else {}
+        item.update(zip(names, row[1:1 + len(names)]))
+        if with_mask:
+            mask = row[-1] or 0
+            if "camp" in fields:
+                item["camp"] = registry.describe(mask)
+            if "camps" in fields:
+                item["camps"] = registry.slugs_for(mask)
+        result.append(item)
+    return result, next_cursor
+
+
+# Colonnes des détails d'un challenge (équivalent de GET /api/v1/challenges/<id>)
+_DETAIL_COLUMNS = {
+    "id": Challenges.id,
+    "name": Challenges.name,
+    "category": Challenges.category,
+    "value": Challenges.value,
+    "type": Challenges.type,
+    "description": Challenges.description,
+    "connection_info": Challenges.connection_info,
+    "max_attempts": Challenges.max_attempts,
+}
+
+
+def parse_detail_ids(args) -> tuple[list[int], str | None]:
+    """
+    Lit ``?ids=1,2,3`` (doublons retirés, ordre conservé).
+
+    Returns:
+        (ids, message d'erreur ou None).
+    """
+    try:
+        ids = list(dict.fromkeys(int(part) for part in args.get("ids", "").split(",") if part.strip()))
+    except ValueError:
+        return [], "ids doit être une liste d'entiers séparés par des virgules"
+    if not ids:
+        return [], "Paramètre ids manquant"
+    if len(ids) > CHALLENGES_DETAILS_MAX:
+        return [], f"Au plus {CHALLENGES_DETAILS_MAX} challenges par appel"
+    return ids, None
+
+
+def query_challenge_details(challenge_ids: list[int], team_id: int) -> dict[int, dict]:
+    """
+    Détails des challenges visibles dont l'équipe a résolu les prérequis.
+
+    Le filtre de camp est appliqué par l'appelant ; les challenges cachés
+    ou verrouillés sont simplement absents du résultat, comme un id inconnu.
+
+    Returns:
+        ``{challenge_id: détails}``.
+    """
+    if not challenge_ids:
+        return {}
+
+    solved = {
+        challenge_id
+        for (challenge_id,) in db.session.query(Solves.challenge_id).filter(Solves.team_id == team_id)
+    }
+    rows = (
+        db.session.query(*_DETAIL_COLUMNS.values(), Challenges.requirements)
+        .filter(Challenges.id.in_(challenge_ids), Challenges.state == "visible")
+        .all()
+    )
+
+    details = {}
+    for row in rows:
+        prerequisites = set((row[-1] or {}).get("prerequisites") or [])
+        if prerequisites - solved:
+            continue
+        item = dict(zip(_DETAIL_COLUMNS, row))
+        item.update(tags=[], files=[], hints=[], solved_by_me=item["id"] in solved)
+        details[item["id"]] = item
+    if not details:
+        return details
+
+    ids = list(details)
+    for challenge_id, value in db.session.query(Tags.challenge_id, Tags.value).filter(Tags.challenge_id.in_(ids)):
+        details[challenge_id]["tags"].append(value)
+
+    files = db.session.query(ChallengeFiles.challenge_id, ChallengeFiles.location).filter(
+        ChallengeFiles.challenge_id.in_(ids)
+    )
+    for challenge_id, location in files:
+        details[challenge_id]["files"].append(url_for("views.files", path=location))
+
+    # Contenu des seuls indices débloqués par l'équipe
+    unlocked = sa.select(Unlocks.target).where(Unlocks.team_id == team_id, Unlocks.type == "hints")
+    content = sa.case((Hints.id.in_(unlocked), Hints.content), else_=None)
+    hints = (
+        db.session.query(Hints.id, Hints.challenge_id, Hints.cost, content)
+        .filter(Hints.challenge_id.in_(ids))
+        .order_by(Hints.id)
+    )
+    for hint_id, challenge_id, cost, hint_content in hints:
+        hint = {"id": hint_id, "cost": cost}
+        if hint_content is not None:
+            hint["content"] = hint_content
+        details[challenge_id]["hints"].append(hint)
+
+    return details
+
+
+def _cache_key(camp: str) -> str:
+    versions = get_versions(VERSION_CHALLENGES_PREFIX + camp, VERSION_CHALLENGE_MASKS, VERSION_RELEASES)
+    return (
+        f"{CHALLENGES_CACHE_PREFIX}{camp}:"
+        f"{versions[VERSION_CHALLENGES_PREFIX + camp]}:{versions[VERSION_CHALLENGE_MASKS]}:"
+        f"{versions[VERSION_RELEASES]}:{get_release_index().epoch}"
+    )
+
+
+def _encode(camp: str, team_mask: int) -> dict:
+    body = json.dumps({
+        "success": True,
+        "data": query_camp_challenges(team_mask)[0],
+        "team_camp": camp,
+    }, separators=(",", ":")).encode("utf-8")
+
+    entry = {"json": body, "gzip": None}
+    if CHALLENGES_CACHE_GZIP and len(body) >= CHALLENGES_GZIP_MIN_SIZE:
+        entry["gzip"] = gzip.compress(body, compresslevel=6)
+    return entry
+
+
+def camp_challenges_response(camp: str, accept_gzip: bool) -> Response:
+    """Réponse pré-encodée de la liste des challenges d'un camp."""
+    key = _cache_key(camp)
+    entry = cache.get(key)
+    if entry is None:
+        entry = _encode(camp, get_registry().mask_of(camp))
+        cache.set(key, entry, timeout=CHALLENGES_CACHE_TIMEOUT)
+        logger.debug("%s Liste des challenges du camp %s mise en cache (%s)", LOG_PREFIX, camp, key)
+
+    headers = {"Vary": "Accept-Encoding"}
+    if accept_gzip and entry["gzip"] is not None:
+        headers["Content-Encoding"] = "gzip"
+        return Response(entry["gzip"], mimetype="application/json", headers=headers)
+    return Response(entry["json"], mimetype="application/json", headers=headers)
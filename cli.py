@@ -0,0 +1,189 @@
+"""
+Commandes CLI du plugin CTFd Camps.
+
+Disponibles via ``flask camps …`` (ou ``python manage.py camps …``).
+"""
+
+import json
+import logging
+
+import click
+from flask.cli import AppGroup
+
+from CTFd.models import db
+
+from .constants import LOG_PREFIX
+from .log_stats import refresh_rollups, reset_rollups
+from .membership import benchmark
+from .replica import get_status
+from .rules import compile_rules
+from .scoreboard import check_scores, rebuild_scoreboard
+from .seed import seed
+from .upsert import check_concurrency
+from .verifier import verify
+
+logger = logging.getLogger("CTFdCamps")
+
+camps_cli = AppGroup("camps", help="Administration du plugin CTFd Camps.")
+
+
+@camps_cli.command("rebuild-scoreboard")
+def rebuild_scoreboard_command():
+    """Reconstruit entièrement le scoreboard des camps."""
+    count = rebuild_scoreboard()
+    if count is None:
+        click.echo("Échec de la reconstruction du scoreboard (voir les logs).", err=True)
+        raise SystemExit(1)
+    logger.info("%s Scoreboard des camps reconstruit (%d équipes)", LOG_PREFIX, count)
+    click.echo(f"Scoreboard reconstruit : {count} équipe(s).")
+
+
+@camps_cli.command("check-scoreboard")
+@click.option("--fix", is_flag=True, help="Reconstruire le scoreboard en cas d'écart.")
+def check_scoreboard_command(fix):
+    """Compare le scoreboard incrémental à un recalcul complet."""
+    with db.engine.connect() as connection:
+        mismatches = check_scores(connection)
+
+    if not mismatches:
+        click.echo("Scoreboard cohérent.")
+        return
+
+    for mismatch in mismatches:
+        click.echo(
+            f"Équipe #{mismatch['team_id']} : attendu {mismatch['expected']}, "
+            f"trouvé {mismatch['actual']}"
+        )
+    click.echo(f"{len(mismatches)} écart(s) détecté(s).")
+
+    if fix:
+        rebuild_scoreboard_command.callback()
+    else:
+        raise SystemExit(1)
+
+
+@camps_cli.command("refresh-log-stats")
+@click.option("--rebuild", is_flag=True, help="Recalculer les agrégats depuis le premier log.")
+def refresh_log_stats_command(rebuild):
+    """Intègre les nouveaux logs d'accès aux statistiques agrégées."""
+    if rebuild:
+        with db.engine.begin() as connection:
+            reset_rollups(connection)
+    count = refresh_rollups()
+    click.echo(f"{count} log(s) intégré(s) aux statistiques.")
+
+
+@camps_cli.command("seed")
+@click.option("--teams", default=5000, show_default=True, help="Nombre d'équipes.")
+@click.option("--challenges", default=2000, show_default=True, help="Nombre de challenges.")
+@click.option("--logs", default=5_000_000, show_default=True, help="Nombre de logs d'accès refusés.")
+@click.option("--unassigned", default=0.1, show_default=True, help="Part des équipes sans camp.")
+@click.option("--prefix", default="seed", show_default=True, help="Préfixe des noms générés.")
+@click.option("--password", default="seed-password", show_default=True, help="Mot de passe des comptes.")
+@click.option("--random-seed", type=int, default=None, help="Graine, pour un jeu reproductible.")
+@click.option("--no-rollups", is_flag=True, help="Ne pas intégrer les logs aux statistiques.")
+@click.option("--output", type=click.Path(dir_okay=False), default="camps_seed.json", show_default=True,
+              help="Fichier des jetons et camps générés (lu par loadtest.py).")
+def seed_command(teams, challenges, logs, unassigned, prefix, password, random_seed, no_rollups, output):
+    """Génère un jeu de données synthétique pour les tests de charge."""
+    try:
+        dataset = seed(
+            teams=teams,
+            challenges=challenges,
+            logs=logs,
+            unassigned=unassigned,
+            prefix=prefix,
+            password=password,
+            random_seed=random_seed,
+            rollups=not no_rollups,
+        )
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+
+    with open(output, "w") as f:
+        json.dump(dataset, f)
+    click.echo(
+        f"{len(dataset['teams'])} équipe(s), {len(dataset['challenges'])} challenge(s) générés ; "
+        f"jetons écrits dans {output}."
+    )
+
+
+@camps_cli.command("bench-membership")
+@click.option("--iterations", default=10000, show_default=True, help="Recherches par backend.")
+@click.option("--write-every", default=0, show_default=True,
+              help="Invalider le côté d'une équipe toutes les N recherches, sans écriture SQL (0 = lecture seule).")
+@click.option("--random-seed", type=int, default=None, help="Graine, pour un tirage reproductible.")
+def bench_membership_command(iterations, write_every, random_seed):
+    """Compare les backends de stockage des appartenances (SQL / cache)."""
+    results = benchmark(iterations=iterations, write_every=write_every, random_seed=random_seed)
+    click.echo(f"{'backend':28} {'ops/s':>10} {'p50 µs':>9} {'p99 µs':>9} {'max µs':>9}")
+    for row in results:
+        click.echo(
+            f"{row['store']:28} {row['ops_per_s']:10.0f} {row['p50_us']:9.1f} "
+            f"{row['p99_us']:9.1f} {row['max_us']:9.1f}"
+        )
+
+
+@camps_cli.command("check-upsert")
+@click.option("--writers", default=8, show_default=True, help="Connexions écrivant la même clé simultanément.")
+@click.option("--rounds", default=20, show_default=True, help="Clés écrites (une course par clé).")
+def check_upsert_command(writers, rounds):
+    """Vérifie sur la base configurée que des upserts simultanés ne violent pas l'unicité."""
+    failed = False
+    for fallback in (False, True):
+        result = check_concurrency(db.engine, writers=writers, rounds=rounds, fallback=fallback)
+        label = "repli UPDATE / INSERT" if fallback else f"natif ({db.engine.dialect.name})"
+        ok = not result["errors"] and not result["duplicates"] and result["rows"] == rounds
+        failed = failed or not ok
+        click.echo(
+            f"{label:28} {'OK' if ok else 'ÉCHEC'} : {result['writes']}/{writers * rounds} écriture(s), "
+            f"{result['rows']} ligne(s), {len(result['duplicates'])} doublon(s)"
+        )
+        for error in result["errors"][:5]:
+            click.echo(f"  {error}")
+    if failed:
+        raise SystemExit(1)
+
+
+@camps_cli.command("compile-rules")
+def compile_rules_command():
+    """Recompile les règles de camp dans ``challenge_camps`` (après un import de challenges)."""
+    count = compile_rules()
+    click.echo(f"Règles compilées : {count} challenge(s) réassigné(s).")
+
+
+@camps_cli.command("replica-status")
+def replica_status_command():
+    """Mesure la position du réplica en lecture et indique s'il est utilisé."""
+    status = get_status(refresh=True)
+    if not status["enabled"]:
+        click.echo("Réplica désactivé (CAMPS_READ_REPLICA_URI absent) : lectures sur la primaire.")
+        return
+
+    click.echo(f"Réplica : {status['uri']}")
+    if status["lag"] is None:
+        click.echo(f"Position inconnue : {status['last_error'] or 'aucun battement rejoué'}")
+        raise SystemExit(1)
+    click.echo(f"Retard : {status['lag']:.2f} s (max {status['max_lag']:.0f} s)")
+    click.echo("Lectures sur le réplica." if status["usable"] else "Retard excessif : lectures sur la primaire.")
+    if not status["usable"]:
+        raise SystemExit(1)
+
+
+@camps_cli.command("verify")
+@click.option("--no-repair", is_flag=True, help="Signale les écarts sans recharger les copies.")
+def verify_command(no_repair):
+    """Compare les appartenances en cache (instantanés, cache partagé) à la base."""
+    divergences = verify(repair=not no_repair)
+    if not divergences:
+        click.echo("Caches cohérents avec la base.")
+        return
+    for divergence in divergences:
+        state = "corrigé" if divergence["repaired"] else "non corrigé"
+        click.echo(f"Écart sur {divergence['dataset']} ({divergence['groups']}) : {state}")
+    raise SystemExit(1)
+
+
+def register_cli(app) -> None:
+    """Ajoute le groupe ``camps`` aux commandes Flask de l'application."""
+    app.cli.add_command(camps_cli)
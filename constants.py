@@ -3,28 +3,203 @@ Constantes du plugin CTFd Camps.
 """
 
 # --- Valeurs de camp ---
+# Les camps sont définis dans la table ``camps`` ; blue/red sont les camps
+# créés par défaut lors de la première installation.
 CAMP_BLUE = "blue"
 CAMP_RED = "red"
-VALID_CAMPS = {CAMP_BLUE, CAMP_RED}
-VALID_CAMPS_WITH_NONE = {CAMP_BLUE, CAMP_RED, "none"}
+CAMP_NONE = "none"                 # valeur API : aucun camp / challenge neutre
+CAMP_MULTI = "multi"               # challenge visible par plusieurs camps
+CAMP_RULES = "rules"               # valeur API : camps du challenge donnés par les règles
+RESERVED_CAMP_SLUGS = {CAMP_NONE, CAMP_MULTI, CAMP_RULES}
+CAMP_RULES_MASK = -1               # g.camp_mask d'une requête CAMP_RULES (jamais enregistré)
 
-CAMP_LABELS = {
-    CAMP_BLUE: "Camp Bleu",
-    CAMP_RED: "Camp Rouge",
-}
+CAMP_SLUG_MAX_LENGTH = 32
+CAMP_SLUG_RE = r"^[a-z0-9][a-z0-9_-]{0,31}$"
+MAX_CAMPS = 63                     # bits 0..62 d'un BIGINT signé, tous matchs confondus
+MATCH_SELECTION_PREFIX = "match:"  # valeur "camp" d'un challenge : tous les camps d'un match
+
+# --- Règles de camp (rules.py) ---
+RULE_KINDS = ("category", "tag", "name")  # catégorie exacte, tag exact, motif de nom (* ?)
+RULE_PATTERN_MAX_LENGTH = 128
+
+DEFAULT_CAMPS = [
+    {
+        "slug": CAMP_BLUE,
+        "label": "Camp Bleu",
+        "tagline": "Défenseurs",
+        "icon": "🔵",
+        "color": "#007bff",
+        "description": (
+            "Protégez les systèmes et infrastructures contre les attaques. "
+            "Analysez les logs, renforcez la sécurité, détectez les intrusions."
+        ),
+        "features": "🛡️ Challenges de défense\n🔍 Analyse forensics\n🚨 Détection d'incidents",
+    },
+    {
+        "slug": CAMP_RED,
+        "label": "Camp Rouge",
+        "tagline": "Attaquants",
+        "icon": "🔴",
+        "color": "#dc3545",
+        "description": (
+            "Exploitez les vulnérabilités et pénétrez les systèmes adverses. "
+            "Trouvez les failles, développez des exploits, contournez les protections."
+        ),
+        "features": "⚔️ Challenges d'attaque\n💉 Exploitation de vulnérabilités\n🎯 Pentest offensif",
+    },
+]
 
 # --- Clés de configuration CTFd ---
 CFG_ALLOW_CHANGE = "camps_allow_change"
 CFG_SHOW_PUBLIC_STATS = "camps_show_public_stats"
 CFG_SHOW_CHALLENGE_BADGES = "camps_show_challenge_badges"
 CFG_ENABLE_TEAM_LIMITS = "camps_enable_team_limits"
-CFG_MAX_BLUE_TEAMS = "camps_max_blue_teams"
-CFG_MAX_RED_TEAMS = "camps_max_red_teams"
+CFG_MAX_BLUE_TEAMS = "camps_max_blue_teams"   # obsolète : migré vers camps.max_teams
+CFG_MAX_RED_TEAMS = "camps_max_red_teams"     # obsolète : migré vers camps.max_teams
 CFG_CHANGE_DEADLINE = "camps_change_deadline"
+CFG_THROTTLE_BURST = "camps_throttle_burst"        # refus tolérés d'affilée, par worker (0 = désactivé)
+CFG_THROTTLE_RATE = "camps_throttle_rate"          # refus regagnés par minute
+CFG_THROTTLE_COOLDOWN = "camps_throttle_cooldown"  # durée du blocage (secondes)
+CFG_LOG_SINKS = "camps_log_sinks"                  # destinations des refus (JSON)
+CFG_ACCESS_LOG_BACKFILLED = "camps_access_log_backfilled"  # migration de request_info faite
 
 # --- Limites ---
 MAX_LOGS_DISPLAYED = 100
 REQUEST_INFO_MAX_LENGTH = 500
+REQUEST_PATH_MAX_LENGTH = 255
+
+# --- Évènements temps réel (SSE) ---
+CHANNEL_ADMIN_LOGS = "admin.logs"
+CHANNEL_PUBLIC = "public"                # tous les joueurs
+CHANNEL_COUNTS = "counts"                # répartition des équipes (si publique)
+CHANNEL_CAMP_PREFIX = "camp."            # + slug du camp
+CHANNEL_TEAM_PREFIX = "team."            # + id de l'équipe
+EVENT_ACCESS_DENIED = "access_denied"
+EVENT_HELLO = "hello"
+EVENT_COUNTS_CHANGED = "counts_changed"
+EVENT_CHALLENGES_CHANGED = "challenges_changed"
+EVENT_CONFIG_CHANGED = "config_changed"
+EVENT_CAMP_CHANGE_CLOSED = "camp_change_closed"
+EVENT_TEAM_CAMP_CHANGED = "team_camp_changed"
+EVENT_ROUND_SCHEDULED = "round_scheduled"
+EVENT_RESYNC = "resync"            # reprise impossible : le client recharge son état
+EVENTS_HISTORY_SIZE = 200          # évènements conservés par canal pour la reprise
+EVENTS_CLIENT_QUEUE_SIZE = 100     # évènements en attente max par client
+EVENTS_REDIS_PREFIX = "ctfd_camps:events:"
+EVENTS_LISTENER_READY_TIMEOUT = 5  # secondes d'attente de l'écoute Redis avant la reprise
+EVENTS_SEQUENCE_KEY_PREFIX = "ctfd_camps:events-seq:"      # + canal : dernier id attribué
+EVENTS_HISTORY_KEY_PREFIX = "ctfd_camps:events-history:"   # + canal : derniers évènements (liste)
+SSE_PING_INTERVAL = 15             # secondes
+SSE_MAX_DURATION = 300             # secondes avant reconnexion forcée
+SSE_RETRY_MS = 3000
+
+# --- Versions partagées (cache CTFd) ---
+VERSION_KEY_PREFIX = "ctfd_camps:version:"
+VERSION_COUNTS = "counts"
+VERSION_CONFIG = "config"
+VERSION_REGISTRY = "registry"              # définition des camps
+VERSION_CHALLENGES_PREFIX = "challenges:"  # + slug du camp
+VERSION_SCOREBOARD = "scoreboard"
+VERSION_CHALLENGE_MASKS = "challenge_masks"  # masques de tous les challenges
+VERSION_TEAM_CAMPS = "team_camps"          # camp de chaque équipe
+VERSION_RELEASES = "releases"              # fenêtres de publication des challenges
+VERSION_LOG_SINKS = "log_sinks"            # destinations des refus
+
+# --- Scoreboard des camps ---
+SCOREBOARD_CACHE_PREFIX = "ctfd_camps:scoreboard:"
+SCOREBOARD_CACHE_TIMEOUT = 300     # secondes (la clé change à chaque version)
+SCOREBOARD_STALE_KEY = "ctfd_camps:scoreboard-stale"  # reconstruction après commit en échec
+SCOREBOARD_REBUILD_LOCK_TIMEOUT = 60  # secondes, verrou de la reconstruction à la lecture
+
+# --- Liste des challenges par camp (/api/v1/camps/challenges) ---
+CHALLENGES_CACHE_PREFIX = "ctfd_camps:challenges:"
+CHALLENGES_CACHE_TIMEOUT = 60      # secondes (valeurs des challenges dynamiques)
+CHALLENGES_CACHE_GZIP = True       # stocker aussi une version compressée
+CHALLENGES_GZIP_MIN_SIZE = 1024    # octets, en dessous la compression ne vaut pas le coût
+CHALLENGES_PAGE_DEFAULT = 100      # taille de page si seul ?cursor= est fourni
+CHALLENGES_PAGE_MAX = 500
+CHALLENGES_DETAILS_MAX = 200       # ids par appel de /api/v1/camps/challenges/details
+
+# --- Fragments HTML (/camps/select, bandeau de /challenges) ---
+FRAGMENT_CACHE_PREFIX = "ctfd_camps:fragment:"
+FRAGMENT_CACHE_TIMEOUT = 60        # secondes avant reconstruction (suppressions d'équipes)
+FRAGMENT_STALE_TIMEOUT = 30        # secondes pendant lesquelles l'ancien fragment reste servi
+FRAGMENT_LOCK_TIMEOUT = 10         # secondes, verrou de reconstruction
+FRAGMENT_WAIT_TIMEOUT = 0.5        # secondes d'attente du fragment construit par un autre worker
+FRAGMENT_WAIT_INTERVAL = 0.02
+
+# --- Limitation des accès refusés (token bucket par équipe) ---
+THROTTLE_DEFAULT_BURST = 10        # par worker (seaux en mémoire du processus)
+THROTTLE_DEFAULT_RATE = 2
+THROTTLE_DEFAULT_COOLDOWN = 300
+THROTTLE_BLOCK_KEY_PREFIX = "ctfd_camps:throttle:block:"  # + id de l'équipe
+THROTTLE_TEAMS_KEY = "ctfd_camps:throttle:teams"          # équipes bloquées (page admin)
+THROTTLE_LOCK_TIMEOUT = 5          # secondes, verrou de l'index des équipes bloquées
+THROTTLE_LOCK_WAIT = 0.5           # secondes d'attente du verrou avant d'abandonner la mise à jour
+THROTTLE_LOCAL_TTL = 5             # secondes avant revalidation d'un blocage connu localement
+
+# --- Destinations des refus (log_sinks.py) ---
+SINK_TYPES = ("database", "jsonl", "syslog")
+SINK_BUFFER_SIZE = 10000           # refus en attente par destination, au-delà ils sont perdus
+SINK_BATCH_SIZE = 500              # refus écrits par lot
+SINK_FLUSH_INTERVAL = 1.0          # secondes entre deux lots
+SINK_SHUTDOWN_TIMEOUT = 2.0        # secondes accordées au vidage des tampons à l'arrêt
+SINK_STATS_KEY_PREFIX = "ctfd_camps:sinks:"  # + type + ":" + compteur
+SINK_JSONL_DEFAULT_PATH = "camps_denials.jsonl"  # relatif au LOG_FOLDER de CTFd
+SINK_JSONL_DEFAULT_MAX_MB = 50
+SINK_JSONL_DEFAULT_BACKUPS = 5
+SINK_SYSLOG_DEFAULT_PORT = 514
+SINK_SYSLOG_FORMATS = ("syslog", "json")  # RFC 5424 ou JSON brut, un datagramme UDP par refus
+SINK_SYSLOG_PRI = 16 * 8 + 4       # facility local0, sévérité warning
+SINK_SYSLOG_APP_NAME = "ctfd-camps"
+
+# --- Agrégats des logs d'accès ---
+ROLLUP_BATCH_SIZE = 5000           # logs intégrés par transaction
+ROLLUP_PAGE_BATCHES = 1            # lots intégrés à l'affichage de la page des logs (le reste : CLI)
+ROLLUP_SAFETY_LAG = 10             # secondes : logs insérés depuis moins longtemps intégrés au passage suivant
+ROLLUP_TOP_SIZE = 10               # équipes / challenges affichés
+ROLLUP_TIMELINE_HOURS = 48
+
+# --- Historique des camps ---
+HISTORY_TEAM_CHUNK = 500           # équipes par requête de résolution en lot
+HISTORY_RESOLVE_MAX = 10000        # couples (équipe, date) par appel de l'API admin
+
+# --- Migrations ---
+BACKFILL_BATCH_SIZE = 1000
+
+# --- Stockage des appartenances (membership.py) ---
+MEMBERSHIP_STORE_CONFIG_KEY = "CAMPS_MEMBERSHIP_STORE"  # "sql" (défaut) ou "cache"
+MEMBERSHIP_TEAMS_KEY = "ctfd_camps:members:teams"            # hash team_id -> côté
+MEMBERSHIP_CHALLENGES_KEY = "ctfd_camps:members:challenges"  # hash challenge_id -> masque
+MEMBERSHIP_CACHE_TTL = 6 * 3600    # secondes : rechargement complet périodique (écarts corrigés par verifier.py)
+MEMBERSHIP_LOAD_LOCK_TIMEOUT = 30  # secondes : un seul worker recharge un hash
+MEMBERSHIP_LOAD_ATTEMPTS = 3       # relectures d'un hash modifié pendant son rechargement
+
+# --- Vérification des caches (verifier.py) ---
+VERIFY_INTERVAL_CONFIG_KEY = "CAMPS_VERIFY_INTERVAL"  # clé app.config / variable d'environnement
+VERIFY_INTERVAL = 60               # secondes entre deux vérifications par worker (0 = désactivée)
+VERIFY_CONFIRM_DELAY = 1.0         # secondes avant de confirmer un écart (écriture en cours de publication)
+VERIFY_STATS_KEY_PREFIX = "ctfd_camps:verify:"  # + compteur
+
+# --- Réplica en lecture (replica.py) ---
+REPLICA_URI_CONFIG_KEY = "CAMPS_READ_REPLICA_URI"          # URI SQLAlchemy du réplica (absent = primaire seule)
+REPLICA_MAX_LAG_CONFIG_KEY = "CAMPS_READ_REPLICA_MAX_LAG"  # surcharge de REPLICA_MAX_LAG
+REPLICA_MAX_LAG = 5.0              # secondes : au-delà, lectures sur la primaire
+REPLICA_HEARTBEAT_INTERVAL = 1     # secondes entre deux battements (tous workers confondus)
+REPLICA_CHECK_INTERVAL = 1.0       # secondes entre deux mesures de position par processus
+REPLICA_RETRY_INTERVAL = 10.0      # secondes d'éviction d'un réplica en erreur
+REPLICA_HEARTBEAT_LOCK_KEY = "ctfd_camps:replica:beat"
+REPLICA_WRITTEN_KEY_PREFIX = "ctfd_camps:replica:written:"  # + donnée : date de la dernière écriture
+REPLICA_SESSION_KEY = "camps_primary_write"  # session Flask : date de la dernière écriture du client
+REPLICA_DATASET_ACCESS_LOGS = "camp_access_logs"  # donnée passée à note_write par les lots de logs
+
+# --- Jeu de données de test (flask camps seed) ---
+SEED_BATCH_SIZE = 10000            # lignes par INSERT (executemany)
+SEED_LOG_HOURS = 48                # logs répartis sur cette durée
+SEED_TOKEN_DAYS = 30               # validité des jetons d'API générés
+
+# --- Démarrage ---
+PRELOAD_CONFIG_KEY = "CAMPS_PRELOAD"  # clé app.config / variable d'environnement (préchargement avant fork)
 
 # --- Logging ---
 LOG_PREFIX = "[CTFd Camps]"
@@ -0,0 +1,102 @@
+"""
+Contexte de camp de la requête en cours.
+
+Une même requête interroge l'équipe courante et son camp à plusieurs
+endroits : hooks before/after_request, route, context processors et
+templates. ``get_context()`` retourne un objet unique par requête (stocké
+dans ``g``) dont chaque donnée est calculée au premier accès puis
+conservée : une recherche de l'équipe et une lecture de son camp au plus
+par requête, quel que soit le nombre de consommateurs.
+"""
+
+from functools import cached_property
+
+from flask import g
+
+from CTFd.utils.config import get_config
+from CTFd.utils.user import get_current_team_attrs
+
+from .constants import (
+    CFG_ALLOW_CHANGE,
+    CFG_ENABLE_TEAM_LIMITS,
+    CFG_SHOW_CHALLENGE_BADGES,
+    CFG_SHOW_PUBLIC_STATS,
+)
+from .helpers import change_eligibility, get_change_deadline
+from .membership import get_store
+from .registry import ALL_MATCHES, get_registry
+
+
+class CampContext:
+    """Équipe, camp, réglages et droit de changement de la requête, calculés à la demande."""
+
+    @cached_property
+    def team(self):
+        """Attributs de l'équipe courante (None hors équipe)."""
+        return get_current_team_attrs()
+
+    @property
+    def team_id(self) -> int | None:
+        return self.team.id if self.team else None
+
+    @cached_property
+    def side(self) -> str | None:
+        """Côté enregistré de l'équipe."""
+        return get_store().team_side(self.team.id) if self.team else None
+
+    @cached_property
+    def camp(self) -> str | None:
+        """Camp effectif de l'équipe pendant la manche active."""
+        return get_registry().camp_of_side(self.side) if self.side else None
+
+    @property
+    def camp_info(self):
+        return get_registry().get(self.camp)
+
+    @property
+    def camp_mask(self) -> int:
+        return get_registry().mask_of(self.camp) if self.camp else 0
+
+    @property
+    def match_id(self) -> int | None:
+        """Match de l'équipe (None : camp de l'espace commun ou aucun camp)."""
+        return get_registry().match_id_of(self.side)
+
+    @property
+    def match_scope(self):
+        """Camps proposés à l'équipe : ceux de son match, ou tous tant qu'elle n'a pas de camp."""
+        return self.match_id if self.side else ALL_MATCHES
+
+    @cached_property
+    def settings(self) -> dict:
+        """Réglages du plugin lus dans la configuration CTFd."""
+        return {
+            "allow_change": get_config(CFG_ALLOW_CHANGE, default=True),
+            "show_public_stats": get_config(CFG_SHOW_PUBLIC_STATS, default=False),
+            "enable_team_limits": get_config(CFG_ENABLE_TEAM_LIMITS, default=False),
+            "show_challenge_badges": get_config(CFG_SHOW_CHALLENGE_BADGES, default=False),
+            "change_deadline": get_change_deadline(),
+        }
+
+    @cached_property
+    def change_status(self) -> tuple[bool, str]:
+        """(peut_changer, raison_si_non) pour l'équipe courante."""
+        settings = self.settings
+        return change_eligibility(bool(self.side), settings["change_deadline"], settings["allow_change"])
+
+    @property
+    def can_change(self) -> bool:
+        return bool(self.team) and self.change_status[0]
+
+    def forget_camp(self) -> None:
+        """À appeler après un changement de camp de l'équipe dans la requête."""
+        for name in ("side", "camp", "change_status"):
+            self.__dict__.pop(name, None)
+
+
+def get_context() -> CampContext:
+    """Contexte de la requête en cours (créé au premier appel)."""
+    context = g.get("camps_context")
+    if context is None:
+        context = g.camps_context = CampContext()
+    return context
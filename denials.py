@@ -0,0 +1,65 @@
+"""
+Enregistrement des accès refusés (challenge d'un autre camp).
+
+Chaque refus produit un message du logger et un enregistrement remis aux
+destinations configurées (``log_sinks`` : table ``camp_access_logs``,
+fichier JSON Lines, syslog), écrit en arrière-plan par lots. Une requête
+portant sur plusieurs challenges (détails en lot) produit un seul refus
+agrégé : un enregistrement pour le premier challenge refusé, les autres
+étant énumérés dans ``request_info``.
+"""
+
+import logging
+from datetime import datetime, timezone
+
+from flask import jsonify, request
+
+from CTFd.utils.user import get_ip
+
+from . import log_sinks
+from .constants import LOG_PREFIX, REQUEST_INFO_MAX_LENGTH, REQUEST_PATH_MAX_LENGTH
+
+logger = logging.getLogger("CTFdCamps")
+
+
+def log_denial(team, challenge_id: int, team_camp: str, challenge_camp: str, detail: str | None = None) -> None:
+    """
+    Enregistre une tentative d'accès non autorisée de la requête en cours.
+
+    Args:
+        detail: complément ajouté à ``request_info`` (refus agrégé).
+    """
+    logger.warning(
+        "%s Accès refusé: challenge %d (camp %s) → équipe %s (camp %s)%s",
+        LOG_PREFIX, challenge_id, challenge_camp, team.name, team_camp, f" [{detail}]" if detail else "",
+    )
+    try:
+        ip = get_ip(req=request)
+        info = f"{request.method} {request.url} (IP: {ip})"
+        if detail:
+            info = f"{info} {detail}"
+        log_sinks.dispatch({
+            "team_id": team.id,
+            "team_name": team.name,
+            "challenge_id": challenge_id,
+            "team_camp": team_camp,
+            "challenge_camp": challenge_camp,
+            "request_info": info[:REQUEST_INFO_MAX_LENGTH],
+            "method": request.method[:10],
+            "path": request.path[:REQUEST_PATH_MAX_LENGTH],
+            "ip": (ip or "")[:45],
+            "timestamp": datetime.now(timezone.utc),
+        })
+    except Exception:
+        logger.exception("%s Erreur logging accès", LOG_PREFIX)
+
+
+def throttled_response(wait: int):
+    """Réponse 429 d'une équipe bloquée pour sondage (``wait`` : secondes restantes)."""
+    response = jsonify({
+        "success": False,
+        "error": "Trop de tentatives d'accès refusées, réessayez plus tard",
+    })
+    response.status_code = 429
+    response.headers["Retry-After"] = str(wait)
+    return response
@@ -0,0 +1,487 @@
+"""
+Diffusion d'évènements temps réel (Server-Sent Events) du plugin CTFd Camps.
+
+Un broker unique par processus distribue les évènements aux clients connectés :
+  - en mémoire (fan-out local) lorsqu'un seul worker tourne ;
+  - via un canal pub/sub Redis lorsque CTFd utilise Redis comme cache,
+    afin que tous les workers reçoivent les évènements publiés par les autres.
+
+Les évènements d'un canal « à reprise » (logs admin) sont numérotés par
+une séquence propre au canal, attribuée à la publication : les ids d'un
+canal arrivent donc toujours dans l'ordre, quel que soit le worker qui
+publie (avec Redis, numérotation, historique et publication sont faits
+par un seul script Lua, atomique). Le canal conserve un court historique
+pour la reprise d'un flux interrompu (en-tête ``Last-Event-ID``) ; si
+l'historique ne couvre plus l'écart, le client reçoit un évènement
+``resync`` et recharge la page.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from queue import Empty, Full, Queue
+
+from CTFd.cache import cache
+
+from .caching import bump_version
+from .registry import get_registry
+from .constants import (
+    CHANNEL_CAMP_PREFIX,
+    CHANNEL_COUNTS,
+    CHANNEL_PUBLIC,
+    CHANNEL_TEAM_PREFIX,
+    EVENT_CHALLENGES_CHANGED,
+    EVENT_CONFIG_CHANGED,
+    EVENT_COUNTS_CHANGED,
+    EVENT_RESYNC,
+    EVENT_ROUND_SCHEDULED,
+    EVENT_TEAM_CAMP_CHANGED,
+    EVENTS_CLIENT_QUEUE_SIZE,
+    EVENTS_HISTORY_KEY_PREFIX,
+    EVENTS_HISTORY_SIZE,
+    EVENTS_LISTENER_READY_TIMEOUT,
+    EVENTS_REDIS_PREFIX,
+    EVENTS_SEQUENCE_KEY_PREFIX,
+    LOG_PREFIX,
+    SSE_MAX_DURATION,
+    SSE_PING_INTERVAL,
+    SSE_RETRY_MS,
+    VERSION_CHALLENGES_PREFIX,
+    VERSION_CONFIG,
+    VERSION_COUNTS,
+)
+
+logger = logging.getLogger("CTFdCamps")
+
+
+class CampEvent:
+    """Évènement diffusé sur un canal (sérialisable au format SSE)."""
+
+    __slots__ = ("id", "type", "data")
+
+    def __init__(self, type: str, data, id: int | None = None):
+        self.id = id
+        self.type = type
+        self.data = data
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "type": self.type, "data": self.data}
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "CampEvent":
+        return cls(payload.get("type"), payload.get("data"), payload.get("id"))
+
+    def __str__(self) -> str:
+        lines = []
+        if self.id is not None:
+            lines.append(f"id: {self.id}")
+        if self.type:
+            lines.append(f"event: {self.type}")
+        data = self.data if isinstance(self.data, str) else json.dumps(self.data)
+        lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+        return "\n".join(lines) + "\n\n"
+
+
+class CampEventBroker:
+    """Fan-out en mémoire avec séquence et historique borné par canal."""
+
+    # Séquences communes à tous les workers : un id lu sur l'un vaut pour les autres
+    shared = False
+
+    def __init__(self, history_size: int = EVENTS_HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._subscribers: dict[str, set[Queue]] = {}
+        self._history: dict[str, deque] = {}
+        self._sequences: dict[str, int] = {}
+        self._history_size = history_size
+
+    # -- Publication -------------------------------------------------------
+
+    def publish(self, channel: str, event: CampEvent, resumable: bool = False) -> None:
+        """
+        Publie un évènement sur un canal.
+
+        Args:
+            resumable: numérote l'évènement (séquence du canal) et le
+                conserve dans l'historique pour la reprise.
+        """
+        self._dispatch(channel, event, sequence=resumable)
+
+    def _dispatch(self, channel: str, event: CampEvent, sequence: bool = False) -> None:
+        """Distribue un évènement aux abonnés locaux et l'ajoute à l'historique."""
+        # Numérotation, historique et mise en file sous le même verrou :
+        # les abonnés reçoivent les ids du canal dans l'ordre
+        with self._lock:
+            if sequence:
+                event.id = self._sequences.get(channel, 0) + 1
+                self._sequences[channel] = event.id
+            if event.id is not None:
+                self._remember(channel, event)
+            for q in self._subscribers.get(channel, ()):
+                try:
+                    q.put_nowait(event)
+                except Full:
+                    # Client trop lent : on abandonne l'évènement, il sera
+                    # récupéré via Last-Event-ID à la reconnexion.
+                    pass
+
+    def _remember(self, channel: str, event: CampEvent) -> None:
+        history = self._history.setdefault(channel, deque(maxlen=self._history_size))
+        history.append(event)
+
+    # -- Reprise -----------------------------------------------------------
+
+    def last_id(self, channel: str) -> int:
+        """Dernier id attribué sur le canal (0 si aucun)."""
+        with self._lock:
+            return self._sequences.get(channel, 0)
+
+    def _history_of(self, channel: str) -> list[CampEvent]:
+        with self._lock:
+            return list(self._history.get(channel, ()))
+
+    def replay(self, channel: str, last_event_id: int) -> list[CampEvent] | None:
+        """
+        Retourne les évènements postérieurs à ``last_event_id`` depuis l'historique.
+
+        Returns:
+            La liste des évènements manquants, ou None si l'historique ne
+            remonte pas assez loin (ou si la séquence a été réinitialisée).
+        """
+        current = self.last_id(channel)
+        if last_event_id == current:
+            return []
+        if last_event_id > current and not self.shared:
+            # Séquence propre au processus : id attribué par un autre worker,
+            # rien à rejouer ici, le flux reprend en direct (pas de resync en boucle)
+            return []
+        history = self._history_of(channel)
+        if last_event_id > current or not history or history[0].id > last_event_id + 1:
+            return None
+        return [ev for ev in history if ev.id > last_event_id]
+
+    # -- Abonnement --------------------------------------------------------
+
+    def subscribe(
+        self,
+        channels: str | tuple[str, ...],
+        last_event_id: int | None = None,
+        max_duration: float = SSE_MAX_DURATION,
+    ):
+        """
+        Générateur SSE pour un client.
+
+        Args:
+            channels: canal (ou tuple de canaux) à écouter.
+            last_event_id: dernier identifiant reçu par le client (reprise
+                d'un canal unique ; voir ``last_id`` pour la première
+                connexion, si le broker est ``shared``).
+            max_duration: durée maximale du flux avant de laisser le client
+                se reconnecter (libère le worker et rafraîchit la session).
+        """
+        channels = (channels,) if isinstance(channels, str) else tuple(channels)
+        # Les séquences sont propres à chaque canal : pas de reprise sur plusieurs
+        resumable = len(channels) == 1
+        q: Queue = Queue(maxsize=EVENTS_CLIENT_QUEUE_SIZE)
+        for channel in channels:
+            self._register(channel, q)
+
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+
+            # Reprise : abonnement enregistré (et relais prêt) AVANT la lecture
+            # de l'historique pour ne perdre aucun évènement publié entre-temps.
+            self._wait_ready()
+            last_sent = last_event_id if resumable else None
+            if last_sent is not None:
+                missed = self.replay(channels[0], last_sent)
+                if missed is None:
+                    # Écart non couvert : le client recharge son état complet
+                    yield str(CampEvent(EVENT_RESYNC, {}))
+                    last_sent = None
+                for event in missed or ():
+                    last_sent = event.id
+                    yield str(event)
+
+            deadline = time.monotonic() + max_duration
+            while time.monotonic() < deadline:
+                try:
+                    event = q.get(timeout=SSE_PING_INTERVAL)
+                except Empty:
+                    yield ": ping\n\n"
+                    continue
+
+                if resumable and event.id is not None:
+                    # Ids croissants sur le canal : déjà envoyé par la reprise
+                    if last_sent is not None and event.id <= last_sent:
+                        continue
+                    last_sent = event.id
+                yield str(event)
+        finally:
+            for channel in channels:
+                self._unregister(channel, q)
+
+    def _wait_ready(self) -> None:
+        """Attend que les évènements publiés parviennent aux abonnés locaux."""
+
+    def subscriber_count(self, channel: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+    def _register(self, channel: str, q: Queue) -> None:
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(q)
+
+    def _unregister(self, channel: str, q: Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+
+# Numérotation, historique et publication en une opération atomique : Redis
+# exécute les scripts l'un après l'autre, les ids sont publiés dans l'ordre
+_PUBLISH_SCRIPT = """
+local id = redis.call('INCR', KEYS[1])
+local message = id .. '\\n' .. ARGV[1]
+redis.call('RPUSH', KEYS[2], message)
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[2]), -1)
+redis.call('PUBLISH', KEYS[3], message)
+return id
+"""
+
+
+def _body(event: CampEvent) -> str:
+    return json.dumps({"type": event.type, "data": event.data})
+
+
+def _encode(event: CampEvent) -> str:
+    """Message Redis : ``id\\njson`` (id vide pour un évènement non numéroté)."""
+    return f"{'' if event.id is None else event.id}\n{_body(event)}"
+
+
+def _decode(message) -> CampEvent:
+    if isinstance(message, bytes):
+        message = message.decode()
+    head, _, body = message.partition("\n")
+    payload = json.loads(body)
+    return CampEvent(payload.get("type"), payload.get("data"), int(head) if head else None)
+
+
+class RedisCampEventBroker(CampEventBroker):
+    """
+    Broker multi-workers : publication via Redis pub/sub.
+
+    Chaque processus écoute le préfixe des canaux du plugin dans un thread
+    (greenlet sous gevent) démarré avec le broker (relancé au premier
+    abonnement après un fork), et redistribue localement les évènements
+    reçus. Un abonnement attend que l'écoute soit confirmée par Redis
+    avant de relire l'historique : un évènement publié entre la reprise et
+    l'abonnement pub/sub serait sinon perdu sans ``resync``. Séquences et
+    historiques des canaux à reprise sont stockés dans Redis, communs à
+    tous les workers.
+    """
+
+    shared = True
+
+    def __init__(self, client, history_size: int = EVENTS_HISTORY_SIZE):
+        super().__init__(history_size)
+        self._client = client
+        self._publish_script = client.register_script(_PUBLISH_SCRIPT)
+        self._listener: threading.Thread | None = None
+        self._listener_lock = threading.Lock()
+        # Levé quand Redis a confirmé l'abonnement pub/sub du thread d'écoute
+        self._ready = threading.Event()
+        self._ensure_listener()
+
+    def publish(self, channel: str, event: CampEvent, resumable: bool = False) -> None:
+        try:
+            if resumable:
+                self._publish_script(
+                    keys=[
+                        EVENTS_SEQUENCE_KEY_PREFIX + channel,
+                        EVENTS_HISTORY_KEY_PREFIX + channel,
+                        EVENTS_REDIS_PREFIX + channel,
+                    ],
+                    args=[_body(event), self._history_size],
+                )
+            else:
+                self._client.publish(EVENTS_REDIS_PREFIX + channel, _encode(event))
+        except Exception:
+            # Sans numéro : l'évènement ne peut pas être repris
+            logger.exception("%s Erreur publication Redis, diffusion locale uniquement", LOG_PREFIX)
+            self._dispatch(channel, CampEvent(event.type, event.data))
+
+    def _remember(self, channel: str, event: CampEvent) -> None:
+        # Historique tenu dans Redis par le script de publication
+        pass
+
+    def last_id(self, channel: str) -> int:
+        return int(self._client.get(EVENTS_SEQUENCE_KEY_PREFIX + channel) or 0)
+
+    def _history_of(self, channel: str) -> list[CampEvent]:
+        return [_decode(message) for message in self._client.lrange(EVENTS_HISTORY_KEY_PREFIX + channel, 0, -1)]
+
+    def subscribe(self, channel: str, *args, **kwargs):
+        self._ensure_listener()
+        return super().subscribe(channel, *args, **kwargs)
+
+    def _wait_ready(self) -> None:
+        if not self._ready.wait(EVENTS_LISTENER_READY_TIMEOUT):
+            logger.warning(
+                "%s Écoute Redis non confirmée après %ss, des évènements peuvent manquer",
+                LOG_PREFIX, EVENTS_LISTENER_READY_TIMEOUT,
+            )
+
+    def _ensure_listener(self) -> None:
+        if self._listener is not None and self._listener.is_alive():
+            return
+        with self._listener_lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            # Thread absent ou perdu au fork : l'écoute n'est plus confirmée
+            self._ready.clear()
+            self._listener = threading.Thread(
+                target=self._listen, name="camps-events", daemon=True,
+            )
+            self._listener.start()
+
+    def _listen(self) -> None:
+        backoff = 1
+        while True:
+            pubsub = self._client.pubsub()
+            try:
+                pubsub.psubscribe(EVENTS_REDIS_PREFIX + "*")
+                backoff = 1
+                while True:
+                    message = pubsub.get_message(timeout=SSE_PING_INTERVAL)
+                    if not message:
+                        continue
+                    if message.get("type") == "psubscribe":
+                        # Abonnement confirmé : tout évènement publié désormais est reçu
+                        self._ready.set()
+                        continue
+                    if message.get("type") != "pmessage":
+                        continue
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    self._dispatch(channel[len(EVENTS_REDIS_PREFIX):], _decode(message["data"]))
+            except Exception:
+                self._ready.clear()
+                logger.exception("%s Écoute Redis interrompue, nouvelle tentative dans %ds", LOG_PREFIX, backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+# ---------------------------------------------------------------------------
+# Instance du processus
+# ---------------------------------------------------------------------------
+
+_broker: CampEventBroker | None = None
+
+
+def get_broker() -> CampEventBroker:
+    """Retourne le broker du processus (Redis si disponible, sinon mémoire)."""
+    global _broker
+    if _broker is None:
+        client = getattr(getattr(cache, "cache", None), "_write_client", None)
+        if client is not None:
+            _broker = RedisCampEventBroker(client)
+            logger.info("%s Évènements temps réel : Redis pub/sub", LOG_PREFIX)
+        else:
+            _broker = CampEventBroker()
+            logger.info("%s Évènements temps réel : diffusion en mémoire", LOG_PREFIX)
+    return _broker
+
+
+def publish(channel: str, type: str, data, resumable: bool = False) -> None:
+    """Publie un évènement sans jamais lever d'exception vers l'appelant."""
+    try:
+        get_broker().publish(channel, CampEvent(type, data), resumable=resumable)
+    except Exception:
+        logger.exception("%s Erreur publication évènement %s", LOG_PREFIX, type)
+
+
+def parse_last_event_id(value) -> int | None:
+    """Convertit un Last-Event-ID (en-tête ou paramètre) en entier."""
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Notifications joueurs (deltas légers, les clients re-téléchargent au besoin)
+# ---------------------------------------------------------------------------
+
+def camp_channel(camp: str) -> str:
+    return CHANNEL_CAMP_PREFIX + camp
+
+
+def team_channel(team_id: int) -> str:
+    return CHANNEL_TEAM_PREFIX + str(team_id)
+
+
+def notify_team_camp_changed(team_id: int, old_camp: str | None, new_camp: str | None) -> None:
+    """Signale qu'une équipe a rejoint, quitté ou changé de camp."""
+    if old_camp == new_camp:
+        return
+    version = bump_version(VERSION_COUNTS)
+    publish(CHANNEL_COUNTS, EVENT_COUNTS_CHANGED, {
+        "version_key": VERSION_COUNTS,
+        "version": version,
+        "joined": new_camp,
+        "left": old_camp,
+    })
+    publish(team_channel(team_id), EVENT_TEAM_CAMP_CHANGED, {"camp": new_camp})
+
+
+def notify_challenges_changed(challenge_id: int, masks: set[int], visible: bool | None = None) -> None:
+    """
+    Signale la modification d'un challenge aux camps concernés.
+
+    Args:
+        masks: masques de camps avant / après la modification ; un masque
+            nul (challenge neutre) concerne tous les camps.
+    """
+    registry = get_registry()
+    mask = registry.all_mask if 0 in masks else 0
+    for m in masks:
+        mask |= m
+    for camp in registry.slugs_for(mask):
+        key = VERSION_CHALLENGES_PREFIX + camp
+        publish(camp_channel(camp), EVENT_CHALLENGES_CHANGED, {
+            "version_key": key,
+            "version": bump_version(key),
+            "challenge_id": challenge_id,
+            "visible": visible,
+        })
+
+
+def notify_round_scheduled(starts_at) -> None:
+    """
+    Signale la création ou la suppression d'une manche : les clients
+    rechargent (avec étalement) pour connaître leur camp et la prochaine
+    bascule, signalée ensuite par leur flux sans nouvelle écriture.
+    """
+    publish(CHANNEL_PUBLIC, EVENT_ROUND_SCHEDULED, {"starts_at": starts_at.isoformat()})
+
+
+def notify_config_changed(allow_change: bool, deadline: str) -> None:
+    """Signale une modification de la configuration visible par les joueurs."""
+    publish(CHANNEL_PUBLIC, EVENT_CONFIG_CHANGED, {
+        "version_key": VERSION_CONFIG,
+        "version": bump_version(VERSION_CONFIG),
+        "allow_change": bool(allow_change),
+        "deadline": deadline or None,
+    })
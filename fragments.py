@@ -0,0 +1,132 @@
+"""
+Fragments HTML communs à toutes les équipes, mis en cache.
+
+La page /camps/select et le bandeau de camp de /challenges mélangent des
+parties identiques pour toutes les équipes (répartition des équipes,
+présentation des camps, bandeau d'un camp) et des parties propres à
+l'équipe (camp actuel, droit de changement, boutons). Les premières sont
+rendues une fois et partagées par les workers dans le cache CTFd, sous
+une clé qui contient les versions dont elles dépendent (camps, manche
+active, configuration, répartition) : toute écriture produit une
+nouvelle clé. Les secondes restent calculées à chaque requête.
+
+Protection contre l'effet de ruée : à l'expiration d'un fragment, un
+seul worker (verrou ``cache.add``) le reconstruit ; les autres servent
+l'ancienne version pendant FRAGMENT_STALE_TIMEOUT, ou attendent
+brièvement le nouveau fragment si la clé vient de changer.
+"""
+
+import logging
+import time
+
+from flask import get_template_attribute
+
+from CTFd.cache import cache
+
+from .caching import get_versions
+from .constants import (
+    FRAGMENT_CACHE_PREFIX,
+    FRAGMENT_CACHE_TIMEOUT,
+    FRAGMENT_LOCK_TIMEOUT,
+    FRAGMENT_STALE_TIMEOUT,
+    FRAGMENT_WAIT_INTERVAL,
+    FRAGMENT_WAIT_TIMEOUT,
+    LOG_PREFIX,
+    VERSION_CONFIG,
+    VERSION_COUNTS,
+    VERSION_REGISTRY,
+)
+from .helpers import get_team_counts
+from .registry import ALL_MATCHES, get_registry
+
+logger = logging.getLogger("CTFdCamps")
+
+_PARTS_TEMPLATE = "camps_fragments.html"
+
+
+def get_fragment(name: str, parts, build, timeout: int = FRAGMENT_CACHE_TIMEOUT):
+    """
+    Valeur du fragment ``name`` pour la clé ``parts``, construite par
+    ``build()`` au besoin (valeur sérialisable par le cache).
+    """
+    key = FRAGMENT_CACHE_PREFIX + name + ":" + ":".join(str(part) for part in parts)
+    entry = cache.get(key)
+    if entry is not None and entry["fresh_until"] > time.time():
+        return entry["value"]
+
+    lock = key + ":lock"
+    if cache.add(lock, 1, timeout=FRAGMENT_LOCK_TIMEOUT):
+        try:
+            value = build()
+            cache.set(
+                key,
+                {"value": value, "fresh_until": time.time() + timeout},
+                timeout=timeout + FRAGMENT_STALE_TIMEOUT,
+            )
+            logger.debug("%s Fragment %s reconstruit", LOG_PREFIX, key)
+            return value
+        finally:
+            cache.delete(lock)
+
+    # Un autre worker reconstruit : ancienne version, sinon attente courte
+    if entry is not None:
+        return entry["value"]
+    waited_until = time.monotonic() + FRAGMENT_WAIT_TIMEOUT
+    while time.monotonic() < waited_until:
+        time.sleep(FRAGMENT_WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry["value"]
+    return build()
+
+
+# ---------------------------------------------------------------------------
+# Fragments du plugin
+# ---------------------------------------------------------------------------
+
+def select_overview(settings: dict, scope=ALL_MATCHES) -> dict:
+    """
+    Parties communes de /camps/select pour les camps d'une portée (un
+    match, l'espace commun ou tous les camps, voir ``CampRegistry.camps_of``).
+
+    Returns:
+        ``{"counts": {camp: équipes}, "stats": html, "cards": {camp: html}}`` ;
+        les comptes servent aussi à l'état « complet » des boutons.
+    """
+    registry = get_registry()
+    versions = get_versions(VERSION_REGISTRY, VERSION_CONFIG, VERSION_COUNTS)
+    parts = (
+        versions[VERSION_REGISTRY],
+        registry.active_rounds_key(),
+        versions[VERSION_CONFIG],
+        versions[VERSION_COUNTS],
+        scope if scope is not None else "common",
+    )
+    return get_fragment("select", parts, lambda: _build_select_overview(registry.camps_of(scope), settings))
+
+
+def _build_select_overview(camps, settings: dict) -> dict:
+    all_counts = get_team_counts()
+    counts = {info.slug: all_counts.get(info.slug, 0) for info in camps}
+    stats = get_template_attribute(_PARTS_TEMPLATE, "select_stats")
+    card = get_template_attribute(_PARTS_TEMPLATE, "camp_card_info")
+    limits = bool(settings["enable_team_limits"])
+    return {
+        "counts": counts,
+        "stats": str(stats(camps, counts, bool(settings["show_public_stats"]), limits)),
+        "cards": {info.slug: str(card(info)) for info in camps},
+    }
+
+
+def camp_banner(camp: str) -> str:
+    """Bandeau « Vous êtes dans le … » de /challenges pour un camp."""
+    versions = get_versions(VERSION_REGISTRY, VERSION_CONFIG)
+    parts = (camp, versions[VERSION_REGISTRY], versions[VERSION_CONFIG])
+    return get_fragment("banner", parts, lambda: _build_camp_banner(camp))
+
+
+def _build_camp_banner(camp: str) -> str:
+    info = get_registry().get(camp)
+    if info is None:
+        return ""
+    return str(get_template_attribute(_PARTS_TEMPLATE, "camp_banner")(info))
@@ -2,8 +2,11 @@
 Fonctions utilitaires partagées du plugin CTFd Camps.
 """
 
+import ipaddress
 import logging
+import re
 from datetime import datetime, timezone
+from urllib.parse import urlsplit
 
 from CTFd.cache import clear_config
 from CTFd.models import Configs, db
@@ -13,13 +16,13 @@ from .constants import (
     CFG_ALLOW_CHANGE,
     CFG_CHANGE_DEADLINE,
     CFG_ENABLE_TEAM_LIMITS,
-    CFG_MAX_BLUE_TEAMS,
-    CFG_MAX_RED_TEAMS,
-    CAMP_BLUE,
-    CAMP_LABELS,
+    CAMP_NONE,
     LOG_PREFIX,
+    MATCH_SELECTION_PREFIX,
+    REQUEST_PATH_MAX_LENGTH,
 )
-from .models import TeamCamp
+from .membership import get_store
+from .registry import get_registry
 
 logger = logging.getLogger("CTFdCamps")
 
@@ -40,41 +43,67 @@ def set_config(key: str, value) -> None:
     clear_config()
 
 
+def get_change_deadline() -> datetime | None:
+    """Retourne la date limite de changement de camp, ou None si absente/invalide."""
+    deadline_str = get_config(CFG_CHANGE_DEADLINE, default="")
+    if not deadline_str:
+        return None
+    try:
+        return datetime.fromisoformat(str(deadline_str))
+    except (ValueError, TypeError):
+        return None
+
+
 # ---------------------------------------------------------------------------
 # Camp validation helpers
 # ---------------------------------------------------------------------------
 
-def can_change_camp(team_id: int) -> tuple[bool, str]:
+def change_eligibility(has_camp: bool, deadline: datetime | None, allow_change) -> tuple[bool, str]:
     """
-    Vérifie si une équipe peut changer de camp.
+    Règles de changement de camp, à partir de réglages déjà lus.
 
     Returns:
         (peut_changer, raison_si_non)
     """
     # 1. Vérifier la deadline
-    deadline_str = get_config(CFG_CHANGE_DEADLINE, default="")
-    if deadline_str:
+    if deadline is not None:
         try:
-            deadline = datetime.fromisoformat(str(deadline_str))
             if datetime.now(timezone.utc) > deadline:
                 return False, "La date limite de changement de camp est dépassée"
-        except (ValueError, TypeError) as exc:
-            logger.warning("%s Erreur parsing deadline: %s", LOG_PREFIX, exc)
+        except TypeError as exc:
+            logger.warning("%s Erreur comparaison deadline: %s", LOG_PREFIX, exc)
 
     # 2. Vérifier si le changement est autorisé
-    allow_change = get_config(CFG_ALLOW_CHANGE, default=True)
-    if not allow_change:
-        team_camp = TeamCamp.query.filter_by(team_id=team_id).first()
-        if team_camp:
-            return False, "Le changement de camp est désactivé. Votre choix est définitif."
+    if not allow_change and has_camp:
+        return False, "Le changement de camp est désactivé. Votre choix est définitif."
 
     return True, "OK"
 
 
-def can_join_camp(camp: str, current_team_id: int | None = None) -> tuple[bool, str]:
+def can_change_camp(team_id: int) -> tuple[bool, str]:
+    """
+    Vérifie si une équipe peut changer de camp.
+
+    Pour l'équipe de la requête en cours, préférer ``get_context().change_status``.
+
+    Returns:
+        (peut_changer, raison_si_non)
+    """
+    return change_eligibility(
+        bool(get_store().team_side(team_id)),
+        get_change_deadline(),
+        get_config(CFG_ALLOW_CHANGE, default=True),
+    )
+
+
+def can_join_camp(camp: str, current_side: str | None = None) -> tuple[bool, str]:
     """
     Vérifie si une équipe peut rejoindre un camp (quotas).
 
+    Args:
+        current_side: côté actuel de l'équipe, qui n'est pas recomptée si
+            elle est déjà dans ce camp.
+
     Returns:
         (peut_rejoindre, raison_si_non)
     """
@@ -82,27 +111,152 @@ def can_join_camp(camp: str, current_team_id: int | None = None) -> tuple[bool,
     if not enable_limits:
         return True, ""
 
-    # Récupérer la limite pour ce camp
-    if camp == CAMP_BLUE:
-        max_teams = get_config(CFG_MAX_BLUE_TEAMS, default=0)
-    else:
-        max_teams = get_config(CFG_MAX_RED_TEAMS, default=0)
-
-    # 0 = illimité
-    if not max_teams:
+    # Récupérer la limite pour ce camp (0 = illimité)
+    info = get_registry().get(camp)
+    if info is None or not info.max_teams:
         return True, ""
 
-    max_teams = int(max_teams)
-    current_count = TeamCamp.query.filter_by(camp=camp).count()
-
+    max_teams = info.max_teams
+    # Les équipes enregistrent leur côté : celui qui mène à ce camp pendant la manche active
+    side = get_registry().side_of_camp(camp)
     # Ne pas compter l'équipe si elle est déjà dans ce camp
-    if current_team_id:
-        team_camp = TeamCamp.query.filter_by(team_id=current_team_id).first()
-        if team_camp and team_camp.camp == camp:
-            return True, ""
+    if current_side == side:
+        return True, ""
+
+    current_count = get_store().team_counts().get(side, 0)
 
     if current_count >= max_teams:
-        label = CAMP_LABELS.get(camp, camp)
-        return False, f"Le {label} est complet ({current_count}/{max_teams} équipes)"
+        return False, f"Le {info.label} est complet ({current_count}/{max_teams} équipes)"
 
     return True, ""
+
+
+def get_join_status(counts: dict[str, int], current_camp: str | None) -> dict[str, tuple[bool, str]]:
+    """
+    Équivalent de can_join_camp pour tous les camps à la fois, à partir
+    de comptes déjà chargés (évite deux requêtes par camp).
+    """
+    enable_limits = get_config(CFG_ENABLE_TEAM_LIMITS, default=False)
+    status = {}
+    for info in get_registry().camps:
+        count = counts.get(info.slug, 0)
+        if not enable_limits or not info.max_teams or info.slug == current_camp or count < info.max_teams:
+            status[info.slug] = (True, "")
+        else:
+            status[info.slug] = (False, f"Le {info.label} est complet ({count}/{info.max_teams} équipes)")
+    return status
+
+
+def get_team_counts() -> dict[str, int]:
+    """Nombre d'équipes par camp (manche active), en une seule requête groupée."""
+    registry = get_registry()
+    counts = {slug: 0 for slug in registry.slugs}
+    counts.update({registry.camp_of_side(side): count for side, count in get_store().team_counts().items()})
+    return counts
+
+
+# ---------------------------------------------------------------------------
+# Challenge camp helpers
+# ---------------------------------------------------------------------------
+
+def parse_camp_selection(value) -> int | None:
+    """
+    Convertit la valeur "camp" reçue par l'API challenges en masque.
+
+    Accepte un slug, une liste de slugs ou une chaîne séparée par des
+    virgules ; "none" (ou une liste vide) désigne un challenge neutre et
+    "match:<slug>" tous les camps d'un match. Un challenge appartient à un
+    seul match : des camps de matchs différents sont refusés.
+
+    Returns:
+        Le masque (0 = neutre), ou None si la valeur est invalide.
+    """
+    if isinstance(value, str):
+        slugs = [part.strip() for part in value.split(",") if part.strip()]
+    elif isinstance(value, (list, tuple)):
+        slugs = [str(part).strip() for part in value if str(part).strip()]
+    else:
+        return None
+
+    if slugs == [CAMP_NONE] or not slugs:
+        return 0
+
+    registry = get_registry()
+    mask = 0
+    for slug in slugs:
+        if slug.startswith(MATCH_SELECTION_PREFIX):
+            match = registry.get_match(slug[len(MATCH_SELECTION_PREFIX):])
+            if match is None or not match.mask:
+                return None
+            mask |= match.mask
+        elif slug in registry:
+            mask |= registry.mask_of(slug)
+        else:
+            return None
+    if len(registry.match_ids_for(mask)) > 1:
+        return None
+    return mask
+
+
+# ---------------------------------------------------------------------------
+# Access log helpers
+# ---------------------------------------------------------------------------
+
+def serialize_access_log(log, team_name: str | None, challenge_name: str | None) -> dict:
+    """Formate une entrée de CampAccessLog pour l'affichage (page ou flux SSE)."""
+    return {
+        "id": log.id,
+        "team_name": team_name or f"Team #{log.team_id}",
+        "team_id": log.team_id,
+        "team_camp": log.team_camp,
+        "challenge_name": challenge_name or f"Challenge #{log.challenge_id}",
+        "challenge_id": log.challenge_id,
+        "challenge_camp": log.challenge_camp,
+        "request_info": log.request_info or "",
+        "method": log.method or "",
+        "path": log.path or "",
+        "ip": log.ip or "",
+        "timestamp": log.timestamp.strftime("%d/%m/%Y %H:%M:%S") if log.timestamp else "",
+    }
+
+
+# Ancien format de request_info : "METHOD URL (IP: x.x.x.x)"
+_REQUEST_INFO_RE = re.compile(r"^(\S+) (\S+)(?: \(IP: ([^)]*)\))?")
+_IPV4_MAPPED_PREFIX = b"\x00" * 10 + b"\xff\xff"
+
+
+def pack_ip(value: str | None) -> bytes | None:
+    """Adresse IP sur 16 octets (IPv4 projetée en ::ffff:a.b.c.d), None si invalide."""
+    try:
+        address = ipaddress.ip_address((value or "").strip())
+    except ValueError:
+        return None
+    if address.version == 4:
+        return _IPV4_MAPPED_PREFIX + address.packed
+    return address.packed
+
+
+def ip_range(query: str) -> tuple[bytes, bytes] | None:
+    """
+    Bornes (incluses) de ``ip_packed`` pour une IP ou un réseau CIDR.
+
+    Returns:
+        (début, fin) sur 16 octets, ou None si la saisie est invalide.
+    """
+    try:
+        network = ipaddress.ip_network(query.strip(), strict=False)
+    except ValueError:
+        return None
+    first, last = network.network_address.packed, network.broadcast_address.packed
+    if network.version == 4:
+        return _IPV4_MAPPED_PREFIX + first, _IPV4_MAPPED_PREFIX + last
+    return first, last
+
+
+def parse_request_info(info: str | None) -> tuple[str, str, str]:
+    """Extrait (méthode, chemin, IP) d'un ancien request_info ; chaînes vides si absent."""
+    match = _REQUEST_INFO_RE.match(info or "")
+    if not match:
+        return "", "", ""
+    method, url, ip = match.groups()
+    return method[:10], urlsplit(url).path[:REQUEST_PATH_MAX_LENGTH], (ip or "").strip()[:45]
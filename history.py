@@ -0,0 +1,230 @@
+"""
+Historique des camps des équipes.
+
+Chaque affectation ouvre une période dans ``team_camp_history`` et chaque
+changement (ou retrait) ferme la période en cours. L'historique est tenu
+par des évènements SQLAlchemy sur ``TeamCamp`` : toutes les écritures
+ORM (scripts, suppressions d'équipes) sont couvertes, dans la même
+transaction que la modification du camp. Les upserts du stockage des
+appartenances (``membership``), qui ne passent pas par l'ORM, appellent
+``record_team_side`` dans leur transaction.
+
+``get_camps_at`` résout le camp de milliers de couples (équipe, date) avec
+une requête par tranche d'équipes sur l'index (team_id, valid_from), puis
+une recherche dichotomique en mémoire. Ces lectures passent par le
+réplica en lecture lorsqu'il est à jour (voir ``replica``).
+
+L'historique enregistre le côté des équipes ; le camp effectif à une date
+est obtenu par la manche active à cette date.
+"""
+
+import bisect
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+from flask import has_request_context, session
+from sqlalchemy import event
+
+from CTFd.models import Teams, db
+
+from . import replica
+from .constants import HISTORY_TEAM_CHUNK, LOG_PREFIX, VERSION_TEAM_CAMPS
+from .models import TeamCamp, TeamCampHistory
+from .registry import get_registry
+
+logger = logging.getLogger("CTFdCamps")
+
+_history = TeamCampHistory.__table__
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _naive(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+# ---------------------------------------------------------------------------
+# Tenue de l'historique (évènements SQLAlchemy)
+# ---------------------------------------------------------------------------
+
+def _current_user_id() -> int | None:
+    return session.get("id") if has_request_context() else None
+
+
+def _close_period(connection, team_id: int, now: datetime) -> None:
+    connection.execute(
+        _history.update()
+        .where(_history.c.team_id == team_id, _history.c.valid_to.is_(None))
+        .values(valid_to=now)
+    )
+
+
+def _open_period(connection, team_id: int, camp: str, now: datetime) -> None:
+    connection.execute(_history.insert().values(
+        team_id=team_id,
+        camp=camp,
+        valid_from=now,
+        changed_by=_current_user_id(),
+    ))
+
+
+def _on_team_camp_insert(mapper, connection, target) -> None:
+    now = _utcnow()
+    _close_period(connection, target.team_id, now)
+    _open_period(connection, target.team_id, target.camp, now)
+
+
+def _on_team_camp_update(mapper, connection, target) -> None:
+    if not sa.inspect(target).attrs.camp.history.has_changes():
+        return
+    now = _utcnow()
+    _close_period(connection, target.team_id, now)
+    _open_period(connection, target.team_id, target.camp, now)
+
+
+def _on_team_camp_delete(mapper, connection, target) -> None:
+    _close_period(connection, target.team_id, _utcnow())
+
+
+def record_team_side(connection, team_id: int, side: str | None) -> None:
+    """
+    Tient l'historique après une écriture SQL directe du côté d'une équipe.
+
+    Ferme la période en cours si le côté change (ou est retiré) et en ouvre
+    une si aucune n'est ouverte : sans effet si le côté est inchangé.
+    """
+    now = _utcnow()
+    current = _history.c.valid_to.is_(None)
+    closing = _history.update().where(_history.c.team_id == team_id, current)
+    if side is not None:
+        closing = closing.where(_history.c.camp != side)
+    connection.execute(closing.values(valid_to=now))
+    if side is None:
+        return
+
+    opened = sa.select(_history.c.id).where(_history.c.team_id == team_id, current)
+    connection.execute(_history.insert().from_select(
+        ["team_id", "camp", "valid_from", "changed_by"],
+        sa.select(
+            sa.literal(team_id),
+            sa.literal(side),
+            sa.literal(now, sa.DateTime),
+            sa.literal(_current_user_id(), sa.Integer),
+        ).where(~opened.exists()),
+    ))
+
+
+def register_history_listeners() -> None:
+    """Branche la tenue de l'historique (une seule fois par processus)."""
+    if event.contains(TeamCamp, "after_insert", _on_team_camp_insert):
+        return
+    event.listen(TeamCamp, "after_insert", _on_team_camp_insert)
+    event.listen(TeamCamp, "after_update", _on_team_camp_update)
+    event.listen(TeamCamp, "after_delete", _on_team_camp_delete)
+
+
+def backfill_history(app) -> None:
+    """
+    Ouvre une période pour les équipes déjà affectées sans historique.
+
+    La date de début réelle est inconnue : la date de création de l'équipe
+    est utilisée.
+    """
+    with app.app_context():
+        with db.engine.begin() as connection:
+            known = sa.select(_history.c.team_id)
+            rows = connection.execute(
+                sa.select(TeamCamp.team_id, TeamCamp.camp, Teams.created)
+                .join(Teams, Teams.id == TeamCamp.team_id)
+                .where(TeamCamp.team_id.not_in(known))
+            ).all()
+            if not rows:
+                return
+            connection.execute(_history.insert(), [
+                {
+                    "team_id": team_id,
+                    "camp": camp,
+                    "valid_from": _naive(created) if created else datetime(1970, 1, 1),
+                }
+                for team_id, camp, created in rows
+            ])
+        logger.info("%s Historique des camps initialisé pour %d équipe(s)", LOG_PREFIX, len(rows))
+
+
+# ---------------------------------------------------------------------------
+# Requêtes
+# ---------------------------------------------------------------------------
+
+def get_team_history(team_id: int) -> list[TeamCampHistory]:
+    """Périodes d'une équipe, de la plus ancienne à la plus récente."""
+    return replica.run_read(
+        lambda s: s.query(TeamCampHistory)
+        .filter_by(team_id=team_id)
+        .order_by(TeamCampHistory.valid_from, TeamCampHistory.id)
+        .all(),
+        VERSION_TEAM_CAMPS,
+    )
+
+
+def get_camp_at(team_id: int, when: datetime) -> str | None:
+    """Camp d'une équipe à une date donnée (None si aucun)."""
+    return get_camps_at([(team_id, when)])[(team_id, when)]
+
+
+def get_camps_at(pairs) -> dict[tuple[int, datetime], str | None]:
+    """
+    Résout en lot le camp de couples (team_id, date).
+
+    Une requête par tranche de HISTORY_TEAM_CHUNK équipes, limitée aux
+    périodes qui recouvrent l'intervalle des dates demandées.
+
+    Returns:
+        {(team_id, date): slug ou None}, pour chaque couple fourni.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return {}
+
+    dates = [_naive(when) for _, when in pairs]
+    earliest, latest = min(dates), max(dates)
+    team_ids = sorted({team_id for team_id, _ in pairs})
+
+    def load_periods(session) -> dict:
+        # team_id -> ([débuts], [(fin, camp)]) triés par début
+        periods = defaultdict(lambda: ([], []))
+        for start in range(0, len(team_ids), HISTORY_TEAM_CHUNK):
+            chunk = team_ids[start:start + HISTORY_TEAM_CHUNK]
+            rows = session.execute(
+                sa.select(_history.c.team_id, _history.c.valid_from, _history.c.valid_to, _history.c.camp)
+                .where(
+                    _history.c.team_id.in_(chunk),
+                    _history.c.valid_from <= latest,
+                    sa.or_(_history.c.valid_to.is_(None), _history.c.valid_to > earliest),
+                )
+                .order_by(_history.c.team_id, _history.c.valid_from, _history.c.id)
+            )
+            for team_id, valid_from, valid_to, camp in rows:
+                starts, ends = periods[team_id]
+                starts.append(valid_from)
+                ends.append((valid_to, camp))
+        return periods
+
+    periods = replica.run_read(load_periods, VERSION_TEAM_CAMPS)
+
+    registry = get_registry()
+    result = {}
+    for (team_id, when), at in zip(pairs, dates):
+        camp = None
+        if team_id in periods:
+            starts, ends = periods[team_id]
+            index = bisect.bisect_right(starts, at) - 1
+            if index >= 0:
+                valid_to, slug = ends[index]
+                if valid_to is None or at < valid_to:
+                    camp = registry.camp_of_side(slug, at)
+        result[(team_id, when)] = camp
+    return result
@@ -7,25 +7,27 @@ import json
 import logging
 import re
 
-from flask import Flask, g, redirect, request
+from flask import Flask, g, jsonify, redirect, request, url_for
+from markupsafe import Markup
 
-from CTFd.models import Challenges, db
-from CTFd.utils.config import get_config
-from CTFd.utils.user import get_current_team, get_ip, is_admin
+from CTFd.models import Challenges, Hints, Tags, db
+from CTFd.utils.user import is_admin
 
-from .constants import (
-    CFG_SHOW_CHALLENGE_BADGES,
-    LOG_PREFIX,
-    REQUEST_INFO_MAX_LENGTH,
-    VALID_CAMPS,
-)
-from .helpers import can_change_camp
-from .models import CampAccessLog, ChallengeCamp, TeamCamp
+from . import events, fragments, rules, throttle
+from .constants import CAMP_NONE, CAMP_RULES, CAMP_RULES_MASK, LOG_PREFIX
+from .context import get_context
+from .denials import log_denial, throttled_response
+from .helpers import parse_camp_selection
+from .membership import get_store
+from .registry import get_registry
+from .releases import get_release_index
 
 logger = logging.getLogger("CTFdCamps")
 
-# Regex compilée une seule fois pour le matching des challenges individuels
-_CHALLENGE_ID_RE = re.compile(r"^/api/v1/challenges/(\d+)$")
+# Endpoints admin de création / modification / suppression de challenge
+_CHALLENGE_WRITE_ENDPOINTS = {"api.challenges_challenge_list", "api.challenges_challenge"}
+# Endpoints admin des tags (les règles par tag sont recompilées)
+_TAG_WRITE_ENDPOINTS = {"api.tags_tag_list", "api.tags_tag"}
 
 
 def register_hooks(app: Flask) -> None:
@@ -33,11 +35,13 @@ def register_hooks(app: Flask) -> None:
 
     _register_camp_redirect(app)
     _register_challenge_list_filter(app)
-    _register_challenge_detail_filter(app)
+    _register_challenge_access_control(app)
     _register_camp_extraction(app)
     _register_camp_save(app)
+    _register_challenge_notifications(app)
     _register_context_processors(app)
     _register_badge_injection(app)
+    _register_events_injection(app)
     _register_template_enrichment(app)
 
 
@@ -61,8 +65,8 @@ def _register_camp_redirect(app: Flask) -> None:
 
         # Vérifier uniquement pour /challenges
         if request.path == "/challenges" or request.path.startswith("/challenges/"):
-            team = get_current_team()
-            if team and not TeamCamp.query.filter_by(team_id=team.id).first():
+            context = get_context()
+            if context.team and not context.side:
                 return redirect("/camps/select")
 
 
@@ -80,15 +84,12 @@ def _register_challenge_list_filter(app: Flask) -> None:
             return response
 
         try:
-            team = get_current_team()
-            if not team:
-                return response
-
-            team_camp_entry = TeamCamp.query.filter_by(team_id=team.id).first()
-            if not team_camp_entry:
+            context = get_context()
+            team_camp = context.camp
+            if not team_camp:
                 return response
 
-            team_camp = team_camp_entry.camp
+            team_mask = context.camp_mask
             data = json.loads(response.get_data(as_text=True))
 
             if not data.get("success") or "data" not in data:
@@ -96,14 +97,15 @@ def _register_challenge_list_filter(app: Flask) -> None:
 
             original_count = len(data["data"])
 
-            # Charger tous les camps en un seul query (évite N+1)
-            camps_map = {
-                cc.challenge_id: cc.camp for cc in ChallengeCamp.query.all()
-            }
+            # Masques des seuls challenges listés (les neutres sont absents),
+            # fenêtres de publication appliquées
+            ids = [ch["id"] for ch in data["data"]]
+            masks = get_release_index().effective_masks(ids, get_store().challenge_masks_for(ids))
 
+            # Visible si neutre (masque absent ou nul) ou si le bit du camp est levé
             data["data"] = [
                 ch for ch in data["data"]
-                if camps_map.get(ch["id"]) is None or camps_map.get(ch["id"]) == team_camp
+                if not masks.get(ch["id"]) or masks[ch["id"]] & team_mask
             ]
 
             response.set_data(json.dumps(data))
@@ -119,69 +121,112 @@ def _register_challenge_list_filter(app: Flask) -> None:
 
 
 # ---------------------------------------------------------------------------
-# 3. Filtrage d'un challenge individuel (GET /api/v1/challenges/<id>)
+# 3. Contrôle d'accès avant dispatch (détail, tentatives, indices, fichiers…)
 # ---------------------------------------------------------------------------
 
-def _register_challenge_detail_filter(app: Flask) -> None:
+def _challenge_id_from_path(match) -> int | None:
+    return int(match.group(1))
 
-    @app.after_request
-    def filter_challenge_detail(response):
-        match = _CHALLENGE_ID_RE.match(request.path)
-        if not match or response.status_code != 200:
-            return response
-        if is_admin():
-            return response
 
-        challenge_id = int(match.group(1))
+def _challenge_id_from_attempt(match) -> int | None:
+    data = request.get_json(silent=True) if request.is_json else request.form
+    return _to_int((data or {}).get("challenge_id"))
 
-        try:
-            team = get_current_team()
-            if not team:
-                return response
 
-            team_camp_entry = TeamCamp.query.filter_by(team_id=team.id).first()
-            if not team_camp_entry:
-                return response
+def _challenge_id_from_hint(match) -> int | None:
+    return db.session.query(Hints.challenge_id).filter_by(id=int(match.group(1))).scalar()
 
-            team_camp = team_camp_entry.camp
-            camp_entry = ChallengeCamp.query.filter_by(challenge_id=challenge_id).first()
-            challenge_camp = camp_entry.camp if camp_entry else None
 
-            # Challenge d'un autre camp → bloquer
-            if challenge_camp is not None and challenge_camp != team_camp:
-                _log_unauthorized_access(team, challenge_id, team_camp, challenge_camp)
+def _challenge_id_from_unlock(match) -> int | None:
+    data = request.get_json(silent=True) if request.is_json else request.form
+    data = data or {}
+    if data.get("type") != "hints":
+        return None
+    hint_id = _to_int(data.get("target"))
+    if hint_id is None:
+        return None
+    return db.session.query(Hints.challenge_id).filter_by(id=hint_id).scalar()
 
-                response.set_data(json.dumps({
-                    "success": False,
-                    "error": "Ce challenge n'est pas accessible par votre camp",
-                }))
-                response.status_code = 403
 
-        except Exception:
-            logger.exception("%s Erreur filtrage challenge %d", LOG_PREFIX, challenge_id)
+def _to_int(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
-        return response
 
+# Table des routes portant sur un challenge : regex → extraction de l'id.
+# Les routes indépendantes de la base sont testées en premier.
+_CHALLENGE_ROUTES = [
+    (
+        re.compile(r"^/api/v1/challenges/(\d+)(?:/(?:solves|files|tags|topics|hints|requirements))?/?$"),
+        _challenge_id_from_path,
+    ),
+    (re.compile(r"^/api/v1/challenges/attempt/?$"), _challenge_id_from_attempt),
+    (re.compile(r"^/api/v1/hints/(\d+)/?$"), _challenge_id_from_hint),
+    (re.compile(r"^/api/v1/unlocks/?$"), _challenge_id_from_unlock),
+]
+_CHALLENGE_ROUTE_PREFIXES = ("/api/v1/challenges/", "/api/v1/hints/", "/api/v1/unlocks")
 
-def _log_unauthorized_access(team, challenge_id: int, team_camp: str, challenge_camp: str) -> None:
-    """Enregistre une tentative d'accès non autorisée."""
-    logger.warning(
-        "%s Accès refusé: challenge %d (camp %s) → équipe %s (camp %s)",
-        LOG_PREFIX, challenge_id, challenge_camp, team.name, team_camp,
-    )
-    try:
-        info = f"{request.method} {request.url} (IP: {get_ip(req=request)})"
-        db.session.add(CampAccessLog(
-            team_id=team.id,
-            challenge_id=challenge_id,
-            team_camp=team_camp,
-            challenge_camp=challenge_camp,
-            request_info=info[:REQUEST_INFO_MAX_LENGTH],
-        ))
-        db.session.commit()
-    except Exception:
-        logger.exception("%s Erreur logging accès", LOG_PREFIX)
-        db.session.rollback()
+
+def _register_challenge_access_control(app: Flask) -> None:
+
+    @app.before_request
+    def enforce_challenge_camp():
+        path = request.path
+        if not path.startswith(_CHALLENGE_ROUTE_PREFIXES):
+            return
+        if is_admin():
+            return
+
+        for pattern, extract in _CHALLENGE_ROUTES:
+            match = pattern.match(path)
+            if match:
+                break
+        else:
+            return
+
+        try:
+            context = get_context()
+            team = context.team
+            if not team:
+                return
+
+            # Équipe bloquée pour sondage : 429 immédiat, sans toucher à la base
+            wait = throttle.retry_after(team.id)
+            if wait:
+                return throttled_response(wait)
+
+            challenge_id = extract(match)
+            if challenge_id is None:
+                return
+
+            # Challenge neutre et toujours publié : aucune requête SQL supplémentaire
+            stored_mask = get_store().challenge_mask(challenge_id)
+            challenge_mask = get_release_index().effective_mask(challenge_id, stored_mask)
+            if not challenge_mask:
+                return
+
+            team_camp = context.camp
+            if not team_camp:
+                return
+
+            registry = get_registry()
+            if challenge_mask & registry.mask_of(team_camp):
+                return
+
+            # Challenge réservé à d'autres camps → refusé avant que CTFd ne le charge
+            # Camps configurés (hors fenêtre de publication, aucun camp ne le voit)
+            challenge_camp = registry.describe(stored_mask) or CAMP_NONE
+            log_denial(team, challenge_id, team_camp, challenge_camp)
+            throttle.record_denial(team.id, team.name)
+            return jsonify({
+                "success": False,
+                "error": "Ce challenge n'est pas accessible par votre camp",
+            }), 403
+
+        except Exception:
+            logger.exception("%s Erreur contrôle d'accès %s", LOG_PREFIX, path)
 
 
 # ---------------------------------------------------------------------------
@@ -198,22 +243,29 @@ def _register_camp_extraction(app: Flask) -> None:
 
         camp_value = None
 
-        # Extraire depuis le formulaire
-        if request.form.get("camp"):
-            camp_value = request.form.get("camp")
+        # Extraire depuis le formulaire ("camp" peut être répété)
+        if "camp" in request.form:
+            values = request.form.getlist("camp")
+            camp_value = values if len(values) > 1 else values[0]
             mutable_form = request.form.copy()
             del mutable_form["camp"]
             request.form = mutable_form
 
-        # Extraire depuis le JSON
-        elif request.is_json and request.json and request.json.get("camp"):
-            camp_value = request.json.get("camp")
-            del request.json["camp"]
+        # Extraire depuis le JSON (slug, liste de slugs ou "blue,red")
+        elif request.is_json and isinstance(request.json, dict) and "camp" in request.json:
+            camp_value = request.json.pop("camp")
+
+        if camp_value is None or camp_value == "":
+            g.camp_mask = None
+            return
 
-        # Validation stricte
-        g.camp_value = camp_value if camp_value in VALID_CAMPS else None
+        if camp_value == CAMP_RULES:
+            g.camp_mask = CAMP_RULES_MASK
+            return
 
-        if camp_value and camp_value not in VALID_CAMPS:
+        # Validation stricte : tous les slugs doivent exister
+        g.camp_mask = parse_camp_selection(camp_value)
+        if g.camp_mask is None:
             logger.warning("%s Valeur de camp invalide rejetée: %s", LOG_PREFIX, camp_value)
 
 
@@ -225,48 +277,133 @@ def _register_camp_save(app: Flask) -> None:
 
     @app.after_request
     def save_challenge_camp(response):
-        camp_value = getattr(g, "camp_value", None)
-        if not camp_value:
+        if request.endpoint not in _CHALLENGE_WRITE_ENDPOINTS:
             return response
+        camp_mask = getattr(g, "camp_mask", None)
 
         try:
             if request.method == "POST" and response.status_code in (200, 201):
-                _save_camp_on_create(response, camp_value)
+                _save_camp_on_create(response, camp_mask)
             elif request.method == "PATCH" and response.status_code == 200:
-                _save_camp_on_update(camp_value)
+                _save_camp_on_update(camp_mask)
         except Exception:
             logger.exception("%s Erreur sauvegarde camp", LOG_PREFIX)
             db.session.rollback()
 
         return response
 
+    @app.before_request
+    def remember_tag_challenge():
+        # Tag modifié ou supprimé : son challenge n'est plus lisible après la requête
+        if request.endpoint == "api.tags_tag" and request.method in ("PATCH", "DELETE"):
+            tag_id = (request.view_args or {}).get("tag_id")
+            g.camps_tag_challenge = db.session.query(Tags.challenge_id).filter_by(id=tag_id).scalar()
 
-def _save_camp_on_create(response, camp_value: str) -> None:
-    """Sauvegarde le camp lors de la création d'un challenge."""
+    @app.after_request
+    def recompile_tag_rules(response):
+        if request.endpoint not in _TAG_WRITE_ENDPOINTS or response.status_code != 200:
+            return response
+        try:
+            challenge_id = g.get("camps_tag_challenge")
+            if challenge_id is None and request.method == "POST":
+                data = json.loads(response.get_data(as_text=True)).get("data") or {}
+                challenge_id = data.get("challenge_id") or data.get("challenge")
+            if challenge_id:
+                rules.compile_rules([int(challenge_id)])
+        except Exception:
+            logger.exception("%s Erreur application des règles de camp", LOG_PREFIX)
+            db.session.rollback()
+        return response
+
+
+def _save_camp(challenge_id: int, camp_mask: int | None) -> None:
+    """
+    Enregistre le choix explicite des camps d'un challenge, ou recalcule
+    ses règles (champ absent : catégorie ou nom peut-être modifiés).
+    """
+    if camp_mask is None:
+        rules.compile_rules([challenge_id])
+    elif camp_mask == CAMP_RULES_MASK:
+        rules.follow_rules(challenge_id)
+        logger.info("%s Challenge %d assigné par les règles de camp", LOG_PREFIX, challenge_id)
+    else:
+        get_store().set_challenge_mask(challenge_id, camp_mask)
+        logger.info("%s Camps %#x assignés au challenge %d", LOG_PREFIX, camp_mask, challenge_id)
+
+
+def _save_camp_on_create(response, camp_mask: int | None) -> None:
+    """Sauvegarde les camps lors de la création d'un challenge."""
     data = json.loads(response.get_data(as_text=True))
     challenge_id = data.get("data", {}).get("id")
     if not challenge_id:
         return
-
-    db.session.add(ChallengeCamp(challenge_id=challenge_id, camp=camp_value))
-    db.session.commit()
-    logger.info("%s Camp '%s' assigné au challenge %d", LOG_PREFIX, camp_value, challenge_id)
+    # « Aucun camp » à la création : neutre par défaut, les règles peuvent s'appliquer
+    _save_camp(challenge_id, None if camp_mask == 0 else camp_mask)
 
 
-def _save_camp_on_update(camp_value: str) -> None:
-    """Met à jour le camp lors de la modification d'un challenge."""
+def _save_camp_on_update(camp_mask: int | None) -> None:
+    """Met à jour les camps lors de la modification d'un challenge."""
     challenge_id = request.view_args.get("challenge_id")
     if not challenge_id:
         return
+    _save_camp(challenge_id, camp_mask)
 
-    entry = ChallengeCamp.query.filter_by(challenge_id=challenge_id).first()
-    if entry:
-        entry.camp = camp_value
-    else:
-        db.session.add(ChallengeCamp(challenge_id=challenge_id, camp=camp_value))
 
-    db.session.commit()
-    logger.info("%s Camp '%s' mis à jour pour challenge %d", LOG_PREFIX, camp_value, challenge_id)
+# ---------------------------------------------------------------------------
+# 5 bis. Notification des joueurs après modification d'un challenge
+# ---------------------------------------------------------------------------
+
+def _register_challenge_notifications(app: Flask) -> None:
+
+    @app.before_request
+    def remember_challenge_camp():
+        if request.endpoint not in _CHALLENGE_WRITE_ENDPOINTS:
+            return
+        if request.method not in ("PATCH", "DELETE"):
+            return
+
+        challenge_id = (request.view_args or {}).get("challenge_id")
+        g.previous_challenge_mask = get_store().challenge_mask(challenge_id)
+
+    @app.after_request
+    def notify_challenge_change(response):
+        if request.endpoint not in _CHALLENGE_WRITE_ENDPOINTS:
+            return response
+        if request.method not in ("POST", "PATCH", "DELETE") or response.status_code not in (200, 201):
+            return response
+
+        try:
+            data = {}
+            if request.method != "DELETE":
+                data = json.loads(response.get_data(as_text=True)).get("data") or {}
+
+            challenge_id = (request.view_args or {}).get("challenge_id") or data.get("id")
+            if not challenge_id:
+                return response
+
+            # Exécuté avant save_challenge_camp (ordre inverse des after_request) :
+            # le nouveau masque est celui extrait de la requête, sinon inchangé.
+            new_mask = getattr(g, "camp_mask", None)
+            if new_mask == CAMP_RULES_MASK:
+                # Masque calculé par les règles, signalé par leur compilation
+                new_mask = None
+            if request.method == "POST":
+                masks = {new_mask or 0}
+            else:
+                previous = g.get("previous_challenge_mask", 0)
+                masks = {previous, previous if new_mask is None else new_mask}
+
+            if request.method == "DELETE":
+                # Ligne challenge_camps supprimée en cascade
+                get_store().forget_challenge(int(challenge_id))
+                visible = False
+            else:
+                visible = data.get("state") == "visible" if "state" in data else None
+            events.notify_challenges_changed(int(challenge_id), masks, visible)
+        except Exception:
+            logger.exception("%s Erreur notification modification challenge", LOG_PREFIX)
+
+        return response
 
 
 # ---------------------------------------------------------------------------
@@ -277,26 +414,26 @@ def _register_context_processors(app: Flask) -> None:
 
     @app.context_processor
     def inject_camp_helpers():
-        def get_challenge_camp(challenge_id: int) -> str | None:
-            entry = ChallengeCamp.query.filter_by(challenge_id=challenge_id).first()
-            return entry.camp if entry else None
+        def get_challenge_camps(challenge_id: int) -> list[str]:
+            return get_registry().slugs_for(get_store().challenge_mask(challenge_id))
 
         def get_team_camp(team_id: int) -> str | None:
-            entry = TeamCamp.query.filter_by(team_id=team_id).first()
-            return entry.camp if entry else None
-
-        def can_change_camp_for_display() -> bool:
-            team = get_current_team()
-            if not team:
-                return False
-            allowed, _ = can_change_camp(team.id)
-            return allowed
+            context = get_context()
+            if team_id == context.team_id:
+                return context.camp
+            return get_store().team_camp(team_id)
 
         return dict(
-            get_challenge_camp=get_challenge_camp,
+            get_camps=lambda: get_registry().camps,
+            get_camp_groups=lambda: get_registry().groups(),
+            challenge_follows_rules=rules.follows_rules,
+            get_camp=lambda slug: get_registry().get(slug),
+            get_challenge_camps=get_challenge_camps,
             get_team_camp=get_team_camp,
-            get_current_team=get_current_team,
-            can_change_camp_for_display=can_change_camp_for_display,
+            get_current_team=lambda: get_context().team,
+            can_change_camp_for_display=lambda: get_context().can_change,
+            camp_context=get_context,
+            camp_banner=lambda camp: Markup(fragments.camp_banner(camp)),
         )
 
 
@@ -311,16 +448,19 @@ def _register_badge_injection(app: Flask) -> None:
         if request.path != "/challenges" or response.status_code != 200:
             return response
 
-        if not get_config(CFG_SHOW_CHALLENGE_BADGES, default=False):
+        if not get_context().settings["show_challenge_badges"]:
             return response
 
         try:
-            challenges = Challenges.query.filter_by(state="visible").all()
-            camps_map = {}
-            for ch in challenges:
-                entry = ChallengeCamp.query.filter_by(challenge_id=ch.id).first()
-                if entry:
-                    camps_map[ch.id] = entry.camp
+            # Seuls les challenges visibles et assignés ont une pastille (une seule requête)
+            visible = [cid for (cid,) in db.session.query(Challenges.id).filter(Challenges.state == "visible")]
+            masks = get_release_index().effective_masks(visible, get_store().challenge_masks_for(visible))
+            registry = get_registry()
+            camps_map = {
+                challenge_id: [camp.to_dict() for camp in registry.camps_for(mask)]
+                for challenge_id, mask in masks.items()
+            }
+            camps_map = {challenge_id: camps for challenge_id, camps in camps_map.items() if camps}
 
             if not camps_map:
                 return response
@@ -338,27 +478,32 @@ def _register_badge_injection(app: Flask) -> None:
 
 def _build_badge_script(camps_map: dict) -> str:
     """Génère le script JS pour les pastilles de camp."""
+    # Les libellés sont saisis par l'admin : empêcher la fermeture de la balise script
+    camps_json = json.dumps(camps_map).replace("</", "<\\/")
     return f"""
 <script>
 (function() {{
-    var campsMap = {json.dumps(camps_map)};
+    var campsMap = {camps_json};
 
     function addCampBadges() {{
         document.querySelectorAll('.challenge-button[value]').forEach(function(btn) {{
             var id = parseInt(btn.getAttribute('value'));
-            var camp = campsMap[id];
-            if (!camp || btn.querySelector('.camp-badge')) return;
-
-            var badge = document.createElement('div');
-            badge.className = 'camp-badge';
-            badge.style.cssText = 'position:absolute;bottom:8px;left:8px;width:14px;height:14px;'
-                + 'border-radius:50%;border:2px solid white;box-shadow:0 2px 4px rgba(0,0,0,.3);'
-                + 'z-index:10;pointer-events:none;background-color:'
-                + (camp === 'blue' ? '#007bff' : '#dc3545');
-            badge.title = camp === 'blue' ? 'Camp Bleu' : 'Camp Rouge';
+            var camps = campsMap[id];
+            if (!camps || btn.querySelector('.camp-badge')) return;
+
+            // Une pastille par camp autorisé, alignées en bas à gauche
+            camps.forEach(function(camp, index) {{
+                var badge = document.createElement('div');
+                badge.className = 'camp-badge';
+                badge.style.cssText = 'position:absolute;bottom:8px;width:14px;height:14px;'
+                    + 'border-radius:50%;border:2px solid white;box-shadow:0 2px 4px rgba(0,0,0,.3);'
+                    + 'z-index:10;pointer-events:none;'
+                    + 'left:' + (8 + index * 12) + 'px;background-color:' + camp.color;
+                badge.title = camp.label;
+                btn.appendChild(badge);
+            }});
 
             btn.style.position = 'relative';
-            btn.appendChild(badge);
         }});
     }}
 
@@ -374,6 +519,33 @@ def _build_badge_script(camps_map: dict) -> str:
 """
 
 
+# ---------------------------------------------------------------------------
+# 7 bis. Notifications temps réel sur /challenges (remplace le polling)
+# ---------------------------------------------------------------------------
+
+def _register_events_injection(app: Flask) -> None:
+
+    @app.after_request
+    def inject_events_script(response):
+        if request.path != "/challenges" or response.status_code != 200:
+            return response
+        if is_admin() or not response.mimetype == "text/html":
+            return response
+
+        try:
+            scripts = "".join(
+                f'<script defer src="{url_for("camps_assets", path=name)}"></script>'
+                for name in ("camps_events.js", "camps_board.js")
+            )
+            html = response.get_data(as_text=True)
+            if "</body>" in html:
+                response.set_data(html.replace("</body>", scripts + "</body>"))
+        except Exception:
+            logger.exception("%s Erreur injection script évènements", LOG_PREFIX)
+
+        return response
+
+
 # ---------------------------------------------------------------------------
 # 8. Enrichissement des données de camp dans g (pour les templates admin)
 # ---------------------------------------------------------------------------
@@ -386,12 +558,20 @@ def _register_template_enrichment(app: Flask) -> None:
 
         if "challenges" in ep:
             try:
-                g.camps_map = {c.challenge_id: c.camp for c in ChallengeCamp.query.all()}
+                registry = get_registry()
+                g.camps_map = {
+                    challenge_id: registry.label_for(mask)
+                    for challenge_id, mask in get_store().challenge_masks().items()
+                }
             except Exception:
                 g.camps_map = {}
 
         if "teams" in ep:
             try:
-                g.teams_camps_map = {tc.team_id: tc.camp for tc in TeamCamp.query.all()}
+                registry = get_registry()
+                g.teams_camps_map = {}
+                for team_id, side in get_store().team_sides().items():
+                    camp = registry.camp_of_side(side)
+                    g.teams_camps_map[team_id] = registry.get(camp).label if camp in registry else camp
             except Exception:
                 g.teams_camps_map = {}
@@ -0,0 +1,268 @@
+"""
+Scénario de charge local pour CTFd + plugin Camps.
+
+Script autonome (bibliothèque standard uniquement), à lancer contre une
+instance locale remplie par ``flask camps seed`` :
+
+    python loadtest.py --url http://127.0.0.1:8000 --dataset camps_seed.json \\
+        --duration 60 --workers 32 --json avant.json
+
+Chaque worker enchaîne des actions tirées selon les poids de ``--mix`` :
+
+  - board   : polling du board (liste CTFd, liste du camp, scoreboard des camps)
+  - detail  : détail d'un challenge visible par le camp de l'équipe
+  - batch   : détails d'un lot de challenges (préchargement hors ligne, bots)
+  - probe   : sondage d'un challenge d'un autre camp (403 puis 429 attendus)
+  - select  : ruée sur la sélection de camp des équipes sans camp
+  - logs    : consultation de la page des logs par l'administrateur
+
+Le rapport donne, par endpoint, le débit et les percentiles de latence ;
+``--json`` l'enregistre pour comparer deux exécutions (``--compare``).
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+
+_DEFAULT_MIX = "board=50,detail=20,probe=15,select=5,logs=2"
+_PERCENTILES = (50, 90, 95, 99)
+
+
+# ---------------------------------------------------------------------------
+# Client HTTP
+# ---------------------------------------------------------------------------
+
+class Client:
+    """Requêtes authentifiées par jeton d'API (pas de session ni de CSRF)."""
+
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, token: str, body: dict | None = None) -> tuple[int, float]:
+        """Returns (code HTTP, latence en secondes) ; code 0 en cas d'erreur réseau."""
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers={
+            # CTFd n'accepte les jetons que sur les requêtes JSON
+            "Authorization": f"Token {token}",
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip",
+        })
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            status = exc.code
+        except (urllib.error.URLError, OSError):
+            status = 0
+        return status, time.perf_counter() - started
+
+
+# ---------------------------------------------------------------------------
+# Scénario
+# ---------------------------------------------------------------------------
+
+class Scenario:
+    """Actions du scénario, construites à partir du fichier de ``flask camps seed``."""
+
+    def __init__(self, dataset: dict, client: Client):
+        self.client = client
+        self.admin_token = dataset["admin_token"]
+        self.camps = dataset["camps"]
+        self.assigned = [team for team in dataset["teams"] if team["camp"]]
+        self.unassigned = [team for team in dataset["teams"] if not team["camp"]]
+        self._unassigned_lock = threading.Lock()
+
+        self.visible = defaultdict(list)
+        self.foreign = defaultdict(list)
+        for challenge in dataset["challenges"]:
+            for camp in self.camps:
+                if not challenge["camps"] or camp in challenge["camps"]:
+                    self.visible[camp].append(challenge["id"])
+                else:
+                    self.foreign[camp].append(challenge["id"])
+
+    def board(self, rng, record) -> None:
+        team = rng.choice(self.assigned)
+        for path in ("/api/v1/challenges", "/api/v1/camps/challenges", "/api/v1/camps/scoreboard"):
+            record(f"GET {path}", *self.client.request("GET", path, team["token"]))
+
+    def detail(self, rng, record) -> None:
+        team = rng.choice(self.assigned)
+        challenge_id = rng.choice(self.visible[team["camp"]])
+        record("GET /api/v1/challenges/<id> (autorisé)",
+               *self.client.request("GET", f"/api/v1/challenges/{challenge_id}", team["token"]))
+
+    def batch(self, rng, record) -> None:
+        team = rng.choice(self.assigned)
+        visible = self.visible[team["camp"]]
+        ids = rng.sample(visible, min(len(visible), 50))
+        path = "/api/v1/camps/challenges/details?ids=" + ",".join(map(str, ids))
+        record("GET /api/v1/camps/challenges/details", *self.client.request("GET", path, team["token"]))
+
+    def probe(self, rng, record) -> None:
+        team = rng.choice(self.assigned)
+        if not self.foreign[team["camp"]]:
+            return
+        challenge_id = rng.choice(self.foreign[team["camp"]])
+        record("GET /api/v1/challenges/<id> (autre camp)",
+               *self.client.request("GET", f"/api/v1/challenges/{challenge_id}", team["token"]))
+
+    def select(self, rng, record) -> None:
+        # Chaque équipe sans camp choisit une fois, puis rejoint les équipes affectées
+        with self._unassigned_lock:
+            if not self.unassigned:
+                return
+            team = self.unassigned.pop(rng.randrange(len(self.unassigned)))
+        camp = rng.choice(self.camps)
+        status, latency = self.client.request("POST", "/api/v1/camps/select", team["token"], {"camp": camp})
+        record("POST /api/v1/camps/select", status, latency)
+        if status == 200:
+            self.assigned.append({**team, "camp": camp})
+
+    def logs(self, rng, record) -> None:
+        page = rng.randint(1, 5)
+        record("GET /admin/camps/logs",
+               *self.client.request("GET", f"/admin/camps/logs?page={page}", self.admin_token))
+
+
+def parse_mix(value: str) -> list[tuple[str, int]]:
+    mix = []
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if not hasattr(Scenario, name):
+            raise argparse.ArgumentTypeError(f"Action inconnue : {name}")
+        mix.append((name, int(weight or 1)))
+    return mix
+
+
+# ---------------------------------------------------------------------------
+# Exécution et rapport
+# ---------------------------------------------------------------------------
+
+def run(scenario: Scenario, mix, duration: float, workers: int, think: float, random_seed) -> tuple[dict, float]:
+    """Returns ({endpoint: [(code, latence)]}, durée réelle)."""
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def record(endpoint, status, latency):
+        with lock:
+            samples[endpoint].append((status, latency))
+
+    def worker(index):
+        rng = random.Random(None if random_seed is None else random_seed + index)
+        while time.monotonic() < deadline:
+            action = rng.choices(names, weights)[0]
+            getattr(scenario, action)(rng, record)
+            if think:
+                time.sleep(think)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Percentile au rang le plus proche."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def summarize(samples: dict, elapsed: float) -> dict:
+    report = {}
+    for endpoint, values in sorted(samples.items()):
+        latencies = sorted(latency for _, latency in values)
+        report[endpoint] = {
+            "requests": len(values),
+            "rps": len(values) / elapsed if elapsed else 0.0,
+            "statuses": dict(Counter(str(status) for status, _ in values)),
+            **{f"p{p}_ms": percentile(latencies, p) * 1000 for p in _PERCENTILES},
+            "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        }
+    return report
+
+
+def print_report(report: dict, baseline: dict | None = None) -> None:
+    columns = ["req/s"] + [f"p{p}" for p in _PERCENTILES] + ["max"]
+    width = 15 if baseline else 9
+    print(f"{'endpoint':48} {'req':>7} " + " ".join(f"{c:>{width}}" for c in columns) + "  codes")
+    for endpoint, stats in report.items():
+        values = [stats["rps"]] + [stats[f"p{p}_ms"] for p in _PERCENTILES] + [stats["max_ms"]]
+        cells = [f"{value:9.1f}" for value in values]
+        if baseline and endpoint in baseline:
+            before = baseline[endpoint]
+            keys = ["rps"] + [f"p{p}_ms" for p in _PERCENTILES] + ["max_ms"]
+            cells = [
+                f"{value:9.1f}" + (f"{(value / before[key] - 1) * 100:+5.0f}%" if before[key] else " " * 6)
+                for value, key in zip(values, keys)
+            ]
+        elif baseline:
+            cells = [cell + " " * 6 for cell in cells]
+        codes = " ".join(f"{code}:{count}" for code, count in sorted(stats["statuses"].items()))
+        print(f"{endpoint:48} {stats['requests']:7d} " + " ".join(cells) + f"  {codes}")
+    print("(latences en ms)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Scénario de charge CTFd + plugin Camps")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL de l'instance CTFd")
+    parser.add_argument("--dataset", default="camps_seed.json", help="Fichier écrit par flask camps seed")
+    parser.add_argument("--duration", type=float, default=60, help="Durée en secondes")
+    parser.add_argument("--workers", type=int, default=16, help="Clients simultanés")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(_DEFAULT_MIX), help="Poids des actions")
+    parser.add_argument("--think", type=float, default=0.0, help="Pause entre deux actions (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout HTTP (s)")
+    parser.add_argument("--random-seed", type=int, default=None, help="Graine, pour un tirage reproductible")
+    parser.add_argument("--json", dest="output", help="Enregistrer le rapport dans ce fichier")
+    parser.add_argument("--compare", help="Rapport JSON d'une exécution précédente")
+    args = parser.parse_args(argv)
+
+    with open(args.dataset) as f:
+        dataset = json.load(f)
+    scenario = Scenario(dataset, Client(args.url, args.timeout))
+    if not scenario.assigned:
+        print("Aucune équipe affectée dans le jeu de données", file=sys.stderr)
+        return 1
+
+    samples, elapsed = run(scenario, args.mix, args.duration, args.workers, args.think, args.random_seed)
+    report = summarize(samples, elapsed)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["endpoints"]
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "url": args.url,
+                "duration": elapsed,
+                "workers": args.workers,
+                "mix": dict(args.mix),
+                "endpoints": report,
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,563 @@
+"""
+Destinations des accès refusés.
+
+Chaque refus est remis aux destinations activées depuis la page admin :
+
+  - ``database`` : table ``camp_access_logs`` (page admin, agrégats et
+    flux temps réel des logs) ;
+  - ``jsonl`` : fichier JSON Lines avec rotation par taille, lu par le
+    collecteur du SOC (Filebeat, Vector…) ;
+  - ``syslog`` : un datagramme UDP par refus, au format RFC 5424 ou en
+    JSON brut.
+
+La requête du joueur se contente de déposer le refus dans le tampon borné
+de chaque destination (``put_nowait``). Un thread par destination et par
+worker écrit ensuite les refus par lots : une destination lente ou
+injoignable remplit son propre tampon, dont les refus excédentaires sont
+perdus et comptés, sans ralentir la requête ni les autres destinations.
+
+Les compteurs (remis, perdus, en échec) de chaque worker sont cumulés dans
+le cache CTFd, pour que la page admin affiche le total de tous les workers.
+"""
+
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from queue import Empty, Full, Queue
+
+import sqlalchemy as sa
+from flask import current_app
+
+from CTFd.cache import cache
+from CTFd.models import Challenges, db
+from CTFd.utils.config import get_config
+
+from . import events, replica
+from .caching import get_version
+from .constants import (
+    CFG_LOG_SINKS,
+    CHANNEL_ADMIN_LOGS,
+    EVENT_ACCESS_DENIED,
+    LOG_PREFIX,
+    REPLICA_DATASET_ACCESS_LOGS,
+    SINK_BATCH_SIZE,
+    SINK_BUFFER_SIZE,
+    SINK_FLUSH_INTERVAL,
+    SINK_JSONL_DEFAULT_BACKUPS,
+    SINK_JSONL_DEFAULT_MAX_MB,
+    SINK_JSONL_DEFAULT_PATH,
+    SINK_SHUTDOWN_TIMEOUT,
+    SINK_STATS_KEY_PREFIX,
+    SINK_SYSLOG_APP_NAME,
+    SINK_SYSLOG_DEFAULT_PORT,
+    SINK_SYSLOG_FORMATS,
+    SINK_SYSLOG_PRI,
+    SINK_TYPES,
+    VERSION_LOG_SINKS,
+)
+from .helpers import pack_ip, serialize_access_log
+from .models import CampAccessLog
+
+try:
+    import fcntl
+except ImportError:  # Windows : rotation sans verrou entre workers
+    fcntl = None
+
+logger = logging.getLogger("CTFdCamps")
+
+# Identifiant du message dans les exports (champ ``event``, MSGID syslog)
+EXPORT_EVENT = "camp_access_denied"
+
+_COUNTERS = ("delivered", "dropped", "failed")
+
+
+# ---------------------------------------------------------------------------
+# Destinations
+# ---------------------------------------------------------------------------
+
+class LogSink:
+    """
+    Destination des refus : tampon borné et thread d'écriture par lots.
+
+    Les sous-classes implémentent ``write(batch)`` (appelé dans un contexte
+    applicatif, depuis le thread de la destination) et ``release()`` pour
+    fermer leurs ressources.
+    """
+
+    type = ""
+
+    def __init__(self, options: dict):
+        self.options = options
+        self._queue: Queue = Queue(maxsize=SINK_BUFFER_SIZE)
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._app = None
+        self._closed = False
+        self._start_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._pending = dict.fromkeys(_COUNTERS, 0)
+        self._last_error: str | None = None
+
+    def offer(self, record: dict) -> None:
+        """Dépose un refus dans le tampon, sans jamais bloquer la requête."""
+        if self._closed:
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(record)
+        except Full:
+            self._count("dropped", 1)
+
+    def close(self, timeout: float = 0) -> None:
+        """Arrête le thread une fois le tampon vidé (``timeout`` : attente maximale)."""
+        self._closed = True
+        thread = self._thread
+        if timeout and thread is not None and self._pid == os.getpid():
+            thread.join(timeout)
+
+    def write(self, batch: list[dict]) -> None:
+        raise NotImplementedError
+
+    def release(self) -> None:
+        """Libère les ressources ouvertes par ``write`` (fichier, socket)."""
+
+    # -- Thread d'écriture -------------------------------------------------
+
+    def _ensure_worker(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                # Processus forké (gunicorn --preload) : ni le thread ni le
+                # tampon hérités ne sont utilisables
+                self._queue = Queue(maxsize=SINK_BUFFER_SIZE)
+                _register_shutdown()
+            self._app = current_app._get_current_object()
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name=f"camps-sink-{self.type}", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch or self._has_pending():
+                with self._app.app_context():
+                    if batch:
+                        self._deliver(batch)
+                    self._publish_counters()
+            if self._closed and self._queue.empty():
+                self.release()
+                return
+
+    def _next_batch(self) -> list[dict]:
+        """Refus accumulés depuis le lot précédent (attend au plus SINK_FLUSH_INTERVAL)."""
+        try:
+            batch = [self._queue.get(timeout=SINK_FLUSH_INTERVAL)]
+        except Empty:
+            return []
+        while len(batch) < SINK_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def _deliver(self, batch: list[dict]) -> None:
+        try:
+            self.write(batch)
+        except Exception as exc:
+            logger.warning(
+                "%s Destination %s : %d refus non écrits (%s)", LOG_PREFIX, self.type, len(batch), exc,
+            )
+            self._count("failed", len(batch))
+            self._last_error = f"{type(exc).__name__}: {exc}"[:200]
+        else:
+            self._count("delivered", len(batch))
+
+    # -- Compteurs ---------------------------------------------------------
+
+    def _count(self, name: str, value: int) -> None:
+        with self._counter_lock:
+            self._pending[name] += value
+
+    def _has_pending(self) -> bool:
+        return self._last_error is not None or any(self._pending.values())
+
+    def _publish_counters(self) -> None:
+        """Ajoute les compteurs du worker aux totaux partagés."""
+        with self._counter_lock:
+            pending, self._pending = self._pending, dict.fromkeys(_COUNTERS, 0)
+        error, self._last_error = self._last_error, None
+
+        try:
+            for name, value in pending.items():
+                if value:
+                    _increment(_stats_key(self.type, name), value)
+            if error:
+                cache.set(
+                    _stats_key(self.type, "last_error"),
+                    {"message": error, "at": _export_time(datetime.now(timezone.utc))},
+                    timeout=0,
+                )
+        except Exception:
+            logger.exception("%s Erreur publication des compteurs de %s", LOG_PREFIX, self.type)
+
+
+class DatabaseSink(LogSink):
+    """Table ``camp_access_logs`` ; diffuse aussi les refus aux pages admin connectées."""
+
+    type = "database"
+
+    def write(self, batch: list[dict]) -> None:
+        table = CampAccessLog.__table__
+        challenge_ids = {record["challenge_id"] for record in batch}
+        written = []
+
+        with db.engine.begin() as connection:
+            names = dict(connection.execute(
+                sa.select(Challenges.id, Challenges.name).where(Challenges.id.in_(challenge_ids))
+            ).all())
+            # Une insertion par refus pour connaître son id (Last-Event-ID du flux
+            # admin), mais une seule transaction par lot
+            for record in batch:
+                values = {
+                    "team_id": record["team_id"],
+                    "challenge_id": record["challenge_id"],
+                    "team_camp": record["team_camp"],
+                    "challenge_camp": record["challenge_camp"],
+                    "request_info": record["request_info"],
+                    "method": record["method"],
+                    "path": record["path"],
+                    "ip": record["ip"],
+                    "ip_packed": pack_ip(record["ip"]),
+                    "timestamp": record["timestamp"],
+                }
+                # created_at : horloge de la base, borne du job d'agrégats (log_stats)
+                result = connection.execute(table.insert().values(**values, created_at=sa.func.now()))
+                written.append((CampAccessLog(id=result.inserted_primary_key[0], **values), record))
+
+        # Lot validé : la page des logs ne lira le réplica qu'une fois ce lot rejoué
+        replica.note_write(REPLICA_DATASET_ACCESS_LOGS)
+        for log, record in written:
+            payload = serialize_access_log(log, record["team_name"], names.get(log.challenge_id))
+            events.publish(CHANNEL_ADMIN_LOGS, EVENT_ACCESS_DENIED, payload, resumable=True)
+
+
+class JsonlFileSink(LogSink):
+    """
+    Fichier JSON Lines, une ligne par refus, avec rotation par taille
+    (``fichier.1`` … ``fichier.N``). Les workers écrivent en mode ajout
+    dans le même fichier ; la rotation est protégée par un verrou fichier.
+    """
+
+    type = "jsonl"
+
+    def __init__(self, options: dict):
+        super().__init__(options)
+        self._fd: int | None = None
+        self._inode: int | None = None
+
+    def write(self, batch: list[dict]) -> None:
+        path = self._path()
+        data = "".join(json.dumps(_export(record), ensure_ascii=False) + "\n" for record in batch).encode()
+        fd = self._open(path)
+
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+
+        if os.fstat(fd).st_size >= self.options["max_mb"] * 1024 * 1024:
+            self._rotate(path)
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = self._inode = None
+
+    def _path(self) -> str:
+        path = self.options["path"]
+        if not os.path.isabs(path):
+            path = os.path.join(self._app.config.get("LOG_FOLDER") or os.getcwd(), path)
+        return path
+
+    def _open(self, path: str) -> int:
+        """Descripteur du fichier courant, rouvert si un autre worker l'a fait tourner."""
+        try:
+            inode = os.stat(path).st_ino
+        except FileNotFoundError:
+            inode = None
+        if self._fd is None or inode != self._inode:
+            self.release()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+            self._inode = os.fstat(self._fd).st_ino
+        return self._fd
+
+    def _rotate(self, path: str) -> None:
+        backups = self.options["backups"]
+        with _file_lock(path + ".lock"):
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                current = None
+            # Un autre worker a pu faire tourner le fichier entre-temps
+            if current is not None and current.st_ino == self._inode:
+                if backups:
+                    for index in range(backups - 1, 0, -1):
+                        if os.path.exists(f"{path}.{index}"):
+                            os.replace(f"{path}.{index}", f"{path}.{index + 1}")
+                    os.replace(path, f"{path}.1")
+                else:
+                    os.remove(path)
+        self.release()
+
+
+class SyslogSink(LogSink):
+    """Datagrammes UDP vers un collecteur syslog (RFC 5424) ou JSON."""
+
+    type = "syslog"
+
+    def __init__(self, options: dict):
+        super().__init__(options)
+        self._socket: socket.socket | None = None
+        self._address = None
+        self._hostname = socket.gethostname() or "-"
+
+    def write(self, batch: list[dict]) -> None:
+        if self._socket is None:
+            family, kind, proto, _, address = socket.getaddrinfo(
+                self.options["host"], self.options["port"], type=socket.SOCK_DGRAM,
+            )[0]
+            self._socket = socket.socket(family, kind, proto)
+            self._address = address
+
+        syslog = self.options["format"] == "syslog"
+        try:
+            for record in batch:
+                message = json.dumps(_export(record), ensure_ascii=False)
+                if syslog:
+                    message = (
+                        f"<{SINK_SYSLOG_PRI}>1 {_export_time(record['timestamp'])} {self._hostname} "
+                        f"{SINK_SYSLOG_APP_NAME} {os.getpid()} {EXPORT_EVENT} - {message}"
+                    )
+                self._socket.sendto(message.encode(), self._address)
+        except OSError:
+            # Adresse résolue à nouveau au lot suivant
+            self.release()
+            raise
+
+    def release(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+_SINK_CLASSES = {cls.type: cls for cls in (DatabaseSink, JsonlFileSink, SyslogSink)}
+
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+def validate_settings(data) -> tuple[list[dict], str | None]:
+    """
+    Valide la liste des destinations envoyée par la page admin.
+
+    Returns:
+        ``(destinations, erreur)`` : une entrée par type de SINK_TYPES,
+        options complétées par les valeurs par défaut.
+    """
+    if not isinstance(data, list):
+        return [], "Format invalide : liste de destinations attendue"
+    by_type = {item.get("type"): item for item in data if isinstance(item, dict)}
+    unknown = set(by_type) - set(SINK_TYPES)
+    if unknown:
+        return [], f"Destination inconnue : {', '.join(sorted(map(str, unknown)))}"
+
+    def number(item, field, default, low, high):
+        value = item.get(field, default)
+        try:
+            value = int(default if value in (None, "") else value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Valeur invalide pour {field}")
+        if not low <= value <= high:
+            raise ValueError(f"{field} doit être compris entre {low} et {high}")
+        return value
+
+    settings = []
+    try:
+        for sink_type in SINK_TYPES:
+            item = by_type.get(sink_type, {})
+            spec = {"type": sink_type, "enabled": bool(item.get("enabled", False))}
+            if sink_type == "jsonl":
+                path = str(item.get("path") or SINK_JSONL_DEFAULT_PATH).strip()
+                if len(path) > 255:
+                    raise ValueError("Chemin du fichier trop long")
+                spec["path"] = path
+                spec["max_mb"] = number(item, "max_mb", SINK_JSONL_DEFAULT_MAX_MB, 1, 10240)
+                spec["backups"] = number(item, "backups", SINK_JSONL_DEFAULT_BACKUPS, 0, 100)
+            elif sink_type == "syslog":
+                spec["host"] = str(item.get("host") or "").strip()
+                if spec["enabled"] and not spec["host"]:
+                    raise ValueError("Hôte syslog requis")
+                spec["port"] = number(item, "port", SINK_SYSLOG_DEFAULT_PORT, 1, 65535)
+                spec["format"] = item.get("format") or SINK_SYSLOG_FORMATS[0]
+                if spec["format"] not in SINK_SYSLOG_FORMATS:
+                    raise ValueError(f"Format syslog invalide : {spec['format']}")
+            settings.append(spec)
+    except ValueError as exc:
+        return [], str(exc)
+    return settings, None
+
+
+def get_settings() -> list[dict]:
+    """Destinations configurées ; seule la base est activée par défaut."""
+    raw = get_config(CFG_LOG_SINKS, default="")
+    data = None
+    if raw:
+        try:
+            data = json.loads(raw)
+        except (TypeError, ValueError):
+            logger.warning("%s Configuration des destinations illisible, valeurs par défaut", LOG_PREFIX)
+    if data is None:
+        data = [{"type": "database", "enabled": True}]
+
+    settings, error = validate_settings(data)
+    if error:
+        logger.warning("%s Configuration des destinations invalide (%s)", LOG_PREFIX, error)
+        settings, _ = validate_settings([{"type": "database", "enabled": True}])
+    return settings
+
+
+# ---------------------------------------------------------------------------
+# Destinations actives du processus
+# ---------------------------------------------------------------------------
+
+_lock = threading.Lock()
+_active: tuple[int, list[LogSink]] | None = None
+_shutdown_pid: int | None = None
+
+
+def get_sinks() -> list[LogSink]:
+    """
+    Destinations actives, reconstruites quand la version ``log_sinks``
+    change : une destination dont les options n'ont pas changé est
+    conservée avec son tampon, les autres sont fermées après vidage.
+    """
+    global _active
+
+    version = get_version(VERSION_LOG_SINKS)
+    active = _active
+    if active is not None and active[0] == version:
+        return active[1]
+
+    with _lock:
+        active = _active
+        if active is None or active[0] != version:
+            previous = {sink.type: sink for sink in active[1]} if active else {}
+            sinks = []
+            for spec in get_settings():
+                if not spec["enabled"]:
+                    continue
+                sink = previous.get(spec["type"])
+                if sink is not None and sink.options == spec:
+                    del previous[spec["type"]]
+                else:
+                    sink = _SINK_CLASSES[spec["type"]](spec)
+                sinks.append(sink)
+            for stale in previous.values():
+                stale.close()
+            active = (version, sinks)
+            _active = active
+            logger.info(
+                "%s Destinations des refus : %s",
+                LOG_PREFIX, ", ".join(sink.type for sink in sinks) or "aucune",
+            )
+    return active[1]
+
+
+def dispatch(record: dict) -> None:
+    """Remet un refus à chaque destination active, sans attendre l'écriture."""
+    for sink in get_sinks():
+        sink.offer(record)
+
+
+def get_stats() -> dict[str, dict]:
+    """Compteurs cumulés de tous les workers, par type de destination."""
+    keys = [_stats_key(sink_type, name) for sink_type in SINK_TYPES for name in (*_COUNTERS, "last_error")]
+    values = dict(zip(keys, cache.get_many(*keys)))
+    return {
+        sink_type: {
+            **{name: int(values[_stats_key(sink_type, name)] or 0) for name in _COUNTERS},
+            "last_error": values[_stats_key(sink_type, "last_error")],
+        }
+        for sink_type in SINK_TYPES
+    }
+
+
+def shutdown() -> None:
+    """Vide les tampons à l'arrêt du worker (SINK_SHUTDOWN_TIMEOUT par destination)."""
+    active = _active
+    for sink in active[1] if active else ():
+        sink.close(SINK_SHUTDOWN_TIMEOUT)
+
+
+def _register_shutdown() -> None:
+    global _shutdown_pid
+    if _shutdown_pid != os.getpid():
+        _shutdown_pid = os.getpid()
+        atexit.register(shutdown)
+
+
+# ---------------------------------------------------------------------------
+# Outils
+# ---------------------------------------------------------------------------
+
+def _stats_key(sink_type: str, name: str) -> str:
+    return f"{SINK_STATS_KEY_PREFIX}{sink_type}:{name}"
+
+
+def _increment(key: str, value: int) -> None:
+    try:
+        # INCRBY atomique sur Redis, get + set sur les autres backends
+        if cache.cache.inc(key, value) is not None:
+            return
+    except Exception:
+        logger.exception("%s Erreur incrément du compteur %s", LOG_PREFIX, key)
+    cache.set(key, int(cache.get(key) or 0) + value, timeout=0)
+
+
+def _export_time(moment: datetime) -> str:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _export(record: dict) -> dict:
+    """Refus au format d'export (fichier, syslog)."""
+    return {
+        "event": EXPORT_EVENT,
+        **record,
+        "timestamp": _export_time(record["timestamp"]),
+    }
+
+
+@contextmanager
+def _file_lock(path: str):
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
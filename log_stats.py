@@ -0,0 +1,274 @@
+"""
+Statistiques pré-agrégées des logs d'accès refusés.
+
+Les tableaux de bord de ``/admin/camps/logs`` lisent trois tables d'agrégats
+(par heure, par équipe, par challenge) au lieu de parcourir
+``camp_access_logs``. Elles sont alimentées par un job incrémental qui
+mémorise le dernier id intégré (high-water mark) :
+
+  - seuls les logs d'id supérieur sont lus, par lots de ROLLUP_BATCH_SIZE ;
+  - le lot s'arrête avant le premier log inséré depuis moins de
+    ROLLUP_SAFETY_LAG secondes, le temps que les transactions concurrentes
+    qui ont obtenu des ids plus petits soient validées (sinon un id validé
+    en retard serait sauté). La fenêtre porte sur ``created_at``, date
+    d'insertion prise sur l'horloge de la base, et non sur ``timestamp`` :
+    un refus peut attendre dans le tampon des destinations (``log_sinks``)
+    et être inséré bien après sa date ;
+  - le high-water mark est avancé par compare-and-set au début de la
+    transaction : deux exécutions simultanées ne comptent jamais deux fois
+    les mêmes logs.
+
+Le job est lancé par ``flask camps refresh-log-stats`` (tout l'arriéré) et
+à l'affichage de la page des logs, limité à ROLLUP_PAGE_BATCHES lots pour
+ne pas retenir la page ni les verrous des agrégats après une rafale ;
+l'arriéré restant est affiché sur la page (``get_rollup_lag``).
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+
+from CTFd.models import Challenges, Teams, db
+
+from . import replica
+from .constants import (
+    LOG_PREFIX,
+    ROLLUP_BATCH_SIZE,
+    ROLLUP_SAFETY_LAG,
+    ROLLUP_TIMELINE_HOURS,
+    ROLLUP_TOP_SIZE,
+)
+from .models import (
+    CampAccessLog,
+    CampAccessLogChallengeStats,
+    CampAccessLogHourly,
+    CampAccessLogRollupState,
+    CampAccessLogTeamStats,
+)
+
+logger = logging.getLogger("CTFdCamps")
+
+_logs = CampAccessLog.__table__
+_hourly = CampAccessLogHourly.__table__
+_teams_stats = CampAccessLogTeamStats.__table__
+_challenges_stats = CampAccessLogChallengeStats.__table__
+_state = CampAccessLogRollupState.__table__
+
+_STATE_ID = 1
+
+
+def _utcnow() -> datetime:
+    # Les dates des logs sont stockées en UTC naïf
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _naive(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+# ---------------------------------------------------------------------------
+# Job incrémental
+# ---------------------------------------------------------------------------
+
+def refresh_rollups(max_batches: int | None = None) -> int:
+    """
+    Intègre les nouveaux logs aux agrégats. Retourne le nombre de logs intégrés.
+
+    Args:
+        max_batches: nombre maximal de lots (None : jusqu'à épuisement).
+    """
+    total, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        count = _refresh_batch()
+        total += count
+        batches += 1
+        if count < ROLLUP_BATCH_SIZE:
+            break
+    if total:
+        logger.info("%s %d log(s) d'accès intégré(s) aux statistiques", LOG_PREFIX, total)
+    return total
+
+
+def _refresh_batch() -> int:
+    with db.engine.begin() as connection:
+        last_id = connection.execute(
+            sa.select(_state.c.last_log_id).where(_state.c.id == _STATE_ID)
+        ).scalar()
+        if last_id is None:
+            connection.execute(_state.insert().values(id=_STATE_ID, last_log_id=0))
+            last_id = 0
+
+        # Premier log trop récemment inséré (horloge de la base) : le lot s'arrête avant
+        cutoff = connection.execute(sa.select(sa.func.now())).scalar() - timedelta(seconds=ROLLUP_SAFETY_LAG)
+        fresh = connection.execute(
+            sa.select(sa.func.min(_logs.c.id)).where(_logs.c.id > last_id, _logs.c.created_at >= cutoff)
+        ).scalar()
+
+        # Borne haute du lot ; created_at NULL : logs antérieurs à la colonne
+        window = sa.select(_logs.c.id).where(_logs.c.id > last_id)
+        if fresh is not None:
+            window = window.where(_logs.c.id < fresh)
+        window = window.order_by(_logs.c.id).limit(ROLLUP_BATCH_SIZE).subquery()
+        upper = connection.execute(sa.select(sa.func.max(window.c.id))).scalar()
+        if not upper:
+            return 0
+
+        # Compare-and-set : une exécution concurrente trouve 0 ligne et abandonne
+        claimed = connection.execute(
+            _state.update()
+            .where(_state.c.id == _STATE_ID, _state.c.last_log_id == last_id)
+            .values(last_log_id=upper)
+        ).rowcount
+        if claimed != 1:
+            return 0
+
+        rows = connection.execute(
+            sa.select(_logs.c.team_id, _logs.c.challenge_id, _logs.c.team_camp, _logs.c.timestamp)
+            .where(_logs.c.id > last_id, _logs.c.id <= upper)
+        ).all()
+
+        hourly, teams, challenges = Counter(), Counter(), Counter()
+        teams_seen, challenges_seen = {}, {}
+        for team_id, challenge_id, team_camp, timestamp in rows:
+            timestamp = _naive(timestamp)
+            hourly[(timestamp.replace(minute=0, second=0, microsecond=0), team_camp)] += 1
+            teams[team_id] += 1
+            challenges[challenge_id] += 1
+            teams_seen[team_id] = max(timestamp, teams_seen.get(team_id, timestamp))
+            challenges_seen[challenge_id] = max(timestamp, challenges_seen.get(challenge_id, timestamp))
+
+        _merge(connection, _hourly, ("hour", "team_camp"), hourly)
+        _merge(connection, _teams_stats, ("team_id",), teams, teams_seen)
+        _merge(connection, _challenges_stats, ("challenge_id",), challenges, challenges_seen)
+        return len(rows)
+
+
+def get_rollup_lag() -> dict:
+    """Logs pas encore intégrés aux agrégats : nombre et date du plus ancien."""
+    last_id = db.session.query(CampAccessLogRollupState.last_log_id).filter_by(id=_STATE_ID).scalar() or 0
+    pending, oldest = db.session.query(
+        sa.func.count(CampAccessLog.id), sa.func.min(CampAccessLog.timestamp),
+    ).filter(CampAccessLog.id > last_id).one()
+    return {"pending": pending, "oldest": _naive(oldest) if oldest else None}
+
+
+def _merge(connection, table, key_columns: tuple, counts: Counter, last_seen: dict | None = None) -> None:
+    """Ajoute des compteurs à une table d'agrégats (UPDATE des clés existantes, INSERT des autres)."""
+    if not counts:
+        return
+
+    def key_of(key):
+        return key if isinstance(key, tuple) else (key,)
+
+    first = table.c[key_columns[0]]
+    existing = {
+        tuple(row)
+        for row in connection.execute(
+            sa.select(*[table.c[name] for name in key_columns])
+            .where(first.in_({key_of(key)[0] for key in counts}))
+        )
+    }
+
+    updates, inserts = [], []
+    for key, count in counts.items():
+        values = dict(zip(key_columns, key_of(key)))
+        if last_seen is not None:
+            values["last_seen"] = last_seen[key]
+        if key_of(key) in existing:
+            updates.append({**{f"k_{name}": value for name, value in values.items()}, "k_count": count})
+        else:
+            inserts.append({**values, "count": count})
+
+    if updates:
+        new_values = {"count": table.c.count + sa.bindparam("k_count")}
+        if last_seen is not None:
+            new_values["last_seen"] = sa.bindparam("k_last_seen")
+        connection.execute(
+            table.update()
+            .where(sa.and_(*[table.c[name] == sa.bindparam(f"k_{name}") for name in key_columns]))
+            .values(**new_values),
+            updates,
+        )
+    if inserts:
+        connection.execute(table.insert(), inserts)
+
+
+def reset_rollups(connection) -> None:
+    """Vide les agrégats et remet le high-water mark à zéro (après purge des logs)."""
+    for table in (_hourly, _teams_stats, _challenges_stats):
+        connection.execute(table.delete())
+    connection.execute(_state.update().values(last_log_id=0))
+
+
+# ---------------------------------------------------------------------------
+# Lecture (page des logs)
+# ---------------------------------------------------------------------------
+
+def get_dashboard() -> dict:
+    """
+    Totaux, top équipes / challenges et chronologie, lus dans les agrégats
+    (sur le réplica en lecture s'il est à jour, voir ``replica``).
+    """
+    return replica.run_read(_dashboard)
+
+
+def _dashboard(session) -> dict:
+    total, unique_teams = session.query(
+        sa.func.coalesce(sa.func.sum(CampAccessLogTeamStats.count), 0),
+        sa.func.count(CampAccessLogTeamStats.team_id),
+    ).one()
+
+    top_teams = [
+        {"team_id": team_id, "name": name or f"Team #{team_id}", "count": count, "last_seen": last_seen}
+        for team_id, name, count, last_seen in (
+            session.query(
+                CampAccessLogTeamStats.team_id, Teams.name,
+                CampAccessLogTeamStats.count, CampAccessLogTeamStats.last_seen,
+            )
+            .outerjoin(Teams, Teams.id == CampAccessLogTeamStats.team_id)
+            .order_by(CampAccessLogTeamStats.count.desc())
+            .limit(ROLLUP_TOP_SIZE)
+        )
+    ]
+    top_challenges = [
+        {"challenge_id": challenge_id, "name": name or f"Challenge #{challenge_id}", "count": count}
+        for challenge_id, name, count in (
+            session.query(
+                CampAccessLogChallengeStats.challenge_id, Challenges.name, CampAccessLogChallengeStats.count,
+            )
+            .outerjoin(Challenges, Challenges.id == CampAccessLogChallengeStats.challenge_id)
+            .order_by(CampAccessLogChallengeStats.count.desc())
+            .limit(ROLLUP_TOP_SIZE)
+        )
+    ]
+
+    return {
+        "total": int(total),
+        "unique_teams": unique_teams,
+        "top_teams": top_teams,
+        "top_challenges": top_challenges,
+        "timeline": _timeline(session),
+    }
+
+
+def _timeline(session) -> list[dict]:
+    """Refus par heure sur les ROLLUP_TIMELINE_HOURS dernières heures (heures vides incluses)."""
+    end = _utcnow().replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(hours=ROLLUP_TIMELINE_HOURS - 1)
+
+    rows = (
+        session.query(CampAccessLogHourly.hour, CampAccessLogHourly.team_camp, CampAccessLogHourly.count)
+        .filter(CampAccessLogHourly.hour >= start)
+        .all()
+    )
+    buckets = {start + timedelta(hours=i): {} for i in range(ROLLUP_TIMELINE_HOURS)}
+    for hour, team_camp, count in rows:
+        by_camp = buckets.setdefault(hour, {})
+        by_camp[team_camp] = by_camp.get(team_camp, 0) + count
+
+    return [
+        {"hour": hour.strftime("%d/%m %Hh"), "total": sum(by_camp.values()), "by_camp": by_camp}
+        for hour, by_camp in sorted(buckets.items())
+    ]
@@ -0,0 +1,494 @@
+"""
+Stockage des appartenances aux camps (équipe → côté, challenge → masque).
+
+Les hooks, les routes et les helpers lisent et écrivent les appartenances
+uniquement par ``get_store()``. Deux implémentations :
+
+  - ``MembershipStore`` (« sql », par défaut) : lectures dans les
+    instantanés du processus construits depuis ``team_camps`` et
+    ``challenge_camps``, rechargés entièrement par chaque worker après
+    toute écriture (voir ``registry``) ;
+  - ``CachedMembershipStore`` (« cache ») : appartenances tenues dans deux
+    hashes Redis (client du cache CTFd). Une lecture est un HMGET, partagé
+    par tous les workers, sans rechargement complet après une écriture.
+    Sans Redis, ce backend est refusé (retour aux instantanés SQL) : des
+    copies par processus divergeraient entre workers.
+
+Dans les deux cas, SQL reste la source de vérité : chaque écriture est un
+upsert (ou un DELETE) en une instruction (voir ``upsert``), accompagné
+dans la même transaction de l'historique et du scoreboard, puis le cache
+est mis à jour (write-through). Un hash absent ou expiré est
+rechargé depuis SQL par un seul worker à la fois ; les autres lisent les
+instantanés SQL en attendant. Une éventuelle incohérence (écritures
+concurrentes, invalidation perdue) est détectée et corrigée par
+``verifier`` ; l'expiration (MEMBERSHIP_CACHE_TTL) n'est qu'un filet.
+
+Le backend est choisi par ``CAMPS_MEMBERSHIP_STORE`` (config CTFd ou
+variable d'environnement).
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import func
+
+from CTFd.cache import cache
+from CTFd.models import db
+
+from .caching import get_version
+from .constants import (
+    CAMP_NONE,
+    LOG_PREFIX,
+    MEMBERSHIP_CACHE_TTL,
+    MEMBERSHIP_CHALLENGES_KEY,
+    MEMBERSHIP_LOAD_ATTEMPTS,
+    MEMBERSHIP_LOAD_LOCK_TIMEOUT,
+    MEMBERSHIP_STORE_CONFIG_KEY,
+    MEMBERSHIP_TEAMS_KEY,
+    VERSION_CHALLENGE_MASKS,
+    VERSION_TEAM_CAMPS,
+)
+from . import history, replica, scoreboard
+from .models import ChallengeCamp, TeamCamp
+from .registry import (
+    get_challenge_masks,
+    get_registry,
+    get_team_camps,
+    invalidate_challenge_masks,
+    invalidate_team_camps,
+)
+from .upsert import upsert
+
+logger = logging.getLogger("CTFdCamps")
+
+_team_camps = TeamCamp.__table__
+_challenge_camps = ChallengeCamp.__table__
+
+
+# ---------------------------------------------------------------------------
+# Backend SQL (instantanés du processus)
+# ---------------------------------------------------------------------------
+
+class MembershipStore:
+    """Appartenances lues dans les instantanés SQL du processus."""
+
+    name = "sql"
+
+    # --- Équipes ---
+
+    def team_side(self, team_id: int) -> str | None:
+        """Côté enregistré d'une équipe (None si aucun)."""
+        return get_team_camps().get(team_id)
+
+    def team_camp(self, team_id: int) -> str | None:
+        """Camp effectif d'une équipe pendant la manche active."""
+        return get_registry().camp_of_side(self.team_side(team_id))
+
+    def team_sides(self) -> dict[int, str]:
+        """``{team_id: côté}`` de toutes les équipes affectées (ne pas modifier)."""
+        return get_team_camps()
+
+    def team_counts(self) -> dict[str, int]:
+        """Nombre d'équipes par côté, en une requête groupée."""
+        rows = db.session.query(TeamCamp.camp, func.count(TeamCamp.id)).group_by(TeamCamp.camp)
+        return {side: count for side, count in rows}
+
+    def set_team_side(self, team_id: int, side: str | None) -> None:
+        """Enregistre (ou retire si None) le côté d'une équipe et valide la transaction."""
+        # Connexion de la session : les écritures ORM en attente partent dans la même transaction
+        connection = db.session.connection()
+        if side is None:
+            connection.execute(_team_camps.delete().where(_team_camps.c.team_id == team_id))
+        else:
+            upsert(connection, _team_camps, "team_id", team_id, {"camp": side})
+        # Instructions Core : pas d'évènement ORM, historique et scoreboard tenus ici
+        history.record_team_side(connection, team_id, side)
+        scoreboard.record_team_side(connection, team_id, side)
+        db.session.commit()
+        self._team_written(team_id, side)
+
+    def _team_written(self, team_id: int, side: str | None) -> None:
+        invalidate_team_camps()
+
+    def reload_teams(self) -> None:
+        """Oublie les côtés des équipes en cache (écart détecté par ``verifier``)."""
+        invalidate_team_camps()
+
+    # --- Challenges ---
+
+    def challenge_mask(self, challenge_id: int) -> int:
+        """Masque d'un challenge (0 = neutre)."""
+        return get_challenge_masks().get(challenge_id, 0)
+
+    def challenge_masks(self) -> dict[int, int]:
+        """``{challenge_id: masque}`` des challenges restreints (ne pas modifier)."""
+        return get_challenge_masks()
+
+    def challenge_masks_for(self, challenge_ids) -> dict[int, int]:
+        """Masques d'une liste de challenges (les neutres sont absents)."""
+        masks = get_challenge_masks()
+        return {cid: masks[cid] for cid in challenge_ids if cid in masks}
+
+    def set_challenge_mask(self, challenge_id: int, mask: int) -> None:
+        """
+        Enregistre le choix explicite des camps d'un challenge (masque 0 =
+        neutre) et le match auquel ces camps appartiennent. Le choix
+        l'emporte sur les règles de camp (voir ``rules.follow_rules``).
+        """
+        registry = get_registry()
+        match_ids = registry.match_ids_for(mask)
+        values = {
+            "camp": registry.describe(mask) or CAMP_NONE,
+            "camp_mask": mask,
+            "match_id": match_ids.pop() if len(match_ids) == 1 else None,
+            "rule_id": None,
+        }
+        upsert(db.session.connection(), _challenge_camps, "challenge_id", challenge_id, values)
+        db.session.commit()
+        self._challenge_written(challenge_id, mask)
+
+    def forget_challenge(self, challenge_id: int) -> None:
+        """À appeler après la suppression d'un challenge (ligne supprimée en cascade)."""
+        self._challenge_written(challenge_id, 0)
+
+    def _challenge_written(self, challenge_id: int, mask: int) -> None:
+        invalidate_challenge_masks()
+
+    def reload_challenges(self) -> None:
+        """Oublie les masques en cache après une réécriture en lot de ``challenge_camps`` (règles)."""
+        invalidate_challenge_masks()
+
+    # --- Maintenance ---
+
+    def warm(self) -> None:
+        """Charge les appartenances (préchargement avant fork)."""
+        get_team_camps()
+        get_challenge_masks()
+
+    def reload(self) -> None:
+        """Oublie les données en cache après des écritures SQL directes (seeder, scripts)."""
+        self.reload_teams()
+        self.reload_challenges()
+
+
+# ---------------------------------------------------------------------------
+# Backend cache (hashes partagés, write-through)
+# ---------------------------------------------------------------------------
+
+# Champ présent dans chaque hash chargé : son absence signale un hash à recharger
+_LOADED = "_loaded"
+
+
+class _RedisHashes:
+    """Hashes Redis (client du cache CTFd)."""
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _decode(value):
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def get_fields(self, key: str, fields: list[str]) -> list[str | None]:
+        return [self._decode(value) for value in self.client.hmget(key, fields)]
+
+    def get_all(self, key: str) -> dict[str, str]:
+        return {self._decode(k): self._decode(v) for k, v in self.client.hgetall(key).items()}
+
+    def set_field(self, key: str, field: str, value: str) -> None:
+        self.client.hset(key, field, value)
+
+    def delete_field(self, key: str, field: str) -> None:
+        self.client.hdel(key, field)
+
+    def replace(self, key: str, mapping: dict[str, str], ttl: int) -> None:
+        pipe = self.client.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, ttl)
+        pipe.execute()
+
+    def drop(self, key: str) -> None:
+        self.client.delete(key)
+
+
+class _LocalHashes:
+    """Substitut en mémoire des hashes Redis (benchmark sans Redis uniquement : copie par processus)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hashes: dict[str, tuple[float, dict[str, str]]] = {}
+
+    def _get(self, key: str) -> dict[str, str]:
+        entry = self._hashes.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._hashes.pop(key, None)
+            return {}
+        return entry[1]
+
+    def get_fields(self, key: str, fields: list[str]) -> list[str | None]:
+        with self._lock:
+            values = self._get(key)
+            return [values.get(field) for field in fields]
+
+    def get_all(self, key: str) -> dict[str, str]:
+        with self._lock:
+            return dict(self._get(key))
+
+    def set_field(self, key: str, field: str, value: str) -> None:
+        with self._lock:
+            expires, values = self._hashes.get(key, (float("inf"), {}))
+            values[field] = value
+            self._hashes[key] = (expires, values)
+
+    def delete_field(self, key: str, field: str) -> None:
+        with self._lock:
+            self._get(key).pop(field, None)
+
+    def replace(self, key: str, mapping: dict[str, str], ttl: int) -> None:
+        with self._lock:
+            self._hashes[key] = (time.monotonic() + ttl, dict(mapping))
+
+    def drop(self, key: str) -> None:
+        with self._lock:
+            self._hashes.pop(key, None)
+
+
+class CachedMembershipStore(MembershipStore):
+    """Appartenances lues dans des hashes du cache partagé, écrites en SQL puis recopiées."""
+
+    name = "cache"
+
+    def __init__(self, hashes):
+        self.hashes = hashes
+
+    def _lookup(self, key: str, fields: list[str]) -> list[str | None] | None:
+        """Valeurs de champs d'un hash, rechargé au besoin (None : lire en SQL)."""
+        values = self.hashes.get_fields(key, [_LOADED] + fields)
+        if values[0] is None:
+            if not self._load(key):
+                return None
+            values = self.hashes.get_fields(key, [_LOADED] + fields)
+            if values[0] is None:
+                return None
+        return values[1:]
+
+    def _all(self, key: str) -> dict[str, str] | None:
+        values = self.hashes.get_all(key)
+        if _LOADED not in values:
+            if not self._load(key):
+                return None
+            values = self.hashes.get_all(key)
+        values.pop(_LOADED, None)
+        return values
+
+    def _load(self, key: str) -> bool:
+        """
+        Recharge un hash depuis SQL ; un seul worker à la fois (verrou dans le cache).
+
+        ``replace()`` écrase les écritures faites dans le hash pendant la
+        lecture SQL. Un écrivain publie la version de la donnée avant
+        d'écrire dans le hash (voir ``_team_written``) : si la version n'a
+        pas changé entre le début de la lecture et la fin du remplacement,
+        toute écriture manquée atterrit après ``replace()`` ; sinon le hash
+        est relu.
+        """
+        lock = f"{key}:lock"
+        if not cache.add(lock, 1, timeout=MEMBERSHIP_LOAD_LOCK_TIMEOUT):
+            return False
+        try:
+            if key == MEMBERSHIP_TEAMS_KEY:
+                version_name, columns = VERSION_TEAM_CAMPS, (TeamCamp.team_id, TeamCamp.camp)
+            else:
+                version_name, columns = VERSION_CHALLENGE_MASKS, (ChallengeCamp.challenge_id, ChallengeCamp.camp_mask)
+
+            for _ in range(MEMBERSHIP_LOAD_ATTEMPTS):
+                version = get_version(version_name)
+                rows = replica.run_read(lambda session: session.query(*columns).all(), version_name)
+                mapping = {str(k): str(v) for k, v in rows if v}
+                mapping[_LOADED] = "1"
+                self.hashes.replace(key, mapping, MEMBERSHIP_CACHE_TTL)
+                if get_version(version_name) == version:
+                    logger.debug("%s Hash %s rechargé (%d entrées)", LOG_PREFIX, key, len(mapping) - 1)
+                    return True
+
+            # Écritures continues : lectures en SQL, rechargement à la prochaine lecture
+            self.hashes.drop(key)
+            logger.info("%s Hash %s modifié pendant son rechargement, abandonné", LOG_PREFIX, key)
+            return False
+        finally:
+            cache.delete(lock)
+
+    def _write(self, key: str, field: int, value) -> None:
+        try:
+            if value:
+                self.hashes.set_field(key, str(field), str(value))
+            else:
+                self.hashes.delete_field(key, str(field))
+        except Exception:
+            # SQL est à jour : le hash est abandonné et sera rechargé
+            logger.exception("%s Erreur écriture %s, hash invalidé", LOG_PREFIX, key)
+            self.hashes.drop(key)
+
+    # --- Équipes ---
+
+    def team_side(self, team_id: int) -> str | None:
+        values = self._lookup(MEMBERSHIP_TEAMS_KEY, [str(team_id)])
+        if values is None:
+            return super().team_side(team_id)
+        return values[0]
+
+    def team_sides(self) -> dict[int, str]:
+        values = self._all(MEMBERSHIP_TEAMS_KEY)
+        if values is None:
+            return super().team_sides()
+        return {int(team_id): side for team_id, side in values.items()}
+
+    def _team_written(self, team_id: int, side: str | None) -> None:
+        # Version publiée avant l'écriture dans le hash (voir _load) ; les
+        # instantanés SQL servent en attendant un rechargement du hash
+        super()._team_written(team_id, side)
+        self._write(MEMBERSHIP_TEAMS_KEY, team_id, side)
+
+    def reload_teams(self) -> None:
+        super().reload_teams()
+        self.hashes.drop(MEMBERSHIP_TEAMS_KEY)
+
+    # --- Challenges ---
+
+    def challenge_mask(self, challenge_id: int) -> int:
+        values = self._lookup(MEMBERSHIP_CHALLENGES_KEY, [str(challenge_id)])
+        if values is None:
+            return super().challenge_mask(challenge_id)
+        return int(values[0] or 0)
+
+    def challenge_masks(self) -> dict[int, int]:
+        values = self._all(MEMBERSHIP_CHALLENGES_KEY)
+        if values is None:
+            return super().challenge_masks()
+        return {int(cid): int(mask) for cid, mask in values.items()}
+
+    def challenge_masks_for(self, challenge_ids) -> dict[int, int]:
+        challenge_ids = list(challenge_ids)
+        if not challenge_ids:
+            return {}
+        values = self._lookup(MEMBERSHIP_CHALLENGES_KEY, [str(cid) for cid in challenge_ids])
+        if values is None:
+            return super().challenge_masks_for(challenge_ids)
+        return {cid: int(mask) for cid, mask in zip(challenge_ids, values) if mask}
+
+    def _challenge_written(self, challenge_id: int, mask: int) -> None:
+        super()._challenge_written(challenge_id, mask)
+        self._write(MEMBERSHIP_CHALLENGES_KEY, challenge_id, mask)
+
+    def reload_challenges(self) -> None:
+        super().reload_challenges()
+        self.hashes.drop(MEMBERSHIP_CHALLENGES_KEY)
+
+    # --- Maintenance ---
+
+    def warm(self) -> None:
+        super().warm()
+        self._all(MEMBERSHIP_TEAMS_KEY)
+        self._all(MEMBERSHIP_CHALLENGES_KEY)
+
+
+# ---------------------------------------------------------------------------
+# Choix du backend
+# ---------------------------------------------------------------------------
+
+_store: MembershipStore | None = None
+
+
+def _redis_client():
+    """Client Redis du cache CTFd, None si le cache n'est pas Redis."""
+    return getattr(getattr(cache, "cache", None), "_write_client", None)
+
+
+def get_store() -> MembershipStore:
+    """Retourne le stockage des appartenances du processus."""
+    global _store
+    if _store is None:
+        name = os.environ.get(MEMBERSHIP_STORE_CONFIG_KEY, "sql")
+        if has_app_context():
+            name = current_app.config.get(MEMBERSHIP_STORE_CONFIG_KEY, name)
+        client = _redis_client()
+        if str(name).strip().lower() == "cache":
+            if client is not None:
+                _store = CachedMembershipStore(_RedisHashes(client))
+                logger.info("%s Appartenances : cache partagé (Redis)", LOG_PREFIX)
+            else:
+                logger.warning(
+                    "%s %s=cache exige le cache Redis de CTFd (partagé entre workers) : instantanés SQL utilisés",
+                    LOG_PREFIX, MEMBERSHIP_STORE_CONFIG_KEY,
+                )
+        if _store is None:
+            _store = MembershipStore()
+            logger.info("%s Appartenances : instantanés SQL", LOG_PREFIX)
+    return _store
+
+
+# ---------------------------------------------------------------------------
+# Benchmark (flask camps bench-membership)
+# ---------------------------------------------------------------------------
+
+def _percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+def benchmark(iterations: int = 10000, write_every: int = 0, random_seed: int | None = None) -> list[dict]:
+    """
+    Compare les deux backends sur le chemin du contrôle d'accès : côté
+    d'une équipe et masque d'un challenge tirés au hasard, une « requête »
+    par itération (mémo ``g`` vidé).
+
+    Aucune table n'est modifiée : la base peut être celle de production.
+
+    Args:
+        write_every: toutes les N itérations, rejoue la publication de
+            l'écriture du côté d'une équipe (valeur inchangée : invalidation
+            des instantanés, recopie dans le hash) pour mesurer le coût des
+            invalidations, sans écriture SQL ni historique.
+
+    Returns:
+        Une ligne par backend : débit et percentiles de latence (µs).
+    """
+    team_ids = list(get_team_camps()) or [0]
+    challenge_ids = list(get_challenge_masks()) or [0]
+    results = []
+
+    client = _redis_client()
+    hashes = _RedisHashes(client) if client is not None else _LocalHashes()
+    for store in (MembershipStore(), CachedMembershipStore(hashes)):
+        rng = random.Random(random_seed)
+        store.warm()
+        latencies = []
+        started = time.perf_counter()
+        for i in range(iterations):
+            for name in ("camps_team_camps", "camps_challenge_masks", "camps_registry"):
+                g.pop(name, None)
+            if write_every and i and i % write_every == 0:
+                team_id = rng.choice(team_ids)
+                store._team_written(team_id, store.team_side(team_id))
+
+            op_started = time.perf_counter()
+            store.team_side(rng.choice(team_ids))
+            store.challenge_mask(rng.choice(challenge_ids))
+            latencies.append(time.perf_counter() - op_started)
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        results.append({
+            "store": f"{store.name} ({type(store.hashes).__name__})" if hasattr(store, "hashes") else store.name,
+            "ops_per_s": iterations / elapsed if elapsed else 0.0,
+            "p50_us": _percentile(latencies, 50) * 1e6,
+            "p99_us": _percentile(latencies, 99) * 1e6,
+            "max_us": latencies[-1] * 1e6 if latencies else 0.0,
+        })
+    return results
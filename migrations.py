@@ -0,0 +1,249 @@
+"""
+Migrations de schéma du plugin CTFd Camps.
+
+Le plugin n'utilise pas Alembic : les tables sont créées par ``load()`` et
+ce module applique les évolutions incrémentales (colonnes ajoutées,
+colonnes élargies, données par défaut). Chaque étape est idempotente et
+peut être rejouée à chaque démarrage.
+"""
+
+import logging
+
+import sqlalchemy as sa
+
+from CTFd.models import db
+from CTFd.utils.config import get_config
+
+from .constants import (
+    BACKFILL_BATCH_SIZE,
+    CAMP_SLUG_MAX_LENGTH,
+    CFG_ACCESS_LOG_BACKFILLED,
+    CFG_MAX_BLUE_TEAMS,
+    CFG_MAX_RED_TEAMS,
+    CAMP_BLUE,
+    CAMP_RED,
+    DEFAULT_CAMPS,
+    LOG_PREFIX,
+)
+from .helpers import pack_ip, parse_request_info, set_config
+from .models import Camp, CampAccessLog, CampRound, ChallengeCamp, TeamCamp
+
+logger = logging.getLogger("CTFdCamps")
+
+# Colonnes ajoutées après la création initiale des tables (type et index
+# repris du modèle)
+_ADDED_COLUMNS = [
+    (ChallengeCamp, "camp_mask"),
+    (CampAccessLog, "method"),
+    (CampAccessLog, "path"),
+    (CampAccessLog, "ip"),
+    (CampAccessLog, "ip_packed"),
+    (Camp, "match_id"),
+    (ChallengeCamp, "match_id"),
+    (CampRound, "match_id"),
+    (ChallengeCamp, "rule_id"),
+    (CampAccessLog, "created_at"),
+]
+
+# Index déclarés après la création initiale de tables existantes
+_ADDED_INDEXES = [
+    (TeamCamp, "ix_team_camps_camp"),
+]
+
+# Colonnes de slug de camp autrefois limitées à VARCHAR(10)
+_SLUG_COLUMNS = [
+    ("challenge_camps", "camp"),
+    ("team_camps", "camp"),
+    ("camp_access_logs", "team_camp"),
+    ("camp_access_logs", "challenge_camp"),
+]
+
+
+def run_migrations(app) -> None:
+    """Applique toutes les migrations en attente."""
+    with app.app_context():
+        _fix_blob_columns()
+        _add_missing_columns()
+        _add_missing_indexes()
+        _widen_slug_columns()
+        _seed_default_camps()
+        _backfill_challenge_masks()
+        _backfill_access_log_columns()
+
+
+def _fix_blob_columns() -> None:
+    """
+    Convertit en VARBINARY(16) un ``ip_packed`` créé en BLOB sur MySQL /
+    MariaDB (versions précédentes du modèle) : son index n'a pas pu être créé.
+    """
+    if db.engine.dialect.name not in ("mysql", "mariadb"):
+        return
+
+    inspector = sa.inspect(db.engine)
+    info = next(
+        (c for c in inspector.get_columns("camp_access_logs") if c["name"] == "ip_packed"), None,
+    )
+    if info is None or "BLOB" not in str(info["type"]).upper():
+        return
+
+    logger.info("%s Conversion de camp_access_logs.ip_packed en VARBINARY(16)…", LOG_PREFIX)
+    with db.engine.begin() as conn:
+        conn.execute(sa.text("ALTER TABLE camp_access_logs MODIFY ip_packed VARBINARY(16)"))
+
+
+def _add_missing_columns() -> None:
+    inspector = sa.inspect(db.engine)
+    dialect = db.engine.dialect
+    for model, name in _ADDED_COLUMNS:
+        table = model.__table__
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        if name in existing:
+            continue
+
+        column = table.c[name]
+        ddl = f"ALTER TABLE {table.name} ADD COLUMN {name} {column.type.compile(dialect=dialect)}"
+        if not column.nullable:
+            ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+
+        logger.info("%s Ajout de la colonne %s.%s…", LOG_PREFIX, table.name, name)
+        with db.engine.begin() as conn:
+            conn.execute(sa.text(ddl))
+
+    # Index déclarés sur les colonnes ajoutées
+    for model, name in _ADDED_COLUMNS:
+        table = model.__table__
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if name in index.columns and index.name not in existing:
+                logger.info("%s Création de l'index %s…", LOG_PREFIX, index.name)
+                index.create(db.engine)
+
+
+def _add_missing_indexes() -> None:
+    inspector = sa.inspect(db.engine)
+    for model, name in _ADDED_INDEXES:
+        table = model.__table__
+        if name in {index["name"] for index in inspector.get_indexes(table.name)}:
+            continue
+        logger.info("%s Création de l'index %s…", LOG_PREFIX, name)
+        next(index for index in table.indexes if index.name == name).create(db.engine)
+
+
+def _widen_slug_columns() -> None:
+    """Élargit les colonnes de slug (SQLite n'impose pas de longueur)."""
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        return
+
+    inspector = sa.inspect(db.engine)
+    target = f"VARCHAR({CAMP_SLUG_MAX_LENGTH})"
+    for table, column in _SLUG_COLUMNS:
+        info = next((c for c in inspector.get_columns(table) if c["name"] == column), None)
+        length = getattr(info["type"], "length", None) if info else None
+        if length is None or length >= CAMP_SLUG_MAX_LENGTH:
+            continue
+
+        logger.info("%s Élargissement de %s.%s en %s…", LOG_PREFIX, table, column, target)
+        if dialect == "postgresql":
+            ddl = f"ALTER TABLE {table} ALTER COLUMN {column} TYPE {target}"
+        else:  # mysql / mariadb
+            ddl = f"ALTER TABLE {table} MODIFY {column} {target} NOT NULL"
+        with db.engine.begin() as conn:
+            conn.execute(sa.text(ddl))
+
+
+def _seed_default_camps() -> None:
+    """Crée les camps Bleu et Rouge à la première installation."""
+    if Camp.query.first() is not None:
+        return
+
+    # Reprise des quotas configurés avant l'introduction de la table camps
+    legacy_quotas = {
+        CAMP_BLUE: int(get_config(CFG_MAX_BLUE_TEAMS, default=0) or 0),
+        CAMP_RED: int(get_config(CFG_MAX_RED_TEAMS, default=0) or 0),
+    }
+    for position, spec in enumerate(DEFAULT_CAMPS):
+        db.session.add(Camp(
+            bit=position,
+            position=position,
+            max_teams=legacy_quotas.get(spec["slug"], 0),
+            **spec,
+        ))
+    db.session.commit()
+    logger.info("%s Camps par défaut créés : %s", LOG_PREFIX, ", ".join(c["slug"] for c in DEFAULT_CAMPS))
+
+
+def _backfill_challenge_masks() -> None:
+    """Renseigne camp_mask pour les lignes créées avant l'ajout de la colonne."""
+    camps = [(c.slug, c.bit) for c in Camp.query.all()]
+    db.session.close()
+
+    table = sa.table("challenge_camps", sa.column("camp"), sa.column("camp_mask"))
+    total = 0
+    with db.engine.begin() as conn:
+        for slug, bit in camps:
+            result = conn.execute(
+                table.update()
+                .where(table.c.camp == slug)
+                .where(table.c.camp_mask == 0)
+                .values(camp_mask=1 << bit)
+            )
+            total += result.rowcount or 0
+    if total:
+        logger.info("%s %d challenge(s) migré(s) vers le masque de camps", LOG_PREFIX, total)
+
+
+def _backfill_access_log_columns() -> None:
+    """
+    Découpe l'ancien request_info en méthode, chemin et IP, par lots.
+
+    Exécutée une seule fois (marqueur CFG_ACCESS_LOG_BACKFILLED) : les logs
+    écrits depuis renseignent toujours ``ip``, et ``ip IS NULL`` n'est pas
+    indexé.
+    """
+    if get_config(CFG_ACCESS_LOG_BACKFILLED):
+        return
+
+    logs = CampAccessLog.__table__
+    update = (
+        logs.update()
+        .where(logs.c.id == sa.bindparam("log_id"))
+        .values(
+            method=sa.bindparam("method"),
+            path=sa.bindparam("path"),
+            ip=sa.bindparam("ip"),
+            ip_packed=sa.bindparam("ip_packed"),
+        )
+    )
+
+    last_id, total = 0, 0
+    while True:
+        with db.engine.begin() as conn:
+            # ip IS NULL : jamais traité (une IP illisible est stockée en "")
+            rows = conn.execute(
+                sa.select(logs.c.id, logs.c.request_info)
+                .where(logs.c.ip.is_(None), logs.c.id > last_id)
+                .order_by(logs.c.id)
+                .limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+
+            params = []
+            for log_id, info in rows:
+                method, path, ip = parse_request_info(info)
+                params.append({
+                    "log_id": log_id,
+                    "method": method,
+                    "path": path,
+                    "ip": ip,
+                    "ip_packed": pack_ip(ip),
+                })
+            conn.execute(update, params)
+
+        last_id = rows[-1][0]
+        total += len(rows)
+
+    if total:
+        logger.info("%s %d log(s) d'accès découpé(s) (méthode, chemin, IP)", LOG_PREFIX, total)
+    set_config(CFG_ACCESS_LOG_BACKFILLED, True)
@@ -4,11 +4,57 @@ Modèles SQLAlchemy du plugin CTFd Camps.
 
 from datetime import datetime, timezone
 
+from sqlalchemy.dialects import mysql
+
 from CTFd.models import db
 
+from .constants import CAMP_SLUG_MAX_LENGTH, RULE_PATTERN_MAX_LENGTH
+
+
+class CampMatch(db.Model):
+    """
+    Match (ou poule) : groupe de camps indépendant des autres matchs.
+
+    Plusieurs matchs simultanés partagent l'instance CTFd ; chacun a ses
+    camps, ses challenges et ses manches. Un camp sans match appartient à
+    l'espace commun (fonctionnement historique, un seul match implicite).
+    """
+
+    __tablename__ = "camp_matches"
+
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(CAMP_SLUG_MAX_LENGTH), nullable=False, unique=True)
+    label = db.Column(db.String(64), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CampMatch slug={self.slug}>"
+
+
+class Camp(db.Model):
+    """Définition d'un camp (blue, red, purple…) et de son bit de visibilité."""
+
+    __tablename__ = "camps"
+
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(CAMP_SLUG_MAX_LENGTH), nullable=False, unique=True)
+    label = db.Column(db.String(64), nullable=False)
+    tagline = db.Column(db.String(64), default="")
+    icon = db.Column(db.String(16), default="")
+    color = db.Column(db.String(16), nullable=False, default="#6c757d")
+    description = db.Column(db.Text, default="")
+    features = db.Column(db.Text, default="")  # une ligne par puce
+    bit = db.Column(db.Integer, nullable=False, unique=True)  # 0..62
+    max_teams = db.Column(db.Integer, nullable=False, default=0)  # 0 = illimité
+    position = db.Column(db.Integer, nullable=False, default=0)
+    match_id = db.Column(db.Integer, db.ForeignKey("camp_matches.id"), nullable=True, index=True)  # NULL = hors match
+
+    def __repr__(self):
+        return f"<Camp slug={self.slug} bit={self.bit}>"
+
 
 class ChallengeCamp(db.Model):
-    """Association entre un challenge et un camp (Bleu ou Rouge)."""
+    """Camps autorisés à voir un challenge (masque de bits, 0 = neutre)."""
 
     __tablename__ = "challenge_camps"
 
@@ -19,18 +65,44 @@ class ChallengeCamp(db.Model):
         nullable=False,
         unique=True,
     )
-    camp = db.Column(db.String(10), nullable=False)  # "blue" | "red"
+    # Slug du camp si un seul camp, "multi" sinon (affichage / compatibilité)
+    camp = db.Column(db.String(CAMP_SLUG_MAX_LENGTH), nullable=False)
+    camp_mask = db.Column(db.BigInteger, nullable=False, default=0, server_default="0")
+    # Match des camps du masque (dénormalisé) : les challenges d'un match se lisent par l'index
+    match_id = db.Column(db.Integer, db.ForeignKey("camp_matches.id"), nullable=True, index=True)
+    # Règle dont la ligne est issue (recalculée par ``rules``) ; None : choix explicite de l'admin
+    rule_id = db.Column(db.Integer, nullable=True, index=True)
 
     challenge = db.relationship("Challenges", foreign_keys=[challenge_id], lazy="select")
 
     def __repr__(self):
-        return f"<ChallengeCamp challenge_id={self.challenge_id} camp={self.camp}>"
+        return f"<ChallengeCamp challenge_id={self.challenge_id} mask={self.camp_mask:#x}>"
+
+
+class CampRule(db.Model):
+    """
+    Règle d'assignation des challenges à des camps (par catégorie, tag ou
+    motif de nom). La première règle satisfaite, par position, s'applique
+    aux challenges sans choix explicite.
+    """
+
+    __tablename__ = "camp_rules"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(16), nullable=False)
+    pattern = db.Column(db.String(RULE_PATTERN_MAX_LENGTH), nullable=False)
+    camp_mask = db.Column(db.BigInteger, nullable=False, default=0)
+    position = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CampRule {self.kind}={self.pattern!r} mask={self.camp_mask:#x}>"
 
 
 class TeamCamp(db.Model):
-    """Association entre une équipe et un camp (Bleu ou Rouge)."""
+    """Association entre une équipe et un camp (slug de ``camps``)."""
 
     __tablename__ = "team_camps"
+    __table_args__ = (db.Index("ix_team_camps_camp", "camp"),)
 
     id = db.Column(db.Integer, primary_key=True)
     team_id = db.Column(
@@ -39,7 +111,7 @@ class TeamCamp(db.Model):
         nullable=False,
         unique=True,
     )
-    camp = db.Column(db.String(10), nullable=False)  # "blue" | "red"
+    camp = db.Column(db.String(CAMP_SLUG_MAX_LENGTH), nullable=False)
 
     team = db.relationship("Teams", foreign_keys=[team_id], lazy="select")
 
@@ -47,6 +119,105 @@ class TeamCamp(db.Model):
         return f"<TeamCamp team_id={self.team_id} camp={self.camp}>"
 
 
+class CampRound(db.Model):
+    """
+    Manche : correspondance côté → camp, active à partir de ``starts_at``.
+
+    Le camp enregistré pour une équipe (``team_camps.camp``) est son côté ;
+    son camp effectif est celui que la manche en cours associe à ce côté
+    (le côté lui-même hors manche). Inverser deux camps entre deux manches
+    revient à insérer une ligne, éventuellement planifiée. Chaque match a
+    ses propres manches, qui ne portent que sur ses camps.
+    """
+
+    __tablename__ = "camp_rounds"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    starts_at = db.Column(db.DateTime, nullable=False, index=True)  # UTC naïf
+    mapping = db.Column(db.Text, nullable=False, default="{}")    # JSON {côté: camp}, permutation
+    match_id = db.Column(db.Integer, db.ForeignKey("camp_matches.id"), nullable=True)  # NULL = camps hors match
+
+    def __repr__(self):
+        return f"<CampRound name={self.name} starts_at={self.starts_at}>"
+
+
+class ChallengeRelease(db.Model):
+    """
+    Fenêtre de publication d'un challenge pour un camp (camp effectif).
+
+    Hors de la fenêtre, le challenge est masqué à ce camp, en plus des
+    restrictions de ``challenge_camps``. Une borne absente est ouverte.
+    """
+
+    __tablename__ = "challenge_releases"
+    __table_args__ = (db.UniqueConstraint("challenge_id", "camp", name="uq_challenge_releases_challenge_camp"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    challenge_id = db.Column(
+        db.Integer,
+        db.ForeignKey("challenges.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    camp = db.Column(db.String(CAMP_SLUG_MAX_LENGTH), nullable=False)
+    opens_at = db.Column(db.DateTime, nullable=True)   # UTC naïf
+    closes_at = db.Column(db.DateTime, nullable=True)  # UTC naïf
+
+    def __repr__(self):
+        return f"<ChallengeRelease challenge_id={self.challenge_id} camp={self.camp}>"
+
+
+class TeamCampHistory(db.Model):
+    """
+    Historique des camps d'une équipe : une ligne par période d'appartenance.
+
+    Les lignes ne sont jamais supprimées ni réécrites ; seule ``valid_to``
+    est renseignée à la fermeture de la période (NULL = période en cours).
+    """
+
+    __tablename__ = "team_camp_history"
+    __table_args__ = (db.Index("ix_team_camp_history_team_from", "team_id", "valid_from"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    team_id = db.Column(
+        db.Integer,
+        db.ForeignKey("teams.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    camp = db.Column(db.String(CAMP_SLUG_MAX_LENGTH), nullable=False)
+    valid_from = db.Column(db.DateTime, nullable=False)  # UTC naïf, inclus
+    valid_to = db.Column(db.DateTime)                    # UTC naïf, exclu
+    changed_by = db.Column(db.Integer)                   # utilisateur à l'origine du changement
+
+    def __repr__(self):
+        return f"<TeamCampHistory team_id={self.team_id} camp={self.camp} from={self.valid_from}>"
+
+
+class CampTeamScore(db.Model):
+    """
+    Score d'une équipe maintenu incrémentalement pour le scoreboard des camps.
+
+    Le camp est dénormalisé depuis ``team_camps`` afin que le classement
+    d'un camp soit un simple parcours de l'index (camp, score).
+    """
+
+    __tablename__ = "camp_team_scores"
+    __table_args__ = (db.Index("ix_camp_team_scores_camp_score", "camp", "score"),)
+
+    team_id = db.Column(
+        db.Integer,
+        db.ForeignKey("teams.id", ondelete="CASCADE"),
+        primary_key=True,
+        autoincrement=False,
+    )
+    camp = db.Column(db.String(CAMP_SLUG_MAX_LENGTH), nullable=True)
+    score = db.Column(db.Integer, nullable=False, default=0)
+    last_update = db.Column(db.DateTime)  # départage des ex æquo, comme CTFd
+
+    def __repr__(self):
+        return f"<CampTeamScore team_id={self.team_id} camp={self.camp} score={self.score}>"
+
+
 class CampAccessLog(db.Model):
     """Log des tentatives d'accès aux challenges d'un autre camp."""
 
@@ -63,16 +234,95 @@ class CampAccessLog(db.Model):
         db.ForeignKey("challenges.id", ondelete="CASCADE"),
         nullable=False,
     )
-    team_camp = db.Column(db.String(10), nullable=False)
-    challenge_camp = db.Column(db.String(10), nullable=False)
+    team_camp = db.Column(db.String(CAMP_SLUG_MAX_LENGTH), nullable=False)
+    challenge_camp = db.Column(db.String(CAMP_SLUG_MAX_LENGTH), nullable=False)
     request_info = db.Column(db.String(500))  # "METHOD URL (IP: x.x.x.x)"
+    method = db.Column(db.String(10))
+    path = db.Column(db.String(255))
+    ip = db.Column(db.String(45))  # forme texte, pour l'affichage
+    # 16 octets (IPv4 en ::ffff:a.b.c.d) : une recherche CIDR est un BETWEEN sur l'index.
+    # VARBINARY sur MySQL / MariaDB : un BLOB ne peut pas être indexé sans longueur de clé
+    ip_packed = db.Column(
+        db.LargeBinary(16).with_variant(mysql.VARBINARY(16), "mysql", "mariadb"),
+        index=True,
+    )
+    # Date du refus (affichage, agrégats par heure)
     timestamp = db.Column(
         db.DateTime,
         default=lambda: datetime.now(timezone.utc),
     )
+    # Date d'insertion, horloge de la base : fenêtre de sécurité du job
+    # d'agrégats (un refus peut attendre dans le tampon des destinations)
+    created_at = db.Column(db.DateTime)
 
     team = db.relationship("Teams", foreign_keys=[team_id], lazy="select")
     challenge = db.relationship("Challenges", foreign_keys=[challenge_id], lazy="select")
 
     def __repr__(self):
         return f"<CampAccessLog team={self.team_id} challenge={self.challenge_id}>"
+
+
+# ---------------------------------------------------------------------------
+# Agrégats des logs d'accès (alimentés par log_stats.refresh_rollups)
+# ---------------------------------------------------------------------------
+
+class CampAccessLogHourly(db.Model):
+    """Nombre de refus par heure et par camp d'équipe."""
+
+    __tablename__ = "camp_access_log_hourly"
+
+    hour = db.Column(db.DateTime, primary_key=True)  # UTC, tronquée à l'heure
+    team_camp = db.Column(db.String(CAMP_SLUG_MAX_LENGTH), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CampAccessLogTeamStats(db.Model):
+    """Nombre de refus par équipe."""
+
+    __tablename__ = "camp_access_log_team_stats"
+
+    team_id = db.Column(
+        db.Integer,
+        db.ForeignKey("teams.id", ondelete="CASCADE"),
+        primary_key=True,
+        autoincrement=False,
+    )
+    count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    last_seen = db.Column(db.DateTime)
+
+
+class CampAccessLogChallengeStats(db.Model):
+    """Nombre de refus par challenge visé."""
+
+    __tablename__ = "camp_access_log_challenge_stats"
+
+    challenge_id = db.Column(
+        db.Integer,
+        db.ForeignKey("challenges.id", ondelete="CASCADE"),
+        primary_key=True,
+        autoincrement=False,
+    )
+    count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    last_seen = db.Column(db.DateTime)
+
+
+class CampAccessLogRollupState(db.Model):
+    """Dernier id de ``camp_access_logs`` intégré aux agrégats (ligne unique)."""
+
+    __tablename__ = "camp_access_log_rollup_state"
+
+    id = db.Column(db.Integer, primary_key=True)
+    last_log_id = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CampReplicaHeartbeat(db.Model):
+    """
+    Battement du réplica en lecture (ligne unique) : date, sur la primaire,
+    de la dernière écriture ; relue sur le réplica, elle donne sa position.
+    """
+
+    __tablename__ = "camp_replica_heartbeat"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # Horodatage epoch (float) : comparé tel quel aux dates d'écriture
+    beat_at = db.Column(db.Float, nullable=False)
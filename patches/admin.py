@@ -40,6 +40,72 @@ def _get_template(app: Flask, name: str, fallback_path: str) -> str | None:
         return None
 
 
+def _camp_field_html(help_text: str, selected_expr: str, follows_rules_expr: str) -> str:
+    """
+    Champ "Camp" des formulaires de challenge : une case par camp.
+
+    Les cases n'ont pas d'attribut name : le formulaire admin de CTFd
+    sérialise les champs homonymes en ne gardant que le dernier. Un champ
+    caché "camp" reçoit donc la liste séparée par des virgules ("none" si
+    aucune case n'est cochée, pour rendre le challenge neutre).
+
+    Les cases sont regroupées par match : un challenge ne peut cocher que
+    des camps d'un même match (refusé sinon par ``parse_camp_selection``).
+    La case « Règles » envoie "rules" : les camps sont alors donnés par les
+    règles de camp (catégorie, tag, nom) et les cases sont désactivées.
+    """
+    return """
+    {% block camp %}
+    {% set selected_camps = """ + selected_expr + """ %}
+    {% set follows_rules = """ + follows_rules_expr + """ %}
+    <div class="form-group camps-field">
+        <label>
+            Camp(s):<br>
+            <small class="form-text text-muted">""" + help_text + """</small>
+        </label>
+        <div class="form-check">
+            <input class="form-check-input camps-rules" type="checkbox" id="camps-rules" {% if follows_rules %}checked{% endif %}>
+            <label class="form-check-label" for="camps-rules">Selon les règles de camp (catégorie, tag, nom)</label>
+        </div>
+        {% for match, camps in get_camp_groups() %}
+        <div>
+            {% if match %}<small class="text-muted d-block">{{ match.label }}</small>{% endif %}
+            {% for camp in camps %}
+            <div class="form-check form-check-inline">
+                <input class="form-check-input camps-checkbox" type="checkbox" id="camp-{{ camp.slug }}"
+                       value="{{ camp.slug }}" {% if camp.slug in selected_camps %}checked{% endif %}
+                       {% if follows_rules %}disabled{% endif %}>
+                <label class="form-check-label" for="camp-{{ camp.slug }}">{{ camp.icon }} {{ camp.label }}{% if camp.tagline %} ({{ camp.tagline }}){% endif %}</label>
+            </div>
+            {% endfor %}
+        </div>
+        {% endfor %}
+        <input type="hidden" name="camp" class="camps-value"
+               value="{{ 'rules' if follows_rules else (selected_camps | join(',') or 'none') }}">
+        <script>
+        // Délégation sur document : fonctionne aussi si le formulaire est injecté dynamiquement
+        if (!window.campsFieldBound) {
+            window.campsFieldBound = true;
+            document.addEventListener('change', function(e) {
+                if (!e.target.classList) return;
+                var rules = e.target.classList.contains('camps-rules');
+                if (!rules && !e.target.classList.contains('camps-checkbox')) return;
+                var field = e.target.closest('.camps-field');
+                var followRules = field.querySelector('.camps-rules').checked;
+                var boxes = field.querySelectorAll('.camps-checkbox');
+                Array.prototype.forEach.call(boxes, function(b) { b.disabled = followRules; });
+                var values = Array.prototype.filter.call(
+                    boxes, function(b) { return b.checked; }
+                ).map(function(b) { return b.value; });
+                field.querySelector('.camps-value').value = followRules ? 'rules' : (values.join(',') || 'none');
+            });
+        }
+        </script>
+    </div>
+    {% endblock %}
+    """
+
+
 def _apply_patch(template_name: str, content: str, success: bool) -> None:
     """Applique un override de template si le patch a réussi."""
     if success:
@@ -144,26 +210,17 @@ def _patch_challenges_page(app: Flask) -> None:
         logger.warning("[CTFd Camps] Titre Challenges non trouvé dans le template")
         return
 
+    # Bandeau du camp mis en cache (commun au camp), bouton propre à l'équipe
     badge_html = """
             {% if session.get('id') %}
-                {% set team = get_current_team() %}
-                {% if team %}
-                    {% set team_camp = get_team_camp(team.id) %}
-                    {% if team_camp %}
-                        <div class="mt-3">
-                            <span class="badge badge-pill {% if team_camp == 'blue' %}badge-primary{% else %}badge-danger{% endif %} p-3" style="font-size: 1.1em;">
-                                {% if team_camp == 'blue' %}
-                                    🔵 Vous êtes dans le <strong>Camp Bleu</strong> (Défenseurs)
-                                {% else %}
-                                    🔴 Vous êtes dans le <strong>Camp Rouge</strong> (Attaquants)
-                                {% endif %}
-                            </span>
-                            {% set can_change_camp_display = can_change_camp_for_display() %}
-                            {% if can_change_camp_display %}
-                                <a href="/camps/select" class="btn btn-sm btn-outline-light ml-2">🔄 Changer de camp</a>
-                            {% endif %}
-                        </div>
-                    {% endif %}
+                {% set camp_ctx = camp_context() %}
+                {% if camp_ctx.camp_info %}
+                    <div class="mt-3">
+                        {{ camp_banner(camp_ctx.camp) }}
+                        {% if camp_ctx.can_change %}
+                            <a href="/camps/select" id="camps-change-btn" class="btn btn-sm btn-outline-light ml-2">🔄 Changer de camp</a>
+                        {% endif %}
+                    </div>
                 {% endif %}
             {% endif %}
 """
@@ -187,21 +244,11 @@ def _patch_create_challenge(app: Flask) -> None:
         _apply_patch(tpl_name, content, False)
         return
 
-    camp_field = """
-    {% block camp %}
-    <div class="form-group">
-        <label>
-            Camp:<br>
-            <small class="form-text text-muted">Choisir le camp pour ce challenge</small>
-        </label>
-        <select class="form-control" name="camp" required>
-            <option value="">-- Sélectionner un camp --</option>
-            <option value="blue">🔵 Camp Bleu (Défenseurs)</option>
-            <option value="red">🔴 Camp Rouge (Attaquants)</option>
-        </select>
-    </div>
-    {% endblock %}
-    """
+    camp_field = _camp_field_html(
+        help_text="Camps autorisés à voir ce challenge (aucun = neutre, visible par tous)",
+        selected_expr="[]",
+        follows_rules_expr="true",
+    )
     pos = match.start()
     content = content[:pos] + camp_field + content[pos:]
     _apply_patch(tpl_name, content, True)
@@ -222,22 +269,11 @@ def _patch_update_challenge(app: Flask) -> None:
         _apply_patch(tpl_name, content, False)
         return
 
-    camp_field = """
-    {% block camp %}
-    {% set challenge_camp = get_challenge_camp(challenge.id) %}
-    <div class="form-group">
-        <label>
-            Camp:<br>
-            <small class="form-text text-muted">Camp du challenge</small>
-        </label>
-        <select class="form-control chal-camp" name="camp" required>
-            <option value="">-- Sélectionner un camp --</option>
-            <option value="blue" {% if challenge_camp == 'blue' %}selected{% endif %}>🔵 Camp Bleu (Défenseurs)</option>
-            <option value="red" {% if challenge_camp == 'red' %}selected{% endif %}>🔴 Camp Rouge (Attaquants)</option>
-        </select>
-    </div>
-    {% endblock %}
-    """
+    camp_field = _camp_field_html(
+        help_text="Camps du challenge (aucun = neutre, visible par tous)",
+        selected_expr="get_challenge_camps(challenge.id)",
+        follows_rules_expr="challenge_follows_rules(challenge.id)",
+    )
     pos = match.start()
     content = content[:pos] + camp_field + content[pos:]
     _apply_patch(tpl_name, content, True)
@@ -0,0 +1,427 @@
+"""
+Registre des camps du plugin CTFd Camps.
+
+Les définitions de la table ``camps`` sont chargées une fois par processus
+dans un instantané immuable, reconstruit uniquement lorsque la version
+partagée ``registry`` change (création, modification ou suppression d'un
+camp, quel que soit le worker).
+
+La visibilité d'un challenge est un masque de bits : le bit ``Camp.bit``
+est levé pour chaque camp autorisé, 0 signifiant « neutre » (visible par
+tous). Le filtrage se réduit donc à un ET binaire par challenge. Les
+masques de tous les challenges sont mis en cache de la même manière, sous
+la version ``challenge_masks``, ainsi que le camp de chaque équipe, sous la
+version ``team_camps``. Ces instantanés sont lus par le backend SQL de
+``membership`` et rechargés sur le réplica en lecture s'il a rejoint la
+dernière écriture (voir ``replica``).
+
+Les manches (``camp_rounds``) font partie du registre. Le camp enregistré
+pour une équipe est son côté ; son camp effectif est résolu à chaque
+lecture par la manche active, trouvée par dichotomie sur les dates de
+début. Une inversion planifiée ne demande donc aucune invalidation au
+moment de la bascule.
+
+Les matchs (``camp_matches``) regroupent des camps : chaque bit de
+visibilité appartient à un seul match, si bien qu'un challenge assigné aux
+camps d'un match reste invisible des autres matchs sans filtrage
+supplémentaire. Chaque match a son propre calendrier de manches ; les
+camps sans match forment l'espace commun (``match_id`` None).
+"""
+
+import bisect
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+
+from flask import g, has_app_context
+
+from . import replica
+from .caching import bump_version, get_version
+from .constants import (
+    CAMP_MULTI,
+    LOG_PREFIX,
+    MAX_CAMPS,
+    VERSION_CHALLENGE_MASKS,
+    VERSION_REGISTRY,
+    VERSION_TEAM_CAMPS,
+)
+from .models import Camp, CampMatch, CampRound, ChallengeCamp, TeamCamp
+
+logger = logging.getLogger("CTFdCamps")
+
+# Portée « tous les camps », par opposition à un match ou à l'espace commun (None)
+ALL_MATCHES = "all"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class CampInfo:
+    """Copie en lecture seule d'une ligne de ``camps`` (sans session ORM)."""
+
+    __slots__ = (
+        "id", "slug", "label", "tagline", "icon", "color",
+        "description", "features", "bit", "mask", "max_teams", "position", "match_id",
+    )
+
+    def __init__(self, camp: Camp):
+        self.id = camp.id
+        self.slug = camp.slug
+        self.label = camp.label
+        self.tagline = camp.tagline or ""
+        self.icon = camp.icon or ""
+        self.color = camp.color
+        self.description = camp.description or ""
+        self.features = [line for line in (camp.features or "").splitlines() if line.strip()]
+        self.bit = camp.bit
+        self.mask = 1 << camp.bit
+        self.max_teams = camp.max_teams or 0
+        self.position = camp.position or 0
+        self.match_id = camp.match_id
+
+    def to_dict(self) -> dict:
+        return {
+            "slug": self.slug,
+            "label": self.label,
+            "tagline": self.tagline,
+            "icon": self.icon,
+            "color": self.color,
+        }
+
+
+class MatchInfo:
+    """Copie en lecture seule d'une ligne de ``camp_matches``, avec ses camps."""
+
+    __slots__ = ("id", "slug", "label", "position", "camps", "mask")
+
+    def __init__(self, match: CampMatch, camps: list[CampInfo]):
+        self.id = match.id
+        self.slug = match.slug
+        self.label = match.label
+        self.position = match.position or 0
+        self.camps = tuple(camps)
+        self.mask = 0
+        for camp in self.camps:
+            self.mask |= camp.mask
+
+    @property
+    def slugs(self) -> list[str]:
+        return [c.slug for c in self.camps]
+
+    def to_dict(self) -> dict:
+        return {"slug": self.slug, "label": self.label, "camps": self.slugs}
+
+
+class RoundInfo:
+    """Copie en lecture seule d'une ligne de ``camp_rounds``."""
+
+    __slots__ = ("id", "name", "starts_at", "mapping", "inverse", "match_id")
+
+    def __init__(self, camp_round: CampRound):
+        self.id = camp_round.id
+        self.name = camp_round.name
+        self.starts_at = camp_round.starts_at
+        self.match_id = camp_round.match_id
+        try:
+            mapping = json.loads(camp_round.mapping or "{}")
+        except ValueError:
+            logger.warning("%s Correspondance invalide pour la manche %s", LOG_PREFIX, camp_round.name)
+            mapping = {}
+        # Seuls les côtés qui changent de camp sont conservés
+        self.mapping = {side: camp for side, camp in mapping.items() if side != camp}
+        self.inverse = {camp: side for side, camp in self.mapping.items()}
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "starts_at": self.starts_at.isoformat(),
+            "mapping": self.mapping,
+        }
+
+
+class CampRegistry:
+    """Instantané immuable des camps définis, des matchs et des manches."""
+
+    def __init__(self, camps: list[CampInfo], rounds: list[RoundInfo] = (), matches: list[CampMatch] = ()):
+        self.camps = tuple(sorted(camps, key=lambda c: (c.position, c.bit)))
+        self.by_slug = {c.slug: c for c in self.camps}
+        self.by_bit = {c.bit: c for c in self.camps}
+        self.all_mask = 0
+        for camp in self.camps:
+            self.all_mask |= camp.mask
+
+        self.matches = tuple(sorted(
+            (MatchInfo(m, [c for c in self.camps if c.match_id == m.id]) for m in matches),
+            key=lambda m: (m.position, m.id),
+        ))
+        self.matches_by_id = {m.id: m for m in self.matches}
+        self.matches_by_slug = {m.slug: m for m in self.matches}
+        self._camps_by_match = {None: tuple(c for c in self.camps if c.match_id not in self.matches_by_id)}
+        for match in self.matches:
+            self._camps_by_match[match.id] = match.camps
+
+        # Un calendrier de manches par match : (dates de début, manches)
+        self.rounds = tuple(sorted(rounds, key=lambda r: (r.starts_at, r.id)))
+        self._schedules: dict[int | None, tuple[list[datetime], tuple[RoundInfo, ...]]] = {}
+        for match_id in self._camps_by_match:
+            scheduled = tuple(r for r in self.rounds if r.match_id == match_id)
+            self._schedules[match_id] = ([r.starts_at for r in scheduled], scheduled)
+
+    def __iter__(self):
+        return iter(self.camps)
+
+    def __contains__(self, slug) -> bool:
+        return slug in self.by_slug
+
+    @property
+    def slugs(self) -> list[str]:
+        return [c.slug for c in self.camps]
+
+    def get(self, slug: str | None) -> CampInfo | None:
+        return self.by_slug.get(slug) if slug else None
+
+    def mask_of(self, slug: str | None) -> int:
+        """Bit du camp (0 si le camp n'existe pas)."""
+        camp = self.by_slug.get(slug) if slug else None
+        return camp.mask if camp else 0
+
+    def mask_for(self, slugs) -> int:
+        mask = 0
+        for slug in slugs:
+            mask |= self.mask_of(slug)
+        return mask
+
+    def camps_for(self, mask: int) -> list[CampInfo]:
+        """Camps autorisés par un masque (tous si le masque est neutre)."""
+        if not mask:
+            return list(self.camps)
+        return [c for c in self.camps if mask & c.mask]
+
+    def slugs_for(self, mask: int) -> list[str]:
+        return [c.slug for c in self.camps_for(mask)] if mask else []
+
+    def describe(self, mask: int) -> str | None:
+        """Valeur de la colonne ``camp`` : slug unique, "multi", ou None si neutre."""
+        slugs = self.slugs_for(mask)
+        if not slugs:
+            return None
+        return slugs[0] if len(slugs) == 1 else CAMP_MULTI
+
+    def label_for(self, mask: int) -> str:
+        camps = self.camps_for(mask) if mask else []
+        return ", ".join(c.label for c in camps)
+
+    # --- Matchs ---
+
+    def get_match(self, slug: str | None) -> MatchInfo | None:
+        return self.matches_by_slug.get(slug) if slug else None
+
+    def match_id_of(self, slug: str | None) -> int | None:
+        """Match d'un camp (None : espace commun ou camp inconnu)."""
+        camp = self.by_slug.get(slug) if slug else None
+        return camp.match_id if camp and camp.match_id in self.matches_by_id else None
+
+    def match_ids_for(self, mask: int) -> set[int | None]:
+        """Matchs des camps d'un masque (un seul pour un masque valide)."""
+        return {self.match_id_of(c.slug) for c in self.camps_for(mask)} if mask else set()
+
+    def camps_of(self, scope) -> tuple[CampInfo, ...]:
+        """Camps d'un match, de l'espace commun (None) ou de tous (ALL_MATCHES)."""
+        if scope == ALL_MATCHES:
+            return self.camps
+        return self._camps_by_match.get(scope, ())
+
+    def groups(self) -> list[tuple[MatchInfo | None, tuple[CampInfo, ...]]]:
+        """Camps regroupés par match (espace commun en premier), groupes vides exclus."""
+        groups = [(None, self._camps_by_match[None])] + [(m, m.camps) for m in self.matches]
+        return [(match, camps) for match, camps in groups if camps]
+
+    # --- Manches ---
+
+    def active_round(self, now: datetime | None = None, match_id: int | None = None) -> RoundInfo | None:
+        """Dernière manche commencée d'un match (None avant la première)."""
+        starts, rounds = self._schedules.get(match_id, ((), ()))
+        index = bisect.bisect_right(starts, now or _utcnow()) - 1
+        return rounds[index] if index >= 0 else None
+
+    def active_rounds_key(self, now: datetime | None = None) -> str:
+        """Manches actives de tous les matchs, pour les clés de cache."""
+        now = now or _utcnow()
+        active = (self.active_round(now, match_id) for match_id in self._schedules)
+        return "-".join(str(r.id if r else 0) for r in active)
+
+    def next_transition(self, now: datetime | None = None, match_id: int | None = None) -> datetime | None:
+        """Début de la prochaine manche planifiée d'un match, ou None."""
+        starts, _ = self._schedules.get(match_id, ((), ()))
+        index = bisect.bisect_right(starts, now or _utcnow())
+        return starts[index] if index < len(starts) else None
+
+    def camp_of_side(self, side: str | None, now: datetime | None = None) -> str | None:
+        """Camp effectif d'un côté pendant la manche active de son match."""
+        if not side or not self.rounds:
+            return side
+        current = self.active_round(now, self.match_id_of(side))
+        return current.mapping.get(side, side) if current else side
+
+    def side_of_camp(self, camp: str | None, now: datetime | None = None) -> str | None:
+        """Côté à enregistrer pour qu'une équipe soit dans ``camp`` pendant la manche active."""
+        if not camp or not self.rounds:
+            return camp
+        current = self.active_round(now, self.match_id_of(camp))
+        return current.inverse.get(camp, camp) if current else camp
+
+    def free_bit(self) -> int | None:
+        """Premier bit libre, ou None si le nombre maximal de camps est atteint."""
+        for bit in range(MAX_CAMPS):
+            if bit not in self.by_bit:
+                return bit
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Cache du processus
+# ---------------------------------------------------------------------------
+
+_lock = threading.Lock()
+_snapshot: tuple[int, CampRegistry] | None = None
+
+
+def get_registry() -> CampRegistry:
+    """
+    Retourne le registre courant.
+
+    Une seule lecture de version dans le cache partagé par requête ;
+    la table ``camps`` n'est relue que si la version a changé.
+    """
+    global _snapshot
+
+    if has_app_context() and "camps_registry" in g:
+        return g.camps_registry
+
+    version = get_version(VERSION_REGISTRY)
+    snapshot = _snapshot
+    if snapshot is None or snapshot[0] != version:
+        with _lock:
+            snapshot = _snapshot
+            if snapshot is None or snapshot[0] != version:
+                registry = CampRegistry(
+                    [CampInfo(c) for c in Camp.query.all()],
+                    [RoundInfo(r) for r in CampRound.query.all()],
+                    CampMatch.query.all(),
+                )
+                snapshot = (version, registry)
+                _snapshot = snapshot
+                logger.debug("%s Registre des camps rechargé (v%d)", LOG_PREFIX, version)
+
+    if has_app_context():
+        g.camps_registry = snapshot[1]
+    return snapshot[1]
+
+
+def invalidate_registry() -> None:
+    """À appeler après toute écriture dans les tables ``camps``, ``camp_matches`` et ``camp_rounds``."""
+    global _snapshot
+    _snapshot = None
+    bump_version(VERSION_REGISTRY)
+    if has_app_context():
+        g.pop("camps_registry", None)
+
+
+# ---------------------------------------------------------------------------
+# Masques des challenges
+# ---------------------------------------------------------------------------
+
+_masks_lock = threading.Lock()
+_masks_snapshot: tuple[int, dict[int, int]] | None = None
+
+
+def get_challenge_masks() -> dict[int, int]:
+    """
+    Retourne ``{challenge_id: masque}`` pour les challenges restreints
+    (un challenge absent est neutre).
+
+    Le dictionnaire est partagé entre les requêtes : ne pas le modifier.
+    """
+    global _masks_snapshot
+
+    if has_app_context() and "camps_challenge_masks" in g:
+        return g.camps_challenge_masks
+
+    version = get_version(VERSION_CHALLENGE_MASKS)
+    snapshot = _masks_snapshot
+    if snapshot is None or snapshot[0] != version:
+        with _masks_lock:
+            snapshot = _masks_snapshot
+            if snapshot is None or snapshot[0] != version:
+                rows = replica.run_read(
+                    lambda s: s.query(ChallengeCamp.challenge_id, ChallengeCamp.camp_mask).all(),
+                    VERSION_CHALLENGE_MASKS,
+                )
+                snapshot = (version, {challenge_id: mask for challenge_id, mask in rows if mask})
+                _masks_snapshot = snapshot
+
+    if has_app_context():
+        g.camps_challenge_masks = snapshot[1]
+    return snapshot[1]
+
+
+def invalidate_challenge_masks() -> None:
+    """À appeler après toute écriture dans la table ``challenge_camps``."""
+    global _masks_snapshot
+    _masks_snapshot = None
+    # Avant la nouvelle version : qui la lit attend aussi le réplica
+    replica.note_write(VERSION_CHALLENGE_MASKS)
+    bump_version(VERSION_CHALLENGE_MASKS)
+    if has_app_context():
+        g.pop("camps_challenge_masks", None)
+
+
+# ---------------------------------------------------------------------------
+# Camps des équipes
+# ---------------------------------------------------------------------------
+
+_teams_lock = threading.Lock()
+_teams_snapshot: tuple[int, dict[int, str]] | None = None
+
+
+def get_team_camps() -> dict[int, str]:
+    """
+    Retourne ``{team_id: côté}`` pour les équipes affectées à un camp
+    (valeurs enregistrées, avant résolution par la manche active).
+
+    Le dictionnaire est partagé entre les requêtes : ne pas le modifier.
+    """
+    global _teams_snapshot
+
+    if has_app_context() and "camps_team_camps" in g:
+        return g.camps_team_camps
+
+    version = get_version(VERSION_TEAM_CAMPS)
+    snapshot = _teams_snapshot
+    if snapshot is None or snapshot[0] != version:
+        with _teams_lock:
+            snapshot = _teams_snapshot
+            if snapshot is None or snapshot[0] != version:
+                rows = replica.run_read(
+                    lambda s: s.query(TeamCamp.team_id, TeamCamp.camp).all(),
+                    VERSION_TEAM_CAMPS,
+                )
+                snapshot = (version, {team_id: camp for team_id, camp in rows if camp})
+                _teams_snapshot = snapshot
+
+    if has_app_context():
+        g.camps_team_camps = snapshot[1]
+    return snapshot[1]
+
+
+def invalidate_team_camps() -> None:
+    """À appeler après toute écriture dans la table ``team_camps``."""
+    global _teams_snapshot
+    _teams_snapshot = None
+    replica.note_write(VERSION_TEAM_CAMPS)
+    bump_version(VERSION_TEAM_CAMPS)
+    if has_app_context():
+        g.pop("camps_team_camps", None)
@@ -0,0 +1,183 @@
+"""
+Fenêtres de publication des challenges par camp.
+
+Une ligne de ``challenge_releases`` masque un challenge à un camp avant
+``opens_at`` et après ``closes_at`` (par exemple les challenges d'attaque
+publiés au camp rouge à H+1). Évaluer chaque fenêtre à chaque requête
+coûterait une boucle par challenge ; l'index précalcule à la place, pour
+l'instant présent :
+
+  - les bits des camps actuellement hors fenêtre, par challenge ;
+  - la prochaine date de bascule (ouverture ou fermeture la plus proche).
+
+Tant que cette date n'est pas atteinte, l'index reste valable : une
+vérification de visibilité est une lecture de dictionnaire et une
+comparaison de dates. L'index est recalculé en mémoire, sans relire la
+base, exactement à la bascule suivante ; les fenêtres ne sont relues que
+si la version partagée ``releases`` a changé.
+
+Un challenge neutre (masque 0) dont une fenêtre est fermée devient visible
+par les seuls autres camps ; s'il n'est plus visible par aucun camp, il
+reçoit ``HIDDEN_MASK``, un bit attribué à aucun camp.
+"""
+
+import logging
+import threading
+from datetime import datetime, timezone
+
+from flask import g, has_app_context
+
+from .caching import bump_version, get_version
+from .constants import LOG_PREFIX, MAX_CAMPS, VERSION_RELEASES
+from .models import ChallengeRelease
+from .registry import get_registry
+
+logger = logging.getLogger("CTFdCamps")
+
+# Bit au-delà des camps possibles : masque non neutre qu'aucun camp ne voit
+HIDDEN_MASK = 1 << MAX_CAMPS
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ReleaseWindow:
+    """Copie en lecture seule d'une ligne de ``challenge_releases``."""
+
+    __slots__ = ("id", "challenge_id", "camp", "opens_at", "closes_at")
+
+    def __init__(self, release: ChallengeRelease):
+        self.id = release.id
+        self.challenge_id = release.challenge_id
+        self.camp = release.camp
+        self.opens_at = release.opens_at
+        self.closes_at = release.closes_at
+
+    def is_open(self, now: datetime) -> bool:
+        return (self.opens_at is None or self.opens_at <= now) and (self.closes_at is None or now < self.closes_at)
+
+
+class ReleaseIndex:
+    """Visibilité des fenêtres à un instant donné, valable jusqu'à ``valid_until``."""
+
+    def __init__(self, windows: list[ReleaseWindow], registry, now: datetime):
+        self.registry = registry
+        self.windows = windows
+        self.closed: dict[int, int] = {}
+        self._boundaries: list[tuple[datetime, int]] = []
+        last = None
+
+        for window in windows:
+            bit = registry.mask_of(window.camp)
+            if not bit:
+                continue
+            if not window.is_open(now):
+                self.closed[window.challenge_id] = self.closed.get(window.challenge_id, 0) | bit
+            for moment in (window.opens_at, window.closes_at):
+                if moment is None:
+                    continue
+                if moment > now:
+                    self._boundaries.append((moment, bit))
+                elif last is None or moment > last:
+                    last = moment
+
+        self._boundaries.sort(key=lambda item: item[0])
+        self.valid_until = self._boundaries[0][0] if self._boundaries else None
+        # Identique dans tous les workers entre deux bascules : sert de clé de cache
+        self.epoch = int(last.replace(tzinfo=timezone.utc).timestamp()) if last else 0
+        self._hidden: dict[int, frozenset[int]] = {}
+
+    def is_current(self, now: datetime) -> bool:
+        return self.valid_until is None or now < self.valid_until
+
+    def effective_mask(self, challenge_id: int, mask: int) -> int:
+        """Masque d'un challenge après application des fenêtres fermées."""
+        closed = self.closed.get(challenge_id)
+        if not closed:
+            return mask
+        remaining = (mask or self.registry.all_mask) & ~closed
+        return remaining or HIDDEN_MASK
+
+    def effective_masks(self, challenge_ids, masks: dict[int, int]) -> dict[int, int]:
+        """Variante en lot de ``effective_mask`` (les neutres restent absents)."""
+        if not self.closed:
+            return masks
+        result = dict(masks)
+        for challenge_id in challenge_ids:
+            if challenge_id in self.closed:
+                result[challenge_id] = self.effective_mask(challenge_id, masks.get(challenge_id, 0))
+        return result
+
+    def hidden_for(self, team_mask: int) -> frozenset[int]:
+        """Challenges dont la fenêtre est fermée pour ce camp."""
+        hidden = self._hidden.get(team_mask)
+        if hidden is None:
+            hidden = frozenset(cid for cid, closed in self.closed.items() if closed & team_mask)
+            self._hidden[team_mask] = hidden
+        return hidden
+
+    def transitions_for(self, team_mask: int) -> list[datetime]:
+        """Ouvertures et fermetures à venir concernant ce camp, dans l'ordre."""
+        return sorted({moment for moment, bit in self._boundaries if bit & team_mask})
+
+
+# ---------------------------------------------------------------------------
+# Cache du processus
+# ---------------------------------------------------------------------------
+
+_lock = threading.Lock()
+_snapshot: tuple[int, ReleaseIndex] | None = None
+
+
+def get_release_index() -> ReleaseIndex:
+    """
+    Index courant : les fenêtres sont relues si la version ``releases`` a
+    changé, l'index est recalculé si le registre a changé ou si la
+    prochaine bascule est atteinte.
+    """
+    global _snapshot
+
+    if has_app_context() and "camps_release_index" in g:
+        return g.camps_release_index
+
+    version = get_version(VERSION_RELEASES)
+    registry = get_registry()
+    now = _utcnow()
+    snapshot = _snapshot
+    if not _usable(snapshot, version, registry, now):
+        with _lock:
+            snapshot = _snapshot
+            if not _usable(snapshot, version, registry, now):
+                if snapshot is not None and snapshot[0] == version:
+                    windows = snapshot[1].windows
+                else:
+                    windows = [ReleaseWindow(r) for r in ChallengeRelease.query.all()]
+                snapshot = (version, ReleaseIndex(windows, registry, now))
+                _snapshot = snapshot
+                logger.debug(
+                    "%s Index de publication recalculé (v%d, prochaine bascule %s)",
+                    LOG_PREFIX, version, snapshot[1].valid_until,
+                )
+
+    if has_app_context():
+        g.camps_release_index = snapshot[1]
+    return snapshot[1]
+
+
+def _usable(snapshot, version: int, registry, now: datetime) -> bool:
+    return (
+        snapshot is not None
+        and snapshot[0] == version
+        and snapshot[1].registry is registry
+        and snapshot[1].is_current(now)
+    )
+
+
+def invalidate_releases() -> None:
+    """À appeler après toute écriture dans la table ``challenge_releases``."""
+    global _snapshot
+    _snapshot = None
+    bump_version(VERSION_RELEASES)
+    if has_app_context():
+        g.pop("camps_release_index", None)
@@ -0,0 +1,293 @@
+"""
+Routage des lectures du plugin vers une base secondaire (réplica).
+
+Les lectures seules du plugin (instantanés des camps des équipes et des
+masques des challenges, page des logs, statistiques, historique) peuvent
+être servies par un réplica au lieu de concurrencer les écritures (flags,
+sélections) sur la base primaire. Le réplica est activé par
+``CAMPS_READ_REPLICA_URI`` (config CTFd ou variable d'environnement) ;
+sans cette clé, tout est lu sur la primaire, sans surcoût.
+
+Une lecture n'est envoyée au réplica que s'il a déjà rejoué toutes les
+écritures qu'elle doit voir. La position du réplica est mesurée par un
+battement : une ligne unique de ``camp_replica_heartbeat`` réécrite sur la
+primaire (un worker par intervalle, verrou dans le cache) puis relue sur
+le réplica. Une lecture reste sur la primaire :
+
+  - dans une requête qui a écrit sur la primaire, et pour la même session
+    (navigateur) tant que le réplica n'a pas rejoint cette écriture ;
+  - pour un instantané rechargé après une écriture (``note_write``) que
+    le réplica n'a pas encore rejointe ;
+  - si le réplica a plus de REPLICA_MAX_LAG secondes de retard, ne répond
+    pas ou échoue (la lecture est alors rejouée sur la primaire et le
+    réplica écarté pendant REPLICA_RETRY_INTERVAL).
+
+Pour un essai local, deux bases SQLite suffisent : la copie du fichier
+primaire sur le fichier réplica « réplique » toutes les écritures jusqu'au
+dernier battement ; ``flask camps replica-status`` affiche la position.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import sqlalchemy as sa
+from flask import g, has_app_context, has_request_context, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from CTFd.cache import cache
+from CTFd.models import db
+
+from .constants import (
+    LOG_PREFIX,
+    REPLICA_CHECK_INTERVAL,
+    REPLICA_HEARTBEAT_INTERVAL,
+    REPLICA_HEARTBEAT_LOCK_KEY,
+    REPLICA_MAX_LAG,
+    REPLICA_MAX_LAG_CONFIG_KEY,
+    REPLICA_RETRY_INTERVAL,
+    REPLICA_SESSION_KEY,
+    REPLICA_URI_CONFIG_KEY,
+    REPLICA_WRITTEN_KEY_PREFIX,
+)
+from .models import CampReplicaHeartbeat
+from .upsert import upsert
+
+logger = logging.getLogger("CTFdCamps")
+
+_heartbeat = CampReplicaHeartbeat.__table__
+
+_HEARTBEAT_ID = 1
+
+# Option d'exécution du battement : ce n'est pas une écriture de la requête
+_HEARTBEAT_OPTION = "camps_replica_heartbeat"
+
+
+class _ReplicaState:
+    """État du réplica dans ce processus (moteur, position, erreurs)."""
+
+    def __init__(self):
+        self.uri: str | None = None
+        self.max_lag = REPLICA_MAX_LAG
+        self.engine = None
+        self.pid: int | None = None
+        self.position: float | None = None   # date (primaire) du dernier battement rejoué
+        self.checked_at = 0.0
+        self.retry_at = 0.0
+        self.last_error: str | None = None
+        self.reads = {"replica": 0, "primary": 0, "fallback": 0}
+
+
+_state = _ReplicaState()
+_probe_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Activation
+# ---------------------------------------------------------------------------
+
+def register_replica(app) -> None:
+    """
+    Active le réplica si ``CAMPS_READ_REPLICA_URI`` est défini : repère les
+    écritures des requêtes sur la primaire pour les lectures qui suivent.
+    """
+    uri = app.config.get(REPLICA_URI_CONFIG_KEY, os.environ.get(REPLICA_URI_CONFIG_KEY, ""))
+    if not uri:
+        return
+
+    max_lag = app.config.get(REPLICA_MAX_LAG_CONFIG_KEY, os.environ.get(REPLICA_MAX_LAG_CONFIG_KEY))
+    try:
+        _state.max_lag = float(max_lag) if max_lag is not None else REPLICA_MAX_LAG
+    except (TypeError, ValueError):
+        logger.warning("%s %s invalide, %ss retenues", LOG_PREFIX, REPLICA_MAX_LAG_CONFIG_KEY, REPLICA_MAX_LAG)
+    _state.uri = str(uri)
+
+    with app.app_context():
+        event.listen(db.engine, "after_cursor_execute", _on_primary_execute)
+
+    @app.after_request
+    def remember_primary_write(response):
+        # Date prise après les écritures de la requête : les suivantes de la
+        # même session attendent que le réplica l'ait rejointe
+        if g.get("camps_replica_wrote"):
+            session[REPLICA_SESSION_KEY] = time.time()
+        return response
+
+    logger.info(
+        "%s Lectures sur réplica : %s (retard max %.0fs)", LOG_PREFIX, _display_uri(), _state.max_lag,
+    )
+
+
+def is_enabled() -> bool:
+    return _state.uri is not None
+
+
+def _display_uri() -> str:
+    try:
+        return sa.engine.make_url(_state.uri).render_as_string(hide_password=True)
+    except Exception:
+        return "?"
+
+
+def _get_engine():
+    """Moteur du réplica, créé par processus (les connexions ne survivent pas au fork)."""
+    if _state.engine is None or _state.pid != os.getpid():
+        _state.engine = sa.create_engine(_state.uri, pool_pre_ping=True)
+        _state.pid = os.getpid()
+    return _state.engine
+
+
+def _on_primary_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is None or not (context.isinsert or context.isupdate or context.isdelete):
+        return
+    if context.execution_options.get(_HEARTBEAT_OPTION) or not has_request_context():
+        return
+    g.camps_replica_wrote = True
+
+
+# ---------------------------------------------------------------------------
+# Écritures à rejoindre
+# ---------------------------------------------------------------------------
+
+def note_write(name: str) -> None:
+    """
+    Mémorise (dans le cache partagé) la date d'une écriture de la donnée
+    ``name`` : ses instantanés ne seront relus sur le réplica qu'une fois
+    cette écriture rejouée. À appeler après la validation de la transaction.
+    """
+    if is_enabled():
+        cache.set(REPLICA_WRITTEN_KEY_PREFIX + name, time.time(), timeout=0)
+
+
+def _required_position(datasets) -> float:
+    """Date de la dernière écriture que la lecture doit voir (0 si aucune)."""
+    required = 0.0
+    if datasets:
+        try:
+            values = cache.get_many(*[REPLICA_WRITTEN_KEY_PREFIX + name for name in datasets])
+            required = max(float(value or 0) for value in values)
+        except Exception:
+            # Sans date d'écriture connue, seule la primaire est sûre
+            return float("inf")
+    if has_request_context():
+        required = max(required, float(session.get(REPLICA_SESSION_KEY) or 0))
+    return required
+
+
+# ---------------------------------------------------------------------------
+# Position du réplica (battement)
+# ---------------------------------------------------------------------------
+
+def _beat() -> None:
+    """Réécrit le battement sur la primaire (un seul worker par intervalle)."""
+    if not cache.add(REPLICA_HEARTBEAT_LOCK_KEY, 1, timeout=REPLICA_HEARTBEAT_INTERVAL):
+        return
+    with db.engine.begin() as connection:
+        connection = connection.execution_options(**{_HEARTBEAT_OPTION: True})
+        upsert(connection, _heartbeat, "id", _HEARTBEAT_ID, {"beat_at": time.time()})
+
+
+def probe() -> None:
+    """Écrit un battement et relit la position du réplica."""
+    try:
+        _beat()
+    except Exception:
+        logger.exception("%s Erreur écriture du battement du réplica", LOG_PREFIX)
+
+    try:
+        with _get_engine().connect() as connection:
+            position = connection.execute(
+                sa.select(_heartbeat.c.beat_at).where(_heartbeat.c.id == _HEARTBEAT_ID)
+            ).scalar()
+    except Exception as exc:
+        _mark_down(exc)
+        return
+
+    _state.position = float(position) if position is not None else None
+    _state.checked_at = time.monotonic()
+    _state.last_error = None
+
+
+def _mark_down(exc: Exception) -> None:
+    if _state.last_error is None:
+        logger.warning("%s Réplica indisponible, lectures sur la primaire : %s", LOG_PREFIX, exc)
+    _state.position = None
+    _state.last_error = str(exc)
+    _state.checked_at = time.monotonic()
+    _state.retry_at = _state.checked_at + REPLICA_RETRY_INTERVAL
+
+
+def _current_position() -> float | None:
+    """Position du réplica, remesurée au plus toutes les REPLICA_CHECK_INTERVAL secondes."""
+    now = time.monotonic()
+    due = now >= _state.retry_at if _state.last_error else now - _state.checked_at >= REPLICA_CHECK_INTERVAL
+    # Un seul thread mesure ; les autres gardent la position connue
+    if due and _probe_lock.acquire(blocking=False):
+        try:
+            probe()
+        finally:
+            _probe_lock.release()
+    return _state.position
+
+
+# ---------------------------------------------------------------------------
+# Lectures
+# ---------------------------------------------------------------------------
+
+def _use_replica(datasets) -> bool:
+    if not is_enabled() or not has_app_context():
+        return False
+    if has_request_context() and g.get("camps_replica_wrote"):
+        return False
+    position = _current_position()
+    if position is None or time.time() - position > _state.max_lag:
+        return False
+    return position >= _required_position(datasets)
+
+
+def run_read(fn, *datasets: str):
+    """
+    Exécute ``fn(session)`` sur le réplica si possible, sinon sur la primaire.
+
+    ``fn`` ne fait que lire et doit matérialiser ses résultats (listes,
+    dictionnaires) : la session du réplica est fermée au retour.
+
+    Args:
+        datasets: données (noms passés à ``note_write``) dont la dernière
+            écriture doit être visible.
+    """
+    if not _use_replica(datasets):
+        _state.reads["primary"] += 1
+        return fn(db.session)
+
+    replica_session = Session(bind=_get_engine())
+    try:
+        result = fn(replica_session)
+        _state.reads["replica"] += 1
+        return result
+    except sa.exc.SQLAlchemyError as exc:
+        _mark_down(exc)
+        _state.reads["fallback"] += 1
+        return fn(db.session)
+    finally:
+        replica_session.close()
+
+
+def get_status(refresh: bool = False) -> dict:
+    """État du réplica dans ce processus (``flask camps replica-status``)."""
+    if not is_enabled():
+        return {"enabled": False}
+    if refresh:
+        probe()
+    lag = time.time() - _state.position if _state.position is not None else None
+    return {
+        "enabled": True,
+        "uri": _display_uri(),
+        "max_lag": _state.max_lag,
+        "lag": lag,
+        "usable": lag is not None and lag <= _state.max_lag,
+        "last_error": _state.last_error,
+        "reads": dict(_state.reads),
+    }
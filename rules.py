@@ -0,0 +1,189 @@
+"""
+Règles d'assignation des challenges aux camps.
+
+Une règle associe des camps aux challenges d'une catégorie, portant un tag
+ou dont le nom suit un motif (``Web*``, ``*forensic?``), sans distinction
+de casse. La première règle satisfaite, par position, s'applique ; un
+choix explicite de l'admin (ligne ``challenge_camps`` sans ``rule_id``)
+l'emporte toujours.
+
+Les règles ne sont jamais évaluées pendant les requêtes des joueurs : elles
+sont compilées dans ``challenge_camps`` (lignes portant ``rule_id``) à
+chaque modification d'une règle, d'un challenge ou de ses tags. Les
+instantanés des masques, les hashes du cache et la requête de la liste
+par camp lisent donc un seul index, quelle que soit l'origine du masque.
+"""
+
+import fnmatch
+import logging
+import re
+from collections import defaultdict
+
+import sqlalchemy as sa
+
+from CTFd.models import Challenges, Tags, db
+
+from . import events
+from .constants import CAMP_NONE, LOG_PREFIX
+from .membership import get_store
+from .models import CampRule, ChallengeCamp
+from .registry import get_registry
+
+logger = logging.getLogger("CTFdCamps")
+
+_challenge_camps = ChallengeCamp.__table__
+
+
+class RuleSet:
+    """Règles compilées : dictionnaires par catégorie et par tag, motifs de nom."""
+
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda r: (r.position, r.id))
+        self.by_category: dict[str, CampRule] = {}
+        self.by_tag: dict[str, CampRule] = {}
+        self.by_name: list[tuple[re.Pattern, CampRule]] = []
+        for rule in self.rules:
+            key = rule.pattern.strip().lower()
+            if rule.kind == "category":
+                self.by_category.setdefault(key, rule)
+            elif rule.kind == "tag":
+                self.by_tag.setdefault(key, rule)
+            elif rule.kind == "name":
+                self.by_name.append((re.compile(fnmatch.translate(key)), rule))
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def match(self, name: str | None, category: str | None, tags) -> CampRule | None:
+        """Première règle (par position) satisfaite par un challenge, None si aucune."""
+        candidates = []
+        rule = self.by_category.get((category or "").strip().lower())
+        if rule is not None:
+            candidates.append(rule)
+        for tag in tags:
+            rule = self.by_tag.get((tag or "").strip().lower())
+            if rule is not None:
+                candidates.append(rule)
+        lowered = (name or "").lower()
+        for pattern, rule in self.by_name:
+            if pattern.match(lowered):
+                candidates.append(rule)
+                # Motifs triés par position : les suivants ne peuvent pas l'emporter
+                break
+        return min(candidates, key=lambda r: (r.position, r.id)) if candidates else None
+
+
+def get_rules() -> RuleSet:
+    return RuleSet(CampRule.query.all())
+
+
+# ---------------------------------------------------------------------------
+# Compilation dans challenge_camps
+# ---------------------------------------------------------------------------
+
+def compile_rules(challenge_ids=None, reset_overrides: bool = False) -> int:
+    """
+    Recalcule les lignes de ``challenge_camps`` issues des règles, pour
+    tous les challenges ou ceux de ``challenge_ids``, puis valide la
+    transaction et prévient les camps dont la liste change.
+
+    Args:
+        reset_overrides: oublie aussi les choix explicites de ces challenges.
+
+    Returns:
+        Le nombre de challenges dont le masque a changé.
+    """
+    if challenge_ids is not None:
+        challenge_ids = list(challenge_ids)
+        if not challenge_ids:
+            return 0
+
+    def scoped(statement, column):
+        return statement if challenge_ids is None else statement.where(column.in_(challenge_ids))
+
+    ruleset = get_rules()
+    registry = get_registry()
+    connection = db.session.connection()
+
+    # Masques actuels remplaçables (issus des règles) ; les autres sont des choix explicites
+    previous, overrides = {}, set()
+    for challenge_id, mask, rule_id in connection.execute(scoped(
+        sa.select(_challenge_camps.c.challenge_id, _challenge_camps.c.camp_mask, _challenge_camps.c.rule_id),
+        _challenge_camps.c.challenge_id,
+    )):
+        if rule_id is None and not reset_overrides:
+            overrides.add(challenge_id)
+        else:
+            previous[challenge_id] = mask
+
+    compiled = {}
+    if ruleset:
+        tags = defaultdict(list)
+        for challenge_id, value in connection.execute(scoped(
+            sa.select(Tags.challenge_id, Tags.value), Tags.challenge_id,
+        )):
+            tags[challenge_id].append(value)
+        for challenge_id, name, category in connection.execute(scoped(
+            sa.select(Challenges.id, Challenges.name, Challenges.category), Challenges.id,
+        )):
+            if challenge_id in overrides:
+                continue
+            rule = ruleset.match(name, category, tags.get(challenge_id, ()))
+            # Une règle « neutre » (masque 0) arrête l'évaluation sans créer de ligne
+            if rule is not None and rule.camp_mask:
+                compiled[challenge_id] = rule
+
+    delete = _challenge_camps.delete()
+    if not reset_overrides:
+        delete = delete.where(_challenge_camps.c.rule_id.isnot(None))
+    connection.execute(scoped(delete, _challenge_camps.c.challenge_id))
+    rows = []
+    for challenge_id, rule in compiled.items():
+        match_ids = registry.match_ids_for(rule.camp_mask)
+        rows.append({
+            "challenge_id": challenge_id,
+            "camp": registry.describe(rule.camp_mask) or CAMP_NONE,
+            "camp_mask": rule.camp_mask,
+            "match_id": match_ids.pop() if len(match_ids) == 1 else None,
+            "rule_id": rule.id,
+        })
+    if rows:
+        connection.execute(_challenge_camps.insert(), rows)
+    db.session.commit()
+
+    # Masques avant / après des challenges dont la visibilité change
+    masks, count = set(), 0
+    for challenge_id in previous.keys() | compiled.keys():
+        before = previous.get(challenge_id, 0)
+        after = compiled[challenge_id].camp_mask if challenge_id in compiled else 0
+        if before != after:
+            masks.update((before, after))
+            count += 1
+
+    if previous or rows:
+        get_store().reload_challenges()
+    if count:
+        events.notify_challenges_changed(None, masks)
+        logger.info("%s Règles de camp : %d challenge(s) réassigné(s)", LOG_PREFIX, count)
+    return count
+
+
+def follow_rules(challenge_id: int) -> None:
+    """Retire le choix explicite d'un challenge : ses camps sont de nouveau donnés par les règles."""
+    compile_rules([challenge_id], reset_overrides=True)
+
+
+def follows_rules(challenge_id: int) -> bool:
+    """Vrai si les camps du challenge sont donnés par les règles (aucun choix explicite)."""
+    return not db.session.query(
+        sa.exists().where(_challenge_camps.c.challenge_id == challenge_id, _challenge_camps.c.rule_id.is_(None))
+    ).scalar()
+
+
+def rule_counts() -> dict[int, int]:
+    """Nombre de challenges assignés par chaque règle."""
+    return dict(
+        db.session.query(ChallengeCamp.rule_id, sa.func.count(ChallengeCamp.id))
+        .filter(ChallengeCamp.rule_id.isnot(None))
+        .group_by(ChallengeCamp.rule_id)
+    )
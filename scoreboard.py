@@ -0,0 +1,478 @@
+"""
+Scoreboard agrégé par camp du plugin CTFd Camps.
+
+Recalculer les totaux à partir des solves joints à ``team_camps`` à chaque
+affichage coûterait une agrégation complète par requête. La table
+``camp_team_scores`` conserve à la place un score par équipe, mis à jour
+dans la même transaction que l'écriture CTFd qui le modifie :
+
+  - solve / award créé : score += valeur
+  - solve / award supprimé : score de l'équipe recalculé
+  - valeur d'un challenge modifiée (challenges dynamiques) : delta appliqué
+    aux équipes qui l'ont résolu
+  - changement de camp : colonne ``camp`` mise à jour (évènements ORM, ou
+    ``record_team_side`` pour les upserts du stockage des appartenances)
+
+Les suppressions en masse (``query.delete()``, utilisées par CTFd pour
+supprimer un challenge, un utilisateur ou une équipe) ne déclenchent pas
+d'évènement par ligne : elles provoquent une reconstruction complète après
+le commit. Si elle échoue, la version n'est pas incrémentée (les totaux
+faux ne sont pas publiés comme frais) et le scoreboard est marqué à
+reconstruire dans le cache : la lecture suivante (ou ``flask camps
+rebuild-scoreboard``) le reconstruit.
+
+Le classement servi aux joueurs est mis en cache sous la version
+``scoreboard``, incrémentée après chaque commit qui modifie les scores.
+"""
+
+import logging
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from CTFd.cache import cache
+from CTFd.models import Awards, Challenges, Solves, Submissions, Teams, db
+from CTFd.utils.config import get_config
+from CTFd.utils.dates import ctf_frozen, unix_time_to_utc
+from CTFd.utils.user import is_admin
+
+from .caching import bump_version, get_versions
+from .constants import (
+    LOG_PREFIX,
+    SCOREBOARD_CACHE_PREFIX,
+    SCOREBOARD_CACHE_TIMEOUT,
+    SCOREBOARD_REBUILD_LOCK_TIMEOUT,
+    SCOREBOARD_STALE_KEY,
+    VERSION_REGISTRY,
+    VERSION_SCOREBOARD,
+)
+from .models import CampTeamScore, TeamCamp
+from .registry import ALL_MATCHES, get_registry
+
+logger = logging.getLogger("CTFdCamps")
+
+_scores = CampTeamScore.__table__
+_team_camps = TeamCamp.__table__
+_solves = Solves.__table__
+_submissions = Submissions.__table__
+_challenges = Challenges.__table__
+_awards = Awards.__table__
+_teams = Teams.__table__
+
+# Drapeaux posés dans session.info pendant la transaction
+_DIRTY = "camps_scoreboard_dirty"
+_REBUILD = "camps_scoreboard_rebuild"
+
+# Entités dont une suppression en masse invalide les scores
+_REBUILD_ENTITIES = (Submissions, Awards, Challenges, Teams)
+
+
+# ---------------------------------------------------------------------------
+# Calcul complet
+# ---------------------------------------------------------------------------
+
+def compute_scores(connection, freeze=None, team_id: int | None = None) -> dict[int, list]:
+    """
+    Calcule les scores à partir de zéro, avec les mêmes règles que CTFd
+    (valeurs nulles ignorées, départage par la dernière prise de points).
+
+    Args:
+        freeze: ne compter que les points antérieurs à cette date.
+        team_id: limiter le calcul à une équipe.
+
+    Returns:
+        {team_id: [score, date de dernière prise de points]} pour chaque équipe.
+    """
+    teams = sa.select(_teams.c.id)
+    solves = (
+        sa.select(_solves.c.team_id, sa.func.sum(_challenges.c.value), sa.func.max(_submissions.c.date))
+        .select_from(
+            _solves.join(_submissions, _submissions.c.id == _solves.c.id)
+            .join(_challenges, _challenges.c.id == _solves.c.challenge_id)
+        )
+        .where(_solves.c.team_id.isnot(None), _challenges.c.value != 0)
+        .group_by(_solves.c.team_id)
+    )
+    awards = (
+        sa.select(_awards.c.team_id, sa.func.sum(_awards.c.value), sa.func.max(_awards.c.date))
+        .where(_awards.c.team_id.isnot(None), _awards.c.value != 0)
+        .group_by(_awards.c.team_id)
+    )
+    if freeze is not None:
+        solves = solves.where(_submissions.c.date < freeze)
+        awards = awards.where(_awards.c.date < freeze)
+    if team_id is not None:
+        teams = teams.where(_teams.c.id == team_id)
+        solves = solves.where(_solves.c.team_id == team_id)
+        awards = awards.where(_awards.c.team_id == team_id)
+
+    scores = {tid: [0, None] for tid in connection.execute(teams).scalars()}
+    for query in (solves, awards):
+        for tid, total, last in connection.execute(query):
+            entry = scores.get(tid)
+            if entry is None:  # équipe supprimée, points orphelins
+                continue
+            entry[0] += int(total or 0)
+            if last is not None and (entry[1] is None or last > entry[1]):
+                entry[1] = last
+    return scores
+
+
+def _team_camps_map(connection) -> dict[int, str]:
+    return dict(connection.execute(sa.select(_team_camps.c.team_id, _team_camps.c.camp)).all())
+
+
+def rebuild_scores(connection) -> int:
+    """Reconstruit entièrement ``camp_team_scores``. Retourne le nombre d'équipes."""
+    scores = compute_scores(connection)
+    camps = _team_camps_map(connection)
+
+    connection.execute(_scores.delete())
+    if scores:
+        connection.execute(_scores.insert(), [
+            {"team_id": tid, "camp": camps.get(tid), "score": score, "last_update": last}
+            for tid, (score, last) in scores.items()
+        ])
+    return len(scores)
+
+
+def rebuild_scoreboard() -> int | None:
+    """
+    Reconstruit ``camp_team_scores`` dans sa propre transaction et publie
+    la nouvelle version.
+
+    Returns:
+        Le nombre d'équipes, ou None en cas d'échec : le scoreboard reste
+        alors marqué à reconstruire (SCOREBOARD_STALE_KEY).
+    """
+    # Marque levée avant la lecture : un échec concurrent la repose
+    cache.delete(SCOREBOARD_STALE_KEY)
+    try:
+        with db.engine.begin() as connection:
+            count = rebuild_scores(connection)
+    except Exception:
+        logger.exception("%s Erreur reconstruction du scoreboard des camps", LOG_PREFIX)
+        cache.set(SCOREBOARD_STALE_KEY, True, timeout=0)
+        return None
+    bump_version(VERSION_SCOREBOARD)
+    return count
+
+
+def _repair_if_stale() -> None:
+    """Reconstruit le scoreboard marqué à reconstruire (un seul worker à la fois)."""
+    if not cache.get(SCOREBOARD_STALE_KEY):
+        return
+    lock = SCOREBOARD_STALE_KEY + ":lock"
+    if not cache.add(lock, 1, timeout=SCOREBOARD_REBUILD_LOCK_TIMEOUT):
+        return
+    try:
+        count = rebuild_scoreboard()
+        if count is not None:
+            logger.info("%s Scoreboard des camps réparé (%d équipes)", LOG_PREFIX, count)
+    finally:
+        cache.delete(lock)
+
+
+def check_scores(connection) -> list[dict]:
+    """
+    Compare la table à un recalcul complet.
+
+    Seuls le score et le camp sont comparés (la date ne sert qu'au
+    départage). Returns la liste des écarts, vide si tout est cohérent.
+    """
+    expected = compute_scores(connection)
+    camps = _team_camps_map(connection)
+    actual = {
+        row.team_id: {"score": row.score, "camp": row.camp}
+        for row in connection.execute(sa.select(_scores.c.team_id, _scores.c.score, _scores.c.camp))
+    }
+
+    mismatches = []
+    for tid in sorted(set(expected) | set(actual)):
+        wanted = {"score": expected[tid][0], "camp": camps.get(tid)} if tid in expected else None
+        found = actual.get(tid)
+        if wanted != found:
+            mismatches.append({"team_id": tid, "expected": wanted, "actual": found})
+    return mismatches
+
+
+def init_scoreboard(app) -> None:
+    """Remplit ``camp_team_scores`` à la première installation."""
+    with app.app_context():
+        try:
+            with db.engine.begin() as connection:
+                if connection.execute(sa.select(_scores.c.team_id).limit(1)).first() is not None:
+                    return
+                count = rebuild_scores(connection)
+        except sa.exc.IntegrityError:
+            # Un autre worker a initialisé la table en même temps
+            logger.info("%s Scoreboard des camps déjà initialisé", LOG_PREFIX)
+            return
+        if count:
+            bump_version(VERSION_SCOREBOARD)
+            logger.info("%s Scoreboard des camps initialisé (%d équipes)", LOG_PREFIX, count)
+
+
+# ---------------------------------------------------------------------------
+# Mise à jour incrémentale (évènements SQLAlchemy)
+# ---------------------------------------------------------------------------
+
+def _mark(target, flag: str) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info[flag] = True
+
+
+def _recompute_team(connection, team_id: int) -> None:
+    """Recalcule la ligne d'une équipe (suppressions, ligne manquante)."""
+    computed = compute_scores(connection, team_id=team_id)
+    if team_id not in computed:
+        connection.execute(_scores.delete().where(_scores.c.team_id == team_id))
+        return
+
+    score, last = computed[team_id]
+    camp = connection.execute(
+        sa.select(_team_camps.c.camp).where(_team_camps.c.team_id == team_id)
+    ).scalar()
+    values = {"camp": camp, "score": score, "last_update": last}
+    result = connection.execute(_scores.update().where(_scores.c.team_id == team_id).values(**values))
+    if not result.rowcount:
+        connection.execute(_scores.insert().values(team_id=team_id, **values))
+
+
+def _add_points(connection, team_id: int, points: int, when) -> None:
+    values = {"score": _scores.c.score + points}
+    if when is not None:
+        values["last_update"] = when
+    result = connection.execute(_scores.update().where(_scores.c.team_id == team_id).values(**values))
+    if not result.rowcount:
+        # Ligne absente (équipe antérieure au plugin) : recalcul complet de l'équipe
+        _recompute_team(connection, team_id)
+
+
+def _on_solve_insert(mapper, connection, target) -> None:
+    if target.team_id is None:
+        return
+    value = connection.execute(
+        sa.select(_challenges.c.value).where(_challenges.c.id == target.challenge_id)
+    ).scalar()
+    if value:
+        _add_points(connection, target.team_id, value, target.date)
+        _mark(target, _DIRTY)
+
+
+def _on_award_insert(mapper, connection, target) -> None:
+    if target.team_id is None or not target.value:
+        return
+    _add_points(connection, target.team_id, target.value, target.date)
+    _mark(target, _DIRTY)
+
+
+def _on_points_delete(mapper, connection, target) -> None:
+    if target.team_id is None:
+        return
+    _recompute_team(connection, target.team_id)
+    _mark(target, _DIRTY)
+
+
+def _on_challenge_update(mapper, connection, target) -> None:
+    history = sa.inspect(target).attrs.value.history
+    if not history.added or not history.deleted:
+        return
+    delta = (history.added[0] or 0) - (history.deleted[0] or 0)
+    if not delta:
+        return
+
+    solvers = sa.select(_solves.c.team_id).where(
+        _solves.c.challenge_id == target.id,
+        _solves.c.team_id.isnot(None),
+    )
+    connection.execute(
+        _scores.update()
+        .where(_scores.c.team_id.in_(solvers))
+        .values(score=_scores.c.score + delta)
+    )
+    _mark(target, _DIRTY)
+
+
+def _on_team_insert(mapper, connection, target) -> None:
+    connection.execute(_scores.insert().values(team_id=target.id, score=0))
+    _mark(target, _DIRTY)
+
+
+def _on_team_update(mapper, connection, target) -> None:
+    attrs = sa.inspect(target).attrs
+    if any(attrs[name].history.has_changes() for name in ("name", "hidden", "banned")):
+        _mark(target, _DIRTY)
+
+
+def _on_team_delete(mapper, connection, target) -> None:
+    connection.execute(_scores.delete().where(_scores.c.team_id == target.id))
+    _mark(target, _DIRTY)
+
+
+def _set_score_camp(connection, team_id: int, side: str | None) -> None:
+    connection.execute(_scores.update().where(_scores.c.team_id == team_id).values(camp=side))
+
+
+def record_team_side(connection, team_id: int, side: str | None) -> None:
+    """Met à jour le scoreboard après une écriture SQL directe du côté d'une équipe."""
+    _set_score_camp(connection, team_id, side)
+    db.session.info[_DIRTY] = True
+
+
+def _on_team_camp_set(mapper, connection, target) -> None:
+    _set_score_camp(connection, target.team_id, target.camp)
+    _mark(target, _DIRTY)
+
+
+def _on_team_camp_delete(mapper, connection, target) -> None:
+    _set_score_camp(connection, target.team_id, None)
+    _mark(target, _DIRTY)
+
+
+def _on_bulk_delete(delete_context) -> None:
+    descriptions = delete_context.query.column_descriptions
+    entity = descriptions[0].get("entity") if descriptions else None
+    if isinstance(entity, type) and issubclass(entity, _REBUILD_ENTITIES):
+        delete_context.session.info[_REBUILD] = True
+
+
+def _on_commit(session) -> None:
+    rebuild = session.info.pop(_REBUILD, False)
+    dirty = session.info.pop(_DIRTY, False)
+    if rebuild:
+        # Version incrémentée seulement si la reconstruction aboutit
+        rebuild_scoreboard()
+    elif dirty:
+        bump_version(VERSION_SCOREBOARD)
+
+
+def _on_rollback(session) -> None:
+    session.info.pop(_REBUILD, None)
+    session.info.pop(_DIRTY, None)
+
+
+_MAPPER_LISTENERS = [
+    (Solves, "after_insert", _on_solve_insert),
+    (Solves, "after_delete", _on_points_delete),
+    (Awards, "after_insert", _on_award_insert),
+    (Awards, "after_delete", _on_points_delete),
+    (Challenges, "after_update", _on_challenge_update),
+    (Teams, "after_insert", _on_team_insert),
+    (Teams, "after_update", _on_team_update),
+    (Teams, "after_delete", _on_team_delete),
+    (TeamCamp, "after_insert", _on_team_camp_set),
+    (TeamCamp, "after_update", _on_team_camp_set),
+    (TeamCamp, "after_delete", _on_team_camp_delete),
+]
+
+
+def register_scoreboard_listeners() -> None:
+    """Branche la maintenance incrémentale (une seule fois par processus)."""
+    if event.contains(Solves, "after_insert", _on_solve_insert):
+        return
+    for model, name, listener in _MAPPER_LISTENERS:
+        # propagate : sous-classes (DynamicChallenge, types d'awards…)
+        event.listen(model, name, listener, propagate=True)
+    event.listen(db.session, "after_bulk_delete", _on_bulk_delete)
+    event.listen(db.session, "after_commit", _on_commit)
+    event.listen(db.session, "after_rollback", _on_rollback)
+
+
+# ---------------------------------------------------------------------------
+# Lecture
+# ---------------------------------------------------------------------------
+
+def get_scoreboard(scope=ALL_MATCHES) -> dict:
+    """
+    Totaux et classements par camp, servis depuis le cache.
+
+    Pendant le freeze, les joueurs reçoivent les scores à la date du
+    freeze (recalculés une fois, mis en cache par date de freeze) ; les
+    administrateurs voient toujours les scores en direct.
+    Un scoreboard marqué à reconstruire (reconstruction après commit en
+    échec) est reconstruit avant lecture.
+
+    Args:
+        scope: match (id), espace commun (None) ou ALL_MATCHES ; seules
+            les lignes des camps de la portée sont lues (index camp, score).
+    """
+    _repair_if_stale()
+    frozen = bool(ctf_frozen()) and not is_admin()
+    versions = get_versions(VERSION_SCOREBOARD, VERSION_REGISTRY)
+    if frozen:
+        state = f"frozen:{get_config('freeze')}"
+    else:
+        state = f"live:{versions[VERSION_SCOREBOARD]}"
+    # Les scores sont enregistrés par côté : les manches actives font partie de la clé
+    registry = get_registry()
+    key = (
+        f"{SCOREBOARD_CACHE_PREFIX}{state}:{versions[VERSION_REGISTRY]}:{registry.active_rounds_key()}"
+        f":{scope if scope is not None else 'common'}"
+    )
+
+    payload = cache.get(key)
+    if payload is None:
+        payload = _build_scoreboard(frozen, registry.camps_of(scope), scope != ALL_MATCHES)
+        cache.set(key, payload, timeout=SCOREBOARD_CACHE_TIMEOUT)
+    return payload
+
+
+def _build_scoreboard(frozen: bool, infos, scoped: bool) -> dict:
+    connection = db.session.connection()
+    # Les manches d'un match ne permutent que ses camps : côtés et camps coïncident
+    sides = [info.slug for info in infos] if scoped else None
+    rows = _frozen_rows(connection, sides) if frozen else _live_rows(connection, sides)
+
+    registry = get_registry()
+    camps = {
+        info.slug: {**info.to_dict(), "score": 0, "teams": 0, "standings": []}
+        for info in infos
+    }
+    for team_id, side, name, score in rows:
+        entry = camps.get(registry.camp_of_side(side))
+        if entry is None:
+            continue
+        entry["score"] += score
+        entry["teams"] += 1
+        entry["standings"].append({
+            "pos": len(entry["standings"]) + 1,
+            "team_id": team_id,
+            "name": name,
+            "score": score,
+        })
+    return {"frozen": frozen, "camps": list(camps.values())}
+
+
+def _visible_teams(query):
+    return query.where(_teams.c.hidden == sa.false(), _teams.c.banned == sa.false())
+
+
+def _live_rows(connection, sides: list[str] | None = None) -> list:
+    query = _visible_teams(
+        sa.select(_scores.c.team_id, _scores.c.camp, _teams.c.name, _scores.c.score)
+        .select_from(_scores.join(_teams, _teams.c.id == _scores.c.team_id))
+        .where(_scores.c.camp.isnot(None) if sides is None else _scores.c.camp.in_(sides))
+    ).order_by(_scores.c.camp, _scores.c.score.desc(), _scores.c.last_update, _scores.c.team_id)
+    return connection.execute(query).all()
+
+
+def _frozen_rows(connection, sides: list[str] | None = None) -> list:
+    freeze = unix_time_to_utc(int(get_config("freeze")))
+    scores = compute_scores(connection, freeze=freeze)
+    query = _visible_teams(
+        sa.select(_teams.c.id, _team_camps.c.camp, _teams.c.name)
+        .select_from(_teams.join(_team_camps, _team_camps.c.team_id == _teams.c.id))
+    )
+    if sides is not None:
+        query = query.where(_team_camps.c.camp.in_(sides))
+    teams = connection.execute(query).all()
+
+    rows = []
+    for team_id, camp, name in teams:
+        score, last = scores.get(team_id, (0, None))
+        rows.append((team_id, camp, name, score, last))
+    rows.sort(key=lambda r: (r[1], -r[3], r[4] is None, r[4] or freeze, r[0]))
+    return [row[:4] for row in rows]
@@ -0,0 +1,327 @@
+"""
+Jeu de données synthétique pour les tests de charge.
+
+``flask camps seed`` remplit les tables CTFd utilisées par le plugin
+(équipes, capitaines, jetons d'API, challenges) et celles du plugin
+(camps des équipes et des challenges, historique, logs d'accès) avec des
+volumes d'évènement réel : 5 000 équipes, 2 000 challenges et 5 millions
+de logs en quelques minutes.
+
+Toutes les écritures sont des INSERT SQLAlchemy Core en lots
+(executemany) : aucun objet ORM, aucun évènement de mapper. L'historique,
+le scoreboard, les agrégats et les versions partagées sont donc mis à
+jour explicitement à la fin.
+
+Les jetons d'API créés (un par capitaine, un pour l'administrateur) sont
+renvoyés avec les camps des équipes et des challenges : ``loadtest.py``
+les utilise pour jouer le scénario de charge.
+"""
+
+import logging
+import random
+import secrets
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+
+from CTFd.models import Challenges, Teams, Tokens, Users, db
+from CTFd.utils.crypto import hash_password
+
+from .caching import bump_version
+from .constants import (
+    LOG_PREFIX,
+    SEED_BATCH_SIZE,
+    SEED_LOG_HOURS,
+    SEED_TOKEN_DAYS,
+    VERSION_CHALLENGES_PREFIX,
+    VERSION_COUNTS,
+    VERSION_SCOREBOARD,
+)
+from .helpers import pack_ip
+from .log_stats import refresh_rollups
+from .membership import get_store
+from .models import CampAccessLog, ChallengeCamp, TeamCamp, TeamCampHistory
+from .registry import get_registry
+from .scoreboard import rebuild_scores
+
+logger = logging.getLogger("CTFdCamps")
+
+_CATEGORIES = ("web", "pwn", "crypto", "forensics", "reverse", "misc", "osint", "network")
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _insert(table, rows) -> None:
+    """INSERT en lots de SEED_BATCH_SIZE lignes, une transaction par lot."""
+    for start in range(0, len(rows), SEED_BATCH_SIZE):
+        with db.engine.begin() as connection:
+            connection.execute(table.insert(), rows[start:start + SEED_BATCH_SIZE])
+
+
+def _ids_by_name(table, prefix: str) -> dict[str, int]:
+    with db.engine.connect() as connection:
+        return dict(connection.execute(
+            sa.select(table.c.name, table.c.id).where(table.c.name.like(f"{prefix}-%"))
+        ).all())
+
+
+def _token() -> str:
+    return f"ctfd_{secrets.token_hex(32)}"
+
+
+# ---------------------------------------------------------------------------
+# Génération
+# ---------------------------------------------------------------------------
+
+def seed(
+    teams: int = 5000,
+    challenges: int = 2000,
+    logs: int = 5_000_000,
+    unassigned: float = 0.1,
+    prefix: str = "seed",
+    password: str = "seed-password",
+    random_seed: int | None = None,
+    rollups: bool = True,
+) -> dict:
+    """
+    Génère le jeu de données.
+
+    Args:
+        unassigned: part des équipes laissées sans camp (ruée sur la sélection).
+        prefix: préfixe des noms d'équipes, d'utilisateurs et de challenges.
+        random_seed: graine du générateur, pour des jeux reproductibles.
+        rollups: intégrer les logs générés aux statistiques agrégées.
+
+    Returns:
+        Description du jeu (jetons, camps des équipes et des challenges),
+        au format lu par ``loadtest.py``.
+
+    Raises:
+        ValueError: si un jeu de même préfixe existe déjà, ou sans camp défini.
+    """
+    rng = random.Random(random_seed)
+    registry = get_registry()
+    camps = registry.slugs
+    if not camps:
+        raise ValueError("Aucun camp défini")
+    if _ids_by_name(Teams.__table__, f"{prefix}-team"):
+        raise ValueError(f"Des équipes « {prefix}-team-… » existent déjà")
+
+    now = _utcnow()
+    team_ids = _seed_teams(teams, prefix, password, now)
+    tokens = _seed_captains(team_ids, prefix, password, now)
+    admin_token = _seed_admin(prefix, password, now)
+    challenge_masks = _seed_challenges(challenges, prefix, rng, registry)
+    team_camps = _seed_team_camps(team_ids, camps, unassigned, rng, now)
+    log_count = _seed_logs(logs, team_camps, challenge_masks, rng, registry, now)
+
+    # Les insertions Core ne déclenchent ni évènements ni invalidations
+    with db.engine.begin() as connection:
+        rebuild_scores(connection)
+    get_store().reload()
+    for name in [VERSION_COUNTS, VERSION_SCOREBOARD] + [VERSION_CHALLENGES_PREFIX + camp for camp in camps]:
+        bump_version(name)
+    if rollups:
+        refresh_rollups()
+
+    logger.info(
+        "%s Jeu de test « %s » : %d équipe(s), %d challenge(s), %d log(s)",
+        LOG_PREFIX, prefix, len(team_ids), len(challenge_masks), log_count,
+    )
+    return {
+        "admin_token": admin_token,
+        "teams": [
+            {"id": team_id, "camp": team_camps.get(team_id), "token": tokens[team_id]}
+            for team_id in team_ids
+        ],
+        "challenges": [
+            {"id": challenge_id, "camps": registry.slugs_for(mask)}
+            for challenge_id, mask in challenge_masks.items()
+        ],
+        "camps": camps,
+    }
+
+
+def _seed_teams(count: int, prefix: str, password: str, now: datetime) -> list[int]:
+    hashed = hash_password(password)
+    _insert(Teams.__table__, [
+        {
+            "name": f"{prefix}-team-{i:05d}",
+            "email": f"{prefix}-team-{i:05d}@example.com",
+            "password": hashed,
+            "hidden": False,
+            "banned": False,
+            "created": now,
+        }
+        for i in range(count)
+    ])
+    return sorted(_ids_by_name(Teams.__table__, f"{prefix}-team").values())
+
+
+def _seed_captains(team_ids: list[int], prefix: str, password: str, now: datetime) -> dict[int, str]:
+    """Un capitaine par équipe, avec un jeton d'API. Returns {team_id: jeton}."""
+    hashed = hash_password(password)
+    _insert(Users.__table__, [
+        {
+            "name": f"{prefix}-user-{team_id}",
+            "email": f"{prefix}-user-{team_id}@example.com",
+            "password": hashed,
+            "type": "user",
+            "verified": True,
+            "hidden": False,
+            "banned": False,
+            "team_id": team_id,
+            "created": now,
+        }
+        for team_id in team_ids
+    ])
+    users = _ids_by_name(Users.__table__, f"{prefix}-user")
+    captains = {team_id: users[f"{prefix}-user-{team_id}"] for team_id in team_ids}
+
+    teams_table = Teams.__table__
+    with db.engine.begin() as connection:
+        connection.execute(
+            teams_table.update()
+            .where(teams_table.c.id == sa.bindparam("k_id"))
+            .values(captain_id=sa.bindparam("k_captain")),
+            [{"k_id": team_id, "k_captain": user_id} for team_id, user_id in captains.items()],
+        )
+
+    tokens = {team_id: _token() for team_id in team_ids}
+    expiration = now + timedelta(days=SEED_TOKEN_DAYS)
+    _insert(Tokens.__table__, [
+        {"type": "user", "user_id": captains[team_id], "value": value, "created": now, "expiration": expiration}
+        for team_id, value in tokens.items()
+    ])
+    return tokens
+
+
+def _seed_admin(prefix: str, password: str, now: datetime) -> str:
+    value = _token()
+    with db.engine.begin() as connection:
+        user_id = connection.execute(Users.__table__.insert().values(
+            name=f"{prefix}-admin",
+            email=f"{prefix}-admin@example.com",
+            password=hash_password(password),
+            type="admin",
+            verified=True,
+            hidden=True,
+            banned=False,
+            created=now,
+        )).inserted_primary_key[0]
+        connection.execute(Tokens.__table__.insert().values(
+            type="user", user_id=user_id, value=value, created=now,
+            expiration=now + timedelta(days=SEED_TOKEN_DAYS),
+        ))
+    return value
+
+
+def _seed_challenges(count: int, prefix: str, rng: random.Random, registry) -> dict[int, int]:
+    """
+    30 % de challenges neutres, 60 % réservés à un camp, 10 % à deux camps.
+
+    Returns:
+        {challenge_id: masque} pour tous les challenges créés.
+    """
+    _insert(Challenges.__table__, [
+        {
+            "name": f"{prefix}-chal-{i:05d}",
+            "description": "Challenge généré pour les tests de charge.",
+            "value": rng.choice((50, 100, 200, 300, 500)),
+            "category": rng.choice(_CATEGORIES),
+            "type": "standard",
+            "state": "visible",
+        }
+        for i in range(count)
+    ])
+    ids = sorted(_ids_by_name(Challenges.__table__, f"{prefix}-chal").values())
+
+    camp_masks = [camp.mask for camp in registry]
+    # Un challenge multi-camps reste dans un seul match
+    groups = [[camp.mask for camp in camps] for _, camps in registry.groups() if len(camps) >= 2]
+    masks = {}
+    for challenge_id in ids:
+        draw = rng.random()
+        if draw < 0.3:
+            masks[challenge_id] = 0
+        elif draw < 0.9 or not groups:
+            masks[challenge_id] = rng.choice(camp_masks)
+        else:
+            first, second = rng.sample(rng.choice(groups), 2)
+            masks[challenge_id] = first | second
+
+    _insert(ChallengeCamp.__table__, [
+        {
+            "challenge_id": challenge_id,
+            "camp": registry.describe(mask),
+            "camp_mask": mask,
+            "match_id": registry.match_id_of(registry.slugs_for(mask)[0]),
+        }
+        for challenge_id, mask in masks.items() if mask
+    ])
+    return masks
+
+
+def _seed_team_camps(
+    team_ids: list[int], camps: list[str], unassigned: float, rng: random.Random, now: datetime,
+) -> dict[int, str]:
+    """Répartit équitablement les équipes affectées. Returns {team_id: slug}."""
+    assigned = [team_id for team_id in team_ids if rng.random() >= unassigned]
+    team_camps = {team_id: camps[i % len(camps)] for i, team_id in enumerate(assigned)}
+
+    _insert(TeamCamp.__table__, [
+        {"team_id": team_id, "camp": camp} for team_id, camp in team_camps.items()
+    ])
+    _insert(TeamCampHistory.__table__, [
+        {"team_id": team_id, "camp": camp, "valid_from": now} for team_id, camp in team_camps.items()
+    ])
+    return team_camps
+
+
+def _seed_logs(
+    count: int,
+    team_camps: dict[int, str],
+    challenge_masks: dict[int, int],
+    rng: random.Random,
+    registry,
+    now: datetime,
+) -> int:
+    """Refus d'accès : chaque log vise un challenge réservé à un autre camp que l'équipe."""
+    foreign = {
+        camp: [cid for cid, mask in challenge_masks.items() if mask and not mask & registry.mask_of(camp)]
+        for camp in set(team_camps.values())
+    }
+    teams = [(team_id, camp) for team_id, camp in team_camps.items() if foreign.get(camp)]
+    if not teams or not count:
+        return 0
+
+    table = CampAccessLog.__table__
+    span = SEED_LOG_HOURS * 3600
+    written = 0
+    while written < count:
+        rows = []
+        for _ in range(min(SEED_BATCH_SIZE, count - written)):
+            team_id, camp = rng.choice(teams)
+            challenge_id = rng.choice(foreign[camp])
+            path = f"/api/v1/challenges/{challenge_id}"
+            ip = f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+            rows.append({
+                "team_id": team_id,
+                "challenge_id": challenge_id,
+                "team_camp": camp,
+                "challenge_camp": registry.describe(challenge_masks[challenge_id]),
+                "request_info": f"GET {path} (IP: {ip})",
+                "method": "GET",
+                "path": path,
+                "ip": ip,
+                "ip_packed": pack_ip(ip),
+                "timestamp": now - timedelta(seconds=rng.randrange(span)),
+            })
+        with db.engine.begin() as connection:
+            connection.execute(table.insert().values(created_at=sa.func.now()), rows)
+        written += len(rows)
+        if written % (SEED_BATCH_SIZE * 50) == 0:
+            logger.info("%s %d/%d log(s) générés", LOG_PREFIX, written, count)
+    return written
@@ -0,0 +1,243 @@
+"""
+Environnement de test du plugin CTFd Camps.
+
+Les tests tournent hors d'une instance CTFd : les modules CTFd importés par
+le plugin sont remplacés par des équivalents minimaux (modèles
+Flask-SQLAlchemy réduits aux colonnes lues par le plugin, cache
+Flask-Caching en mémoire, configuration lue dans ``configs``). Le plugin
+est importé comme paquet ``camps`` sans appeler ``load()`` : chaque test
+n'active que les hooks qu'il vérifie.
+"""
+
+import importlib
+import pkgutil
+import sys
+import types
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from flask import Flask
+from flask_caching import Cache
+from flask_sqlalchemy import SQLAlchemy
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+
+
+# ---------------------------------------------------------------------------
+# Modules CTFd minimaux
+# ---------------------------------------------------------------------------
+
+def _module(name: str, **attrs) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    module.__path__ = []
+    sys.modules[name] = module
+    return module
+
+
+def _install_ctfd() -> None:
+    db = SQLAlchemy()
+    cache = Cache()
+
+    class Challenges(db.Model):
+        __tablename__ = "challenges"
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(80))
+        description = db.Column(db.Text)
+        connection_info = db.Column(db.Text)
+        max_attempts = db.Column(db.Integer, default=0)
+        value = db.Column(db.Integer)
+        category = db.Column(db.String(80))
+        type = db.Column(db.String(80), default="standard")
+        state = db.Column(db.String(80), nullable=False, default="visible")
+        requirements = db.Column(db.JSON)
+
+    class Tags(db.Model):
+        __tablename__ = "tags"
+        id = db.Column(db.Integer, primary_key=True)
+        challenge_id = db.Column(db.Integer, db.ForeignKey("challenges.id", ondelete="CASCADE"))
+        value = db.Column(db.String(80))
+
+    class Hints(db.Model):
+        __tablename__ = "hints"
+        id = db.Column(db.Integer, primary_key=True)
+        challenge_id = db.Column(db.Integer, db.ForeignKey("challenges.id", ondelete="CASCADE"))
+        content = db.Column(db.Text)
+        cost = db.Column(db.Integer, default=0)
+
+    class ChallengeFiles(db.Model):
+        __tablename__ = "files"
+        id = db.Column(db.Integer, primary_key=True)
+        challenge_id = db.Column(db.Integer, db.ForeignKey("challenges.id", ondelete="CASCADE"))
+        location = db.Column(db.Text)
+
+    class Teams(db.Model):
+        __tablename__ = "teams"
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(128))
+        hidden = db.Column(db.Boolean, default=False)
+        banned = db.Column(db.Boolean, default=False)
+        created = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    class Users(db.Model):
+        __tablename__ = "users"
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(128))
+        team_id = db.Column(db.Integer, db.ForeignKey("teams.id"))
+
+    class Tokens(db.Model):
+        __tablename__ = "tokens"
+        id = db.Column(db.Integer, primary_key=True)
+        user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
+        value = db.Column(db.String(128))
+
+    class Submissions(db.Model):
+        __tablename__ = "submissions"
+        id = db.Column(db.Integer, primary_key=True)
+        challenge_id = db.Column(db.Integer, db.ForeignKey("challenges.id", ondelete="CASCADE"))
+        user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
+        team_id = db.Column(db.Integer, db.ForeignKey("teams.id", ondelete="CASCADE"))
+        date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    class Solves(db.Model):
+        __tablename__ = "solves"
+        id = db.Column(db.Integer, db.ForeignKey("submissions.id", ondelete="CASCADE"), primary_key=True)
+        challenge_id = db.Column(db.Integer, db.ForeignKey("challenges.id", ondelete="CASCADE"))
+        user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
+        team_id = db.Column(db.Integer, db.ForeignKey("teams.id", ondelete="CASCADE"))
+
+    class Awards(db.Model):
+        __tablename__ = "awards"
+        id = db.Column(db.Integer, primary_key=True)
+        user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
+        team_id = db.Column(db.Integer, db.ForeignKey("teams.id", ondelete="CASCADE"))
+        value = db.Column(db.Integer)
+        date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    class Unlocks(db.Model):
+        __tablename__ = "unlocks"
+        id = db.Column(db.Integer, primary_key=True)
+        team_id = db.Column(db.Integer, db.ForeignKey("teams.id", ondelete="CASCADE"))
+        target = db.Column(db.Integer)
+        type = db.Column(db.String(32))
+
+    class Configs(db.Model):
+        __tablename__ = "config"
+        id = db.Column(db.Integer, primary_key=True)
+        key = db.Column(db.Text)
+        value = db.Column(db.Text)
+
+    def get_config(key, default=None):
+        # Conversions de CTFd.utils.config (booléens et entiers stockés en texte)
+        config = Configs.query.filter_by(key=key).first()
+        if config is None or config.value is None:
+            return default
+        value = config.value
+        if isinstance(value, str):
+            if value.isdigit():
+                return int(value)
+            if value.lower() in ("true", "false"):
+                return value.lower() == "true"
+        return value
+
+    def passthrough(f):
+        return f
+
+    ctfd = _module("CTFd")
+    ctfd.models = _module(
+        "CTFd.models", db=db, Challenges=Challenges, Tags=Tags, Hints=Hints, ChallengeFiles=ChallengeFiles,
+        Teams=Teams, Users=Users, Tokens=Tokens, Submissions=Submissions, Solves=Solves, Awards=Awards,
+        Unlocks=Unlocks, Configs=Configs,
+    )
+    ctfd.cache = _module("CTFd.cache", cache=cache, clear_config=lambda: None)
+    ctfd.plugins = _module(
+        "CTFd.plugins", override_template=lambda *args: None, register_plugin_assets_directory=lambda *args, **kw: None,
+    )
+    ctfd.utils = _module("CTFd.utils")
+    ctfd.utils.config = _module("CTFd.utils.config", get_config=get_config)
+    ctfd.utils.user = _module(
+        "CTFd.utils.user", get_current_team_attrs=lambda: None, is_admin=lambda: False, get_ip=lambda: "127.0.0.1",
+    )
+    ctfd.utils.dates = _module(
+        "CTFd.utils.dates",
+        ctf_frozen=lambda: False,
+        unix_time_to_utc=lambda t: datetime.fromtimestamp(t, timezone.utc).replace(tzinfo=None),
+    )
+    ctfd.utils.crypto = _module("CTFd.utils.crypto", hash_password=lambda password: password)
+    ctfd.utils.decorators = _module(
+        "CTFd.utils.decorators", admins_only=passthrough, authed_only=passthrough,
+        during_ctf_time_only=passthrough, require_verified_emails=passthrough,
+    )
+    ctfd.utils.decorators.visibility = _module(
+        "CTFd.utils.decorators.visibility",
+        check_challenge_visibility=passthrough, check_score_visibility=passthrough,
+    )
+
+
+def _install_plugin() -> None:
+    """
+    Expose le plugin sous le nom ``camps``.
+
+    pytest importe déjà le dossier du plugin comme paquet (il contient un
+    ``__init__.py``) : le même paquet et ses modules sont réutilisés sous
+    l'alias, pour ne pas déclarer deux fois les modèles.
+    """
+    sys.path.insert(0, str(PLUGIN_DIR.parent))
+    package = importlib.import_module(PLUGIN_DIR.name)
+    sys.modules["camps"] = package
+    for module in pkgutil.iter_modules([str(PLUGIN_DIR)]):
+        sys.modules[f"camps.{module.name}"] = importlib.import_module(f"{PLUGIN_DIR.name}.{module.name}")
+
+
+if "CTFd" not in sys.modules:
+    _install_ctfd()
+    _install_plugin()
+
+
+# ---------------------------------------------------------------------------
+# Application et base de test
+# ---------------------------------------------------------------------------
+
+# Caches du processus à vider entre deux tests (les versions repartent de zéro)
+_PROCESS_STATE = {
+    "camps.registry": ("_snapshot", "_masks_snapshot", "_teams_snapshot"),
+    "camps.releases": ("_snapshot",),
+    "camps.membership": ("_store",),
+    "camps.log_sinks": ("_active",),
+    "camps.events": ("_broker",),
+}
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Application Flask sur une base SQLite fichier (partagée entre threads)."""
+    from CTFd.cache import cache
+    from CTFd.models import db
+
+    for name, attrs in _PROCESS_STATE.items():
+        module = importlib.import_module(name)
+        for attr in attrs:
+            setattr(module, attr, None)
+
+    app = Flask("camps_tests", template_folder=str(PLUGIN_DIR / "templates"))
+    app.config.update(
+        TESTING=True,
+        SECRET_KEY="camps-tests",
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'ctfd.db'}",
+        CACHE_TYPE="SimpleCache",
+    )
+    db.init_app(app)
+    cache.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def db(app):
+    from CTFd.models import db
+
+    return db
@@ -0,0 +1,99 @@
+"""
+Contexte de camp partagé par requête : une recherche de l'équipe et une
+lecture de son camp au plus, quel que soit le nombre de consommateurs.
+"""
+
+from collections import namedtuple
+
+import pytest
+from flask import Response
+
+from CTFd.models import Challenges, Configs, db
+
+from camps import context, hooks
+from camps.constants import CFG_SHOW_CHALLENGE_BADGES
+from camps.models import Camp
+
+TeamAttrs = namedtuple("TeamAttrs", "id name")
+
+TEAM_ID = 7
+
+
+class CountingStore:
+    """Stockage des appartenances minimal qui compte les lectures du camp d'une équipe."""
+
+    def __init__(self):
+        self.side_lookups = 0
+
+    def team_side(self, team_id):
+        self.side_lookups += 1
+        return "blue" if team_id == TEAM_ID else None
+
+    def team_camp(self, team_id):
+        return self.team_side(team_id)
+
+    def challenge_masks_for(self, challenge_ids):
+        return {challenge_id: 1 for challenge_id in challenge_ids}
+
+
+@pytest.fixture
+def counters(app, monkeypatch):
+    db.session.add_all([
+        Camp(slug="blue", label="Bleu", bit=0, position=0),
+        Camp(slug="red", label="Rouge", bit=1, position=1),
+        Challenges(name="web", value=100, state="visible"),
+        Configs(key=CFG_SHOW_CHALLENGE_BADGES, value="true"),
+    ])
+    db.session.commit()
+
+    calls = {"team": 0}
+
+    def get_current_team_attrs():
+        calls["team"] += 1
+        return TeamAttrs(TEAM_ID, "Equipe")
+
+    store = CountingStore()
+    monkeypatch.setattr(context, "get_current_team_attrs", get_current_team_attrs)
+    monkeypatch.setattr(context, "get_store", lambda: store)
+    monkeypatch.setattr(hooks, "get_store", lambda: store)
+
+    hooks._register_camp_redirect(app)
+    hooks._register_context_processors(app)
+    hooks._register_badge_injection(app)
+    return calls, store
+
+
+def _consume(app) -> None:
+    """Tous les consommateurs du contexte sur /challenges, dans l'ordre d'une requête."""
+    assert app.preprocess_request() is None  # check_team_has_camp : pas de redirection
+
+    template_context = {}
+    app.update_template_context(template_context)
+    assert template_context["get_current_team"]().id == TEAM_ID
+    assert template_context["can_change_camp_for_display"]() is True
+    assert template_context["get_team_camp"](TEAM_ID) == "blue"
+
+    response = app.process_response(Response("<html><body></body></html>", mimetype="text/html"))
+    assert "campsMap" in response.get_data(as_text=True)  # inject_challenge_badges
+
+
+def test_one_team_lookup_and_one_camp_lookup_per_request(app, counters):
+    calls, store = counters
+    with app.test_request_context("/challenges"):
+        _consume(app)
+
+        assert calls["team"] == 1
+        assert store.side_lookups == 1
+
+
+def test_forget_camp_rereads_the_camp_once(app, counters):
+    calls, store = counters
+    with app.test_request_context("/challenges"):
+        _consume(app)
+        context.get_context().forget_camp()
+        _consume(app)
+
+        # L'équipe n'est jamais recherchée deux fois, le camp relu une seule fois
+        assert calls["team"] == 1
+        assert store.side_lookups == 2
+
@@ -0,0 +1,235 @@
+"""
+Destinations des accès refusés : validation des réglages, rotation du
+fichier JSONL, trame syslog RFC 5424 et tampon borné qui ne bloque jamais.
+"""
+
+import json
+import re
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from camps import log_sinks
+from camps.constants import SINK_JSONL_DEFAULT_BACKUPS, SINK_SYSLOG_DEFAULT_PORT, SINK_TYPES
+
+
+def _record(**fields) -> dict:
+    return {
+        "team_id": 3,
+        "team_name": "Equipe",
+        "challenge_id": 12,
+        "team_camp": "blue",
+        "challenge_camp": "red",
+        "request_info": "GET /api/v1/challenges/12",
+        "method": "GET",
+        "path": "/api/v1/challenges/12",
+        "ip": "192.0.2.7",
+        "timestamp": datetime(2026, 3, 1, 12, 30, 5, 250000, tzinfo=timezone.utc),
+        **fields,
+    }
+
+
+# ---------------------------------------------------------------------------
+# validate_settings
+# ---------------------------------------------------------------------------
+
+def _by_type(settings: list[dict]) -> dict:
+    return {spec["type"]: spec for spec in settings}
+
+
+def test_validate_fills_defaults_for_every_type():
+    settings, error = log_sinks.validate_settings([{"type": "database", "enabled": True}])
+
+    assert error is None
+    assert [spec["type"] for spec in settings] == list(SINK_TYPES)
+    specs = _by_type(settings)
+    assert specs["database"]["enabled"] is True
+    assert specs["jsonl"]["enabled"] is False
+    assert specs["jsonl"]["backups"] == SINK_JSONL_DEFAULT_BACKUPS
+    assert specs["syslog"]["port"] == SINK_SYSLOG_DEFAULT_PORT
+    assert specs["syslog"]["format"] == "syslog"
+
+
+@pytest.mark.parametrize("field, value", [
+    ("max_mb", 1), ("max_mb", 10240), ("backups", 0), ("backups", 100),
+])
+def test_validate_accepts_bounds(field, value):
+    settings, error = log_sinks.validate_settings([{"type": "jsonl", "enabled": True, field: value}])
+
+    assert error is None
+    assert _by_type(settings)["jsonl"][field] == value
+
+
+@pytest.mark.parametrize("item, message", [
+    ({"type": "jsonl", "max_mb": 0}, "max_mb doit être compris entre 1 et 10240"),
+    ({"type": "jsonl", "max_mb": 10241}, "max_mb doit être compris entre 1 et 10240"),
+    ({"type": "jsonl", "backups": -1}, "backups doit être compris entre 0 et 100"),
+    ({"type": "jsonl", "backups": 101}, "backups doit être compris entre 0 et 100"),
+    ({"type": "jsonl", "max_mb": "beaucoup"}, "Valeur invalide pour max_mb"),
+    ({"type": "jsonl", "path": "x" * 256}, "Chemin du fichier trop long"),
+    ({"type": "syslog", "enabled": True}, "Hôte syslog requis"),
+    ({"type": "syslog", "host": "siem", "port": 0}, "port doit être compris entre 1 et 65535"),
+    ({"type": "syslog", "host": "siem", "port": 65536}, "port doit être compris entre 1 et 65535"),
+    ({"type": "syslog", "host": "siem", "format": "cef"}, "Format syslog invalide : cef"),
+    ({"type": "kafka"}, "Destination inconnue : kafka"),
+])
+def test_validate_rejects_invalid_values(item, message):
+    assert log_sinks.validate_settings([item]) == ([], message)
+
+
+def test_validate_rejects_non_list():
+    settings, error = log_sinks.validate_settings({"type": "database"})
+
+    assert settings == []
+    assert error.startswith("Format invalide")
+
+
+# ---------------------------------------------------------------------------
+# Rotation du fichier JSONL
+# ---------------------------------------------------------------------------
+
+# Un peu plus d'un Mio par refus : chaque écriture dépasse max_mb = 1
+_LARGE = 1024 * 1024 + 1
+
+
+def _jsonl_sink(path, backups: int) -> log_sinks.JsonlFileSink:
+    return log_sinks.JsonlFileSink({"type": "jsonl", "path": str(path), "max_mb": 1, "backups": backups})
+
+
+def _markers(path) -> list[str]:
+    return [json.loads(line)["marker"] for line in path.read_text().splitlines()]
+
+
+def test_jsonl_appends_below_max_size(tmp_path):
+    path = tmp_path / "logs" / "denials.jsonl"
+    sink = _jsonl_sink(path, backups=2)
+    sink.write([_record(marker="a")])
+    sink.write([_record(marker="b"), _record(marker="c")])
+    sink.release()
+
+    assert _markers(path) == ["a", "b", "c"]
+    assert json.loads(path.read_text().splitlines()[0])["timestamp"] == "2026-03-01T12:30:05.250Z"
+    assert not (tmp_path / "logs" / "denials.jsonl.1").exists()
+
+
+def test_jsonl_rotation_keeps_backups(tmp_path):
+    path = tmp_path / "denials.jsonl"
+    sink = _jsonl_sink(path, backups=2)
+    for marker in ("a", "b", "c"):
+        sink.write([_record(marker=marker, request_info="x" * _LARGE)])
+    sink.write([_record(marker="d")])
+    sink.release()
+
+    # Plus ancienne sauvegarde (« a ») écartée, fichier courant rouvert après rotation
+    assert _markers(path) == ["d"]
+    assert _markers(tmp_path / "denials.jsonl.1") == ["c"]
+    assert _markers(tmp_path / "denials.jsonl.2") == ["b"]
+    assert not (tmp_path / "denials.jsonl.3").exists()
+
+
+def test_jsonl_rotation_without_backups_truncates(tmp_path):
+    path = tmp_path / "denials.jsonl"
+    sink = _jsonl_sink(path, backups=0)
+    sink.write([_record(marker="a", request_info="x" * _LARGE)])
+    assert not path.exists()
+
+    sink.write([_record(marker="b")])
+    sink.release()
+
+    assert _markers(path) == ["b"]
+    assert not (tmp_path / "denials.jsonl.1").exists()
+
+
+# ---------------------------------------------------------------------------
+# Syslog (UDP)
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def collector():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(5)
+    yield receiver
+    receiver.close()
+
+
+def _syslog_sink(collector, format: str) -> log_sinks.SyslogSink:
+    return log_sinks.SyslogSink({
+        "type": "syslog", "host": "127.0.0.1", "port": collector.getsockname()[1], "format": format,
+    })
+
+
+def test_syslog_rfc5424_framing(collector):
+    sink = _syslog_sink(collector, "syslog")
+    sink.write([_record(), _record(team_id=4)])
+    sink.release()
+
+    messages = [collector.recv(65535).decode() for _ in range(2)]
+    pattern = re.compile(
+        r"^<132>1 2026-03-01T12:30:05\.250Z (?P<host>\S+) ctfd-camps (?P<pid>\d+) "
+        r"camp_access_denied - (?P<msg>\{.*\})$"
+    )
+    for message, team_id in zip(messages, (3, 4)):
+        match = pattern.match(message)
+        assert match, message
+        assert match["host"] == (socket.gethostname() or "-")
+        payload = json.loads(match["msg"])
+        assert payload["event"] == "camp_access_denied"
+        assert payload["team_id"] == team_id
+        assert payload["timestamp"] == "2026-03-01T12:30:05.250Z"
+
+
+def test_syslog_json_format_sends_the_bare_document(collector):
+    sink = _syslog_sink(collector, "json")
+    sink.write([_record()])
+    sink.release()
+
+    payload = json.loads(collector.recv(65535).decode())
+    assert payload["event"] == "camp_access_denied"
+    assert payload["ip"] == "192.0.2.7"
+
+
+# ---------------------------------------------------------------------------
+# Tampon borné
+# ---------------------------------------------------------------------------
+
+class _BlockedSink(log_sinks.LogSink):
+    """Destination dont l'écriture reste bloquée jusqu'à ``release_write``."""
+
+    type = "blocked"
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.writing = threading.Event()
+        self.release_write = threading.Event()
+        self.written = []
+
+    def write(self, batch):
+        self.writing.set()
+        self.release_write.wait(10)
+        self.written.extend(batch)
+
+
+def test_offer_drops_and_counts_when_the_buffer_is_full(app, monkeypatch):
+    monkeypatch.setattr(log_sinks, "SINK_BUFFER_SIZE", 3)
+    sink = _BlockedSink({"type": "blocked"})
+
+    # Premier refus pris par le thread, bloqué dans write()
+    sink.offer(_record(team_id=0))
+    assert sink.writing.wait(5)
+
+    started = time.monotonic()
+    for team_id in range(1, 9):
+        sink.offer(_record(team_id=team_id))
+    elapsed = time.monotonic() - started
+
+    # 3 refus en tampon, les 5 suivants perdus et comptés, sans attendre l'écriture
+    assert elapsed < 1
+    assert sink._pending["dropped"] == 5
+
+    sink.release_write.set()
+    sink.close(timeout=5)
+    assert [record["team_id"] for record in sink.written] == [0, 1, 2, 3]
@@ -0,0 +1,134 @@
+"""
+Règles de camp : priorité par position, motifs de nom sans casse, règle
+neutre, et compilation dans ``challenge_camps`` face aux choix explicites.
+"""
+
+import pytest
+
+from CTFd.models import Challenges, Tags, db
+
+from camps.models import Camp, CampRule, ChallengeCamp
+from camps.rules import RuleSet, compile_rules
+
+BLUE, RED = 0b01, 0b10
+
+
+def _rule(id, kind, pattern, mask=BLUE, position=None) -> CampRule:
+    return CampRule(id=id, kind=kind, pattern=pattern, camp_mask=mask, position=id if position is None else position)
+
+
+# ---------------------------------------------------------------------------
+# RuleSet.match
+# ---------------------------------------------------------------------------
+
+def test_lowest_position_wins_across_kinds():
+    category = _rule(1, "category", "Web", position=3)
+    tag = _rule(2, "tag", "sqli", position=1)
+    name = _rule(3, "name", "login*", position=2)
+    rules = RuleSet([category, tag, name])
+
+    assert rules.match("Login portal", "web", ["SQLi"]) is tag
+    assert rules.match("Login portal", "web", []) is name
+    assert rules.match("Upload", "web", []) is category
+    assert rules.match("Upload", "crypto", ["xss"]) is None
+
+
+def test_same_position_falls_back_to_id():
+    first = _rule(1, "tag", "easy", position=5)
+    second = _rule(2, "category", "misc", position=5)
+
+    assert RuleSet([second, first]).match("x", "misc", ["easy"]) is first
+
+
+def test_first_matching_name_pattern_by_position():
+    late = _rule(1, "name", "*", position=9)
+    early = _rule(2, "name", "web*", position=0)
+
+    assert RuleSet([late, early]).match("Web 101", None, []) is early
+    assert RuleSet([late, early]).match("Crypto 101", None, []) is late
+
+
+@pytest.mark.parametrize("pattern, name, expected", [
+    ("Web*", "WEB exploitation", True),
+    ("web*", "Webshell", True),
+    ("*forensic?", "Disk FORENSICS", True),
+    ("*forensic?", "forensic", False),
+    ("rev-[0-9]", "REV-7", True),
+    ("Web*", "Not web", False),
+])
+def test_name_patterns_are_case_insensitive_fnmatch(pattern, name, expected):
+    rule = _rule(1, "name", pattern)
+
+    assert (RuleSet([rule]).match(name, None, []) is rule) is expected
+
+
+def test_category_and_tag_keys_ignore_case_and_spaces():
+    category = _rule(1, "category", "  Reverse ")
+    tag = _rule(2, "tag", "OSINT")
+    rules = RuleSet([category, tag])
+
+    assert rules.match(None, "REVERSE", []) is category
+    assert rules.match(None, None, [" osint "]) is tag
+
+
+def test_neutral_rule_stops_evaluation():
+    neutral = _rule(1, "tag", "training", mask=0)
+    category = _rule(2, "category", "web", mask=RED)
+
+    matched = RuleSet([neutral, category]).match("x", "web", ["training"])
+    assert matched is neutral
+    assert matched.camp_mask == 0
+
+
+# ---------------------------------------------------------------------------
+# compile_rules
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def challenges(app):
+    db.session.add_all([
+        Camp(slug="blue", label="Bleu", bit=0, position=0),
+        Camp(slug="red", label="Rouge", bit=1, position=1),
+        Challenges(id=1, name="Web login", category="web"),
+        Challenges(id=2, name="Web upload", category="web"),
+        Challenges(id=3, name="Warmup", category="web"),
+        Tags(challenge_id=3, value="training"),
+        CampRule(id=1, kind="tag", pattern="training", camp_mask=0, position=0),
+        CampRule(id=2, kind="category", pattern="web", camp_mask=BLUE, position=1),
+        # Choix explicite de l'admin : challenge 2 réservé au camp rouge
+        ChallengeCamp(challenge_id=2, camp="red", camp_mask=RED, rule_id=None),
+    ])
+    db.session.commit()
+
+
+def _rows() -> dict[int, tuple[int, int | None]]:
+    return {
+        row.challenge_id: (row.camp_mask, row.rule_id)
+        for row in db.session.query(ChallengeCamp).order_by(ChallengeCamp.challenge_id)
+    }
+
+
+def test_compile_keeps_explicit_overrides(challenges):
+    compile_rules()
+
+    assert _rows() == {
+        1: (BLUE, 2),
+        2: (RED, None),  # choix explicite conservé
+        # 3 : règle neutre, aucune ligne (la règle par catégorie n'est pas évaluée)
+    }
+
+
+def test_compile_with_reset_overrides_drops_them(challenges):
+    compile_rules()
+    compile_rules([2], reset_overrides=True)
+
+    assert _rows() == {1: (BLUE, 2), 2: (BLUE, 2)}
+
+
+def test_compile_replaces_rows_of_removed_rules(challenges):
+    compile_rules()
+    db.session.delete(db.session.get(CampRule, 2))
+    db.session.commit()
+
+    assert compile_rules() == 1
+    assert _rows() == {2: (RED, None)}
@@ -0,0 +1,109 @@
+"""
+Upserts simultanés d'une même appartenance : jamais de violation
+d'unicité, une seule ligne portant la dernière valeur écrite.
+"""
+
+import threading
+
+import pytest
+import sqlalchemy as sa
+
+from CTFd.models import db
+
+from camps import upsert
+from camps.models import ChallengeCamp, TeamCamp
+
+WRITERS = 8
+ROUNDS = 5
+
+WRITES = {
+    "native": upsert.upsert,
+    "fallback": upsert._upsert_fallback,
+}
+
+
+def _run_writers(engine, write, table, key, key_value, values_of) -> tuple[list, list]:
+    """
+    ``WRITERS`` threads écrivent la même clé ``ROUNDS`` fois, synchronisés par une barrière.
+
+    Returns:
+        (erreurs, valeurs dans l'ordre des commits) ; SQLite sérialise les
+        écritures (verrou de la base de l'instruction au commit), l'ordre
+        noté dans la transaction est donc celui des commits.
+    """
+    barrier = threading.Barrier(WRITERS, timeout=30)
+    lock = threading.Lock()
+    errors, committed = [], []
+
+    def writer(index: int) -> None:
+        for round_ in range(ROUNDS):
+            barrier.wait()
+            values = values_of(index, round_)
+            try:
+                with engine.begin() as connection:
+                    write(connection, table, key, key_value, values)
+                    with lock:
+                        committed.append(values)
+            except Exception as exc:
+                with lock:
+                    errors.append(exc)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors, committed
+
+
+@pytest.mark.parametrize("mode", sorted(WRITES))
+def test_concurrent_team_upserts_keep_one_row(app, mode):
+    table = TeamCamp.__table__
+    errors, committed = _run_writers(
+        db.engine, WRITES[mode], table, "team_id", 1,
+        lambda index, round_: {"camp": f"side-{index}-{round_}"},
+    )
+
+    assert errors == []
+    assert len(committed) == WRITERS * ROUNDS
+    with db.engine.connect() as connection:
+        rows = connection.execute(sa.select(table.c.camp).where(table.c.team_id == 1)).scalars().all()
+    assert rows == [committed[-1]["camp"]]
+
+
+@pytest.mark.parametrize("mode", sorted(WRITES))
+def test_concurrent_challenge_upserts_keep_one_row(app, mode):
+    table = ChallengeCamp.__table__
+    errors, committed = _run_writers(
+        db.engine, WRITES[mode], table, "challenge_id", 1,
+        lambda index, round_: {"camp": "multi", "camp_mask": (index + 1) << round_},
+    )
+
+    assert errors == []
+    with db.engine.connect() as connection:
+        rows = connection.execute(sa.select(table.c.camp_mask).where(table.c.challenge_id == 1)).scalars().all()
+    assert rows == [committed[-1]["camp_mask"]]
+
+
+def test_fallback_updates_a_row_inserted_after_its_update(app):
+    """Ligne insérée par une autre écriture entre l'UPDATE et l'INSERT : repli en UPDATE."""
+    table = TeamCamp.__table__
+    inserted = []
+
+    def insert_concurrently(conn, cursor, statement, parameters, context, executemany):
+        # Juste après l'UPDATE sans effet, la ligne apparaît (écriture concurrente)
+        if statement.startswith("UPDATE team_camps") and not inserted:
+            inserted.append(True)
+            cursor.connection.execute("INSERT INTO team_camps (team_id, camp) VALUES (1, 'red')")
+
+    sa.event.listen(db.engine, "after_cursor_execute", insert_concurrently)
+    try:
+        with db.engine.begin() as connection:
+            upsert._upsert_fallback(connection, table, "team_id", 1, {"camp": "blue"})
+    finally:
+        sa.event.remove(db.engine, "after_cursor_execute", insert_concurrently)
+
+    assert inserted
+    with db.engine.connect() as connection:
+        rows = connection.execute(sa.select(table.c.team_id, table.c.camp)).all()
+    assert rows == [(1, "blue")]
@@ -0,0 +1,139 @@
+"""
+Vérification des copies des appartenances : écarts détectés par groupe,
+copie invalidée et comptes de la page de sélection republiés.
+"""
+
+import pytest
+
+from CTFd.models import Challenges, Teams, db
+
+from camps import caching, verifier
+from camps.constants import VERSION_COUNTS
+from camps.models import Camp, ChallengeCamp, TeamCamp
+
+BLUE, RED = 0b01, 0b10
+
+
+class StubStore:
+    """Copie des appartenances, divergente jusqu'au rechargement demandé par le vérificateur."""
+
+    def __init__(self, sides: dict, masks: dict):
+        self.sides = dict(sides)
+        self.masks = dict(masks)
+        self.reloads = []
+
+    def team_sides(self) -> dict:
+        return dict(self.sides)
+
+    def challenge_masks(self) -> dict:
+        return dict(self.masks)
+
+    def reload_teams(self) -> None:
+        self.reloads.append("teams")
+        self.sides = {row.team_id: row.camp for row in TeamCamp.query if row.camp}
+
+    def reload_challenges(self) -> None:
+        self.reloads.append("challenges")
+        self.masks = {row.challenge_id: row.camp_mask for row in ChallengeCamp.query if row.camp_mask}
+
+
+@pytest.fixture
+def memberships(app):
+    db.session.add_all([
+        Camp(slug="blue", label="Bleu", bit=0, position=0),
+        Camp(slug="red", label="Rouge", bit=1, position=1),
+        *(Teams(id=team_id, name=f"team-{team_id}") for team_id in (1, 2, 3)),
+        *(Challenges(id=challenge_id, name=f"chal-{challenge_id}") for challenge_id in (10, 11, 12)),
+        TeamCamp(team_id=1, camp="blue"),
+        TeamCamp(team_id=2, camp="blue"),
+        TeamCamp(team_id=3, camp="red"),
+        ChallengeCamp(challenge_id=10, camp="blue", camp_mask=BLUE),
+        ChallengeCamp(challenge_id=11, camp="red", camp_mask=RED),
+        ChallengeCamp(challenge_id=12, camp="multi", camp_mask=BLUE | RED),
+    ])
+    db.session.commit()
+
+
+@pytest.fixture
+def bumps(monkeypatch):
+    calls = []
+
+    def bump_version(name):
+        calls.append(name)
+        return caching.bump_version(name)
+
+    monkeypatch.setattr(verifier, "bump_version", bump_version)
+    return calls
+
+
+def _use(monkeypatch, store: StubStore) -> StubStore:
+    monkeypatch.setattr(verifier, "get_store", lambda: store)
+    return store
+
+
+def test_matching_copies_report_nothing(memberships, bumps, monkeypatch):
+    store = _use(monkeypatch, StubStore({1: "blue", 2: "blue", 3: "red"}, {10: BLUE, 11: RED, 12: BLUE | RED}))
+
+    assert verifier.verify(confirm_delay=0) == []
+    assert store.reloads == []
+    assert bumps == []
+    assert verifier.get_stats()["runs"] == 1
+
+
+def test_team_divergence_reloads_teams_and_bumps_counts(memberships, bumps, monkeypatch):
+    # Équipe 2 passée chez les rouges en base, invalidation perdue
+    store = _use(monkeypatch, StubStore({1: "blue", 2: "red", 3: "red"}, {10: BLUE, 11: RED, 12: BLUE | RED}))
+
+    divergences = verifier.verify(confirm_delay=0)
+
+    assert divergences == [{"dataset": "team_camps", "groups": "blue, red", "repaired": True}]
+    assert store.reloads == ["teams"]
+    assert bumps == [VERSION_COUNTS]
+    assert caching.get_version(VERSION_COUNTS) == 1
+    assert verifier.verify(confirm_delay=0) == []
+
+
+def test_challenge_divergence_reports_described_masks(memberships, bumps, monkeypatch):
+    # Challenge 12 absent de la copie, challenge 13 inexistant en base
+    store = _use(monkeypatch, StubStore({1: "blue", 2: "blue", 3: "red"}, {10: BLUE, 11: RED, 13: RED}))
+
+    divergences = verifier.verify(confirm_delay=0)
+
+    assert divergences == [{"dataset": "challenge_camps", "groups": "red, multi", "repaired": True}]
+    assert store.reloads == ["challenges"]
+    assert bumps == []
+    assert verifier.verify(confirm_delay=0) == []
+
+
+def test_both_datasets_and_no_repair(memberships, bumps, monkeypatch):
+    store = _use(monkeypatch, StubStore({1: "blue"}, {}))
+
+    divergences = verifier.verify(repair=False, confirm_delay=0)
+
+    assert [d["dataset"] for d in divergences] == ["team_camps", "challenge_camps"]
+    assert all(not d["repaired"] for d in divergences)
+    assert store.reloads == []
+    assert bumps == []
+    stats = verifier.get_stats()
+    assert stats["divergences"] == {"team_camps": 1, "challenge_camps": 1}
+    assert stats["last_divergence"]["dataset"] == "challenge_camps"
+
+
+def test_divergence_fixed_before_confirmation_is_not_reported(memberships, bumps, monkeypatch):
+    """Écriture validée dont la version n'était pas encore publiée : pas d'écart confirmé."""
+    store = _use(monkeypatch, StubStore({1: "blue", 2: "red", 3: "red"}, {10: BLUE, 11: RED, 12: BLUE | RED}))
+    checks = []
+    diverging = verifier._diverging
+
+    def confirm(name):
+        # Version publiée pendant l'attente : copie rechargée avant la confirmation
+        if checks.count(name):
+            store.sides[2] = "blue"
+        checks.append(name)
+        return diverging(name)
+
+    monkeypatch.setattr(verifier, "_diverging", confirm)
+
+    assert verifier.verify(confirm_delay=0.01) == []
+    assert checks == ["team_camps", "challenge_camps", "team_camps"]
+    assert store.reloads == []
@@ -0,0 +1,182 @@
+"""
+Limitation des équipes qui sondent les challenges des autres camps.
+
+Chaque accès refusé consomme un jeton du seau de l'équipe (token bucket en
+mémoire du processus, regarni en continu). Quand le seau est vide, l'équipe
+est bloquée pendant le délai de refroidissement : le blocage est écrit dans
+le cache CTFd pour être partagé entre les workers, et ses requêtes sur les
+endpoints de challenge reçoivent un 429 avant tout accès à la base.
+
+Les seaux sont propres à chaque worker : avec N workers, une équipe peut
+cumuler jusqu'à N × ``burst`` refus avant d'être bloquée. Le blocage, lui,
+vaut pour tous.
+
+Chaque blocage a sa propre clé (source de vérité, expirée par le cache).
+La liste de la page admin est un index modifié sous verrou ``cache.add``
+(deux workers qui bloquent en même temps ne s'écrasent pas), et n'affiche
+que les équipes dont la clé de blocage existe encore.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+from CTFd.cache import cache
+from CTFd.utils.config import get_config
+
+from .constants import (
+    CFG_THROTTLE_BURST,
+    CFG_THROTTLE_COOLDOWN,
+    CFG_THROTTLE_RATE,
+    LOG_PREFIX,
+    THROTTLE_BLOCK_KEY_PREFIX,
+    THROTTLE_DEFAULT_BURST,
+    THROTTLE_DEFAULT_COOLDOWN,
+    THROTTLE_DEFAULT_RATE,
+    THROTTLE_LOCAL_TTL,
+    THROTTLE_LOCK_TIMEOUT,
+    THROTTLE_LOCK_WAIT,
+    THROTTLE_TEAMS_KEY,
+)
+
+logger = logging.getLogger("CTFdCamps")
+
+_lock = threading.Lock()
+_buckets: dict[int, tuple[float, float]] = {}  # team_id -> (jetons, horodatage)
+_blocked: dict[int, tuple[float, float]] = {}  # team_id -> (fin du blocage, vérifié à)
+
+
+def get_settings() -> dict:
+    """Paramètres courants (burst, refus regagnés par minute, cooldown)."""
+    def read(key, default):
+        try:
+            return max(0, int(get_config(key, default=default)))
+        except (TypeError, ValueError):
+            return default
+
+    return {
+        "burst": read(CFG_THROTTLE_BURST, THROTTLE_DEFAULT_BURST),
+        "rate": read(CFG_THROTTLE_RATE, THROTTLE_DEFAULT_RATE),
+        "cooldown": read(CFG_THROTTLE_COOLDOWN, THROTTLE_DEFAULT_COOLDOWN),
+    }
+
+
+def retry_after(team_id: int) -> int:
+    """
+    Secondes de blocage restantes pour une équipe (0 si elle n'est pas bloquée).
+
+    Un blocage connu localement est resservi sans lecture du cache pendant
+    THROTTLE_LOCAL_TTL secondes ; le chemin normal coûte une lecture du cache.
+    """
+    now = time.time()
+    local = _blocked.get(team_id)
+    if local is not None and now - local[1] < THROTTLE_LOCAL_TTL:
+        until = local[0]
+    else:
+        until = cache.get(THROTTLE_BLOCK_KEY_PREFIX + str(team_id)) or 0
+        if until:
+            _blocked[team_id] = (until, now)
+
+    if until <= now:
+        _blocked.pop(team_id, None)
+        return 0
+    return int(until - now) + 1
+
+
+def record_denial(team_id: int, team_name: str) -> bool:
+    """
+    Décompte un accès refusé.
+
+    Returns:
+        True si l'équipe vient d'être bloquée.
+    """
+    settings = get_settings()
+    burst = settings["burst"]
+    if not burst or not settings["cooldown"]:
+        return False
+
+    now = time.time()
+    with _lock:
+        tokens, last = _buckets.get(team_id, (burst, now))
+        tokens = min(burst, tokens + (now - last) * settings["rate"] / 60)
+        if tokens >= 1:
+            _buckets[team_id] = (tokens - 1, now)
+            return False
+        _buckets.pop(team_id, None)
+
+    _block(team_id, team_name, now, settings["cooldown"])
+    return True
+
+
+def _block(team_id: int, team_name: str, now: float, cooldown: int) -> None:
+    until = now + cooldown
+    cache.set(THROTTLE_BLOCK_KEY_PREFIX + str(team_id), until, timeout=cooldown)
+    _blocked[team_id] = (until, now)
+
+    entry = {"team_id": team_id, "team_name": team_name, "since": now, "until": until}
+    _update_teams(team_id, entry)
+
+    logger.warning(
+        "%s Équipe %s bloquée %ds (trop d'accès refusés)",
+        LOG_PREFIX, team_name, cooldown,
+    )
+
+
+def _update_teams(team_id: int, entry: dict | None) -> None:
+    """Ajoute (ou retire si ``entry`` est None) une équipe de l'index des blocages, sous verrou partagé."""
+    lock = THROTTLE_TEAMS_KEY + ":lock"
+    deadline = time.monotonic() + THROTTLE_LOCK_WAIT
+    while not cache.add(lock, 1, timeout=THROTTLE_LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            # Index d'affichage seulement : le blocage lui-même est déjà écrit
+            logger.warning("%s Verrou des équipes bloquées indisponible, liste non mise à jour", LOG_PREFIX)
+            return
+        time.sleep(0.01)
+    try:
+        now = time.time()
+        teams = {
+            tid: entry for tid, entry in (cache.get(THROTTLE_TEAMS_KEY) or {}).items()
+            if entry["until"] > now
+        }
+        if entry is None:
+            teams.pop(team_id, None)
+        else:
+            teams[team_id] = entry
+        cache.set(THROTTLE_TEAMS_KEY, teams, timeout=0)
+    finally:
+        cache.delete(lock)
+
+
+def _active_teams(now: float) -> dict:
+    """Entrées de l'index dont le blocage est encore en cours (clé présente)."""
+    teams = [entry for entry in (cache.get(THROTTLE_TEAMS_KEY) or {}).values() if entry["until"] > now]
+    if not teams:
+        return {}
+    blocks = cache.get_many(*(THROTTLE_BLOCK_KEY_PREFIX + str(entry["team_id"]) for entry in teams))
+    # Une entrée sans clé de blocage a été levée (ou a expiré) : jamais réaffichée
+    return {entry["team_id"]: entry for entry, until in zip(teams, blocks) if until and until > now}
+
+
+def get_throttled_teams() -> list[dict]:
+    """Équipes actuellement bloquées, pour la page des logs."""
+    now = time.time()
+    result = []
+    for entry in sorted(_active_teams(now).values(), key=lambda e: e["since"], reverse=True):
+        result.append({
+            **entry,
+            "since": datetime.fromtimestamp(entry["since"]).strftime("%d/%m/%Y %H:%M:%S"),
+            "until": datetime.fromtimestamp(entry["until"]).strftime("%d/%m/%Y %H:%M:%S"),
+            "remaining": int(entry["until"] - now) + 1,
+        })
+    return result
+
+
+def clear_throttle(team_id: int) -> None:
+    """Lève le blocage d'une équipe (les autres workers le constatent sous THROTTLE_LOCAL_TTL)."""
+    cache.delete(THROTTLE_BLOCK_KEY_PREFIX + str(team_id))
+    _blocked.pop(team_id, None)
+    with _lock:
+        _buckets.pop(team_id, None)
+
+    _update_teams(team_id, None)
@@ -0,0 +1,136 @@
+"""
+Upsert en une instruction, selon le dialecte de la base.
+
+Les appartenances (``team_camps``, ``challenge_camps``) ont une ligne au
+plus par équipe ou par challenge. Un SELECT suivi d'un INSERT ou d'un
+UPDATE laisse une fenêtre entre les deux requêtes : deux requêtes
+simultanées pour la même équipe (double clic, ruée sur la sélection)
+finissent sur une violation d'unicité. L'upsert écrit la ligne en une
+instruction atomique :
+
+  - SQLite (3.24+) et PostgreSQL : ``INSERT … ON CONFLICT DO UPDATE``
+  - MySQL / MariaDB : ``INSERT … ON DUPLICATE KEY UPDATE``
+  - autres dialectes : UPDATE, puis INSERT dans un savepoint, repris en
+    UPDATE si une écriture concurrente a inséré la ligne entre-temps.
+"""
+
+import threading
+
+import sqlalchemy as sa
+
+
+def _native_insert(dialect_name: str):
+    """Constructeur ``insert`` du dialecte s'il gère l'upsert, sinon None."""
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+    else:
+        return None
+    return insert
+
+
+def upsert(connection, table: sa.Table, key: str, key_value, values: dict) -> None:
+    """
+    Insère ou met à jour la ligne ``table.key == key_value``.
+
+    Args:
+        connection: connexion de la transaction en cours
+            (``db.session.connection()`` pour rester dans la session ORM).
+        key: colonne portant la contrainte d'unicité.
+        values: colonnes à écrire (hors clé).
+    """
+    insert = _native_insert(connection.dialect.name)
+    if insert is None:
+        _upsert_fallback(connection, table, key, key_value, values)
+        return
+
+    statement = insert(table).values(**{key: key_value}, **values)
+    if connection.dialect.name in ("mysql", "mariadb"):
+        statement = statement.on_duplicate_key_update(**values)
+    else:
+        statement = statement.on_conflict_do_update(index_elements=[key], set_=values)
+    connection.execute(statement)
+
+
+def _upsert_fallback(connection, table: sa.Table, key: str, key_value, values: dict) -> None:
+    update = table.update().where(table.c[key] == key_value).values(**values)
+    if connection.execute(update).rowcount:
+        return
+    try:
+        with connection.begin_nested():
+            connection.execute(table.insert().values(**{key: key_value}, **values))
+    except sa.exc.IntegrityError:
+        # Ligne insérée par une écriture concurrente depuis l'UPDATE
+        connection.execute(update)
+
+
+# ---------------------------------------------------------------------------
+# Vérification sur la base réelle (flask camps check-upsert)
+# ---------------------------------------------------------------------------
+
+def check_concurrency(engine, writers: int = 8, rounds: int = 20, fallback: bool = False) -> dict:
+    """
+    Vérifie que des upserts simultanés de la même clé ne violent jamais
+    la contrainte d'unicité sur la base ``engine``.
+
+    À chaque tour, ``writers`` connexions (une par thread), synchronisées
+    par une barrière, écrivent la même clé neuve : toutes sauf une
+    trouvent la ligne insérée par une autre. Les écritures portent sur une
+    table de travail créée puis supprimée : aucune donnée n'est touchée.
+
+    Args:
+        fallback: exerce le repli UPDATE / INSERT en savepoint au lieu de
+            l'instruction native du dialecte.
+
+    Returns:
+        ``{"writes": écritures réussies, "errors": messages, "rows": lignes,
+        "duplicates": clés en double}``
+    """
+    metadata = sa.MetaData()
+    table = sa.Table(
+        "camp_upsert_check", metadata,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("key", sa.Integer, nullable=False, unique=True),
+        sa.Column("value", sa.String(32), nullable=False),
+    )
+    write = _upsert_fallback if fallback else upsert
+    barrier = threading.Barrier(writers, timeout=30)
+    lock = threading.Lock()
+    result = {"writes": 0, "errors": [], "rows": 0, "duplicates": []}
+
+    def writer(index: int) -> None:
+        for key in range(rounds):
+            try:
+                barrier.wait()
+            except threading.BrokenBarrierError:
+                return
+            try:
+                with engine.begin() as connection:
+                    write(connection, table, "key", key, {"value": f"writer-{index}"})
+            except Exception as exc:
+                with lock:
+                    result["errors"].append(f"{type(exc).__name__}: {exc}"[:200])
+            else:
+                with lock:
+                    result["writes"] += 1
+
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    try:
+        threads = [threading.Thread(target=writer, args=(i,), daemon=True) for i in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with engine.connect() as connection:
+            result["rows"] = connection.execute(sa.select(sa.func.count()).select_from(table)).scalar()
+            result["duplicates"] = list(connection.execute(
+                sa.select(table.c.key).group_by(table.c.key).having(sa.func.count() > 1)
+            ).scalars())
+    finally:
+        metadata.drop_all(engine)
+    return result
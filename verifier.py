@@ -0,0 +1,257 @@
+"""
+Vérification de cohérence des appartenances en cache.
+
+Les lectures du contrôle d'accès, de la liste des challenges et des quotas
+passent par des copies : instantanés du processus (backend « sql ») ou
+hashes du cache partagé (backend « cache »). Une invalidation perdue (worker
+tué entre l'écriture et la publication de la version, erreur du cache)
+laisserait ces copies diverger de ``team_camps`` et ``challenge_camps``
+jusqu'à la prochaine écriture : challenges d'un autre camp visibles,
+compte d'un camp faussé.
+
+Chaque worker compare donc périodiquement (VERIFY_INTERVAL, thread de fond)
+les appartenances vues par ``get_store()`` à la base, par sommes de
+contrôle : pour chaque camp (ou masque), nombre de lignes, somme et somme
+des carrés des ids, calculés d'un côté par une requête groupée sur les
+index, de l'autre en mémoire. Un écart est confirmé après
+VERIFY_CONFIRM_DELAY (une écriture peut être validée sans que sa version
+soit encore publiée), puis corrigé en invalidant la copie (rechargée par
+tous les workers) et compté dans le cache pour la page admin.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import current_app, g
+from sqlalchemy import BigInteger, cast, func
+
+from CTFd.cache import cache
+from CTFd.models import db
+
+from .caching import bump_version
+from .constants import (
+    LOG_PREFIX,
+    VERIFY_CONFIRM_DELAY,
+    VERIFY_INTERVAL,
+    VERIFY_INTERVAL_CONFIG_KEY,
+    VERIFY_STATS_KEY_PREFIX,
+    VERSION_COUNTS,
+)
+from .membership import get_store
+from .models import ChallengeCamp, TeamCamp
+from .registry import get_registry
+
+logger = logging.getLogger("CTFdCamps")
+
+DATASETS = ("team_camps", "challenge_camps")
+
+_COUNTERS = ("runs", *(f"divergences:{name}" for name in DATASETS))
+
+
+# ---------------------------------------------------------------------------
+# Sommes de contrôle
+# ---------------------------------------------------------------------------
+
+def _checksums(pairs) -> dict:
+    """``{groupe: (nombre, somme des ids, somme des carrés)}`` d'une liste (id, groupe)."""
+    sums = {}
+    for key, group in pairs:
+        count, total, squares = sums.get(group, (0, 0, 0))
+        sums[group] = (count + 1, total + key, squares + key * key)
+    return sums
+
+
+def _sql_checksums(key_column, group_column, *conditions) -> dict:
+    # BIGINT : le carré d'un id dépasse un INTEGER au-delà de 46340
+    key = cast(key_column, BigInteger)
+    rows = (
+        db.session.query(group_column, func.count(key_column), func.sum(key), func.sum(key * key))
+        .filter(*conditions)
+        .group_by(group_column)
+    )
+    return {group: (count, int(total or 0), int(squares or 0)) for group, count, total, squares in rows}
+
+
+def _team_checksums() -> tuple[dict, dict]:
+    """Sommes de contrôle (copie, base) des côtés des équipes, par côté."""
+    g.pop("camps_team_camps", None)
+    cached = _checksums(get_store().team_sides().items())
+    stored = _sql_checksums(TeamCamp.team_id, TeamCamp.camp, TeamCamp.camp.isnot(None), TeamCamp.camp != "")
+    return cached, stored
+
+
+def _challenge_checksums() -> tuple[dict, dict]:
+    """Sommes de contrôle (copie, base) des masques des challenges restreints, par masque."""
+    g.pop("camps_challenge_masks", None)
+    cached = _checksums(get_store().challenge_masks().items())
+    stored = _sql_checksums(ChallengeCamp.challenge_id, ChallengeCamp.camp_mask, ChallengeCamp.camp_mask != 0)
+    return cached, stored
+
+
+_CHECKS = {
+    "team_camps": _team_checksums,
+    "challenge_camps": _challenge_checksums,
+}
+
+
+def _diverging(name: str) -> list:
+    """Groupes (côtés ou masques) dont la somme de contrôle diffère entre la copie et la base."""
+    # Nouvelle transaction : lecture de l'état validé le plus récent
+    db.session.rollback()
+    cached, stored = _CHECKS[name]()
+    return sorted(
+        (group for group in cached.keys() | stored.keys() if cached.get(group) != stored.get(group)),
+        key=str,
+    )
+
+
+def _describe(name: str, groups: list) -> str:
+    if name == "challenge_camps":
+        registry = get_registry()
+        groups = [registry.describe(mask) or f"{mask:#x}" for mask in groups]
+    return ", ".join(map(str, groups))
+
+
+# ---------------------------------------------------------------------------
+# Vérification
+# ---------------------------------------------------------------------------
+
+def verify(repair: bool = True, confirm_delay: float = VERIFY_CONFIRM_DELAY) -> list[dict]:
+    """
+    Compare les appartenances en cache à la base et corrige les écarts.
+
+    Returns:
+        Un dict par donnée divergente (``dataset``, ``groups``, ``repaired``).
+    """
+    suspects = {name: groups for name in DATASETS if (groups := _diverging(name))}
+    if suspects and confirm_delay:
+        time.sleep(confirm_delay)
+        suspects = {name: groups for name in suspects if (groups := _diverging(name))}
+
+    store = get_store()
+    divergences = []
+    for name, groups in suspects.items():
+        detail = _describe(name, groups)
+        logger.warning("%s Écart cache / base sur %s (%s)%s", LOG_PREFIX, name, detail, ", corrigé" if repair else "")
+        if repair:
+            if name == "team_camps":
+                store.reload_teams()
+                # Comptes de la page de sélection calculés sur les mêmes données
+                bump_version(VERSION_COUNTS)
+            else:
+                store.reload_challenges()
+        divergences.append({"dataset": name, "groups": detail, "repaired": repair})
+
+    _record(divergences)
+    return divergences
+
+
+def _record(divergences: list[dict]) -> None:
+    """Publie le passage et ses écarts dans les compteurs partagés (page admin)."""
+    try:
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        _increment(VERIFY_STATS_KEY_PREFIX + "runs")
+        cache.set(VERIFY_STATS_KEY_PREFIX + "last_run", now, timeout=0)
+        for divergence in divergences:
+            _increment(VERIFY_STATS_KEY_PREFIX + f"divergences:{divergence['dataset']}")
+            cache.set(
+                VERIFY_STATS_KEY_PREFIX + "last_divergence",
+                json.dumps({**divergence, "at": now, "pid": os.getpid()}),
+                timeout=0,
+            )
+    except Exception:
+        logger.exception("%s Erreur publication des compteurs de vérification", LOG_PREFIX)
+
+
+def _increment(key: str) -> None:
+    try:
+        # INCR atomique sur Redis, get + set sur les autres backends
+        if cache.cache.inc(key) is not None:
+            return
+    except Exception:
+        logger.exception("%s Erreur incrément du compteur %s", LOG_PREFIX, key)
+    cache.set(key, int(cache.get(key) or 0) + 1, timeout=0)
+
+
+def get_stats() -> dict:
+    """Compteurs cumulés de tous les workers, dernier passage et dernier écart."""
+    keys = [VERIFY_STATS_KEY_PREFIX + name for name in (*_COUNTERS, "last_run", "last_divergence")]
+    values = dict(zip(keys, cache.get_many(*keys)))
+    last = values[VERIFY_STATS_KEY_PREFIX + "last_divergence"]
+    try:
+        last = json.loads(last) if last else None
+    except ValueError:
+        last = None
+    return {
+        "enabled": _interval is not None,
+        "interval": _interval,
+        "runs": int(values[VERIFY_STATS_KEY_PREFIX + "runs"] or 0),
+        "divergences": {
+            name: int(values[VERIFY_STATS_KEY_PREFIX + f"divergences:{name}"] or 0) for name in DATASETS
+        },
+        "last_run": values[VERIFY_STATS_KEY_PREFIX + "last_run"],
+        "last_divergence": last,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Thread de fond (un par worker)
+# ---------------------------------------------------------------------------
+
+_interval: float | None = None
+_thread: threading.Thread | None = None
+_pid: int | None = None
+_start_lock = threading.Lock()
+
+
+def register_verifier(app) -> None:
+    """
+    Démarre la vérification périodique dans chaque worker, à sa première
+    requête (le thread d'un processus préchargé ne survit pas au fork).
+    ``CAMPS_VERIFY_INTERVAL`` (config CTFd ou environnement) : 0 la désactive.
+    """
+    global _interval
+    value = app.config.get(VERIFY_INTERVAL_CONFIG_KEY, os.environ.get(VERIFY_INTERVAL_CONFIG_KEY))
+    try:
+        interval = float(value) if value is not None else VERIFY_INTERVAL
+    except (TypeError, ValueError):
+        logger.warning("%s %s invalide, %ss retenues", LOG_PREFIX, VERIFY_INTERVAL_CONFIG_KEY, VERIFY_INTERVAL)
+        interval = VERIFY_INTERVAL
+    if interval <= 0:
+        logger.info("%s Vérification des caches désactivée", LOG_PREFIX)
+        return
+    _interval = interval
+
+    @app.before_request
+    def ensure_verifier():
+        if _pid != os.getpid():
+            _start()
+
+
+def _start() -> None:
+    global _thread, _pid
+    with _start_lock:
+        pid = os.getpid()
+        if _pid == pid and _thread is not None and _thread.is_alive():
+            return
+        _pid = pid
+        _thread = threading.Thread(
+            target=_run, args=(current_app._get_current_object(),), name="camps-verifier", daemon=True,
+        )
+        _thread.start()
+
+
+def _run(app) -> None:
+    while True:
+        # Étalement : les workers ne vérifient pas tous au même instant
+        time.sleep(_interval * random.uniform(0.8, 1.2))
+        try:
+            with app.app_context():
+                verify()
+        except Exception:
+            logger.exception("%s Erreur vérification des caches", LOG_PREFIX)